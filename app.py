@@ -1,22 +1,38 @@
 import asyncio
+import cv2
+import threading
+import time
 import yaml
 import sys
 
 from aiohttp import client_exceptions
 from flask import Flask
 from flask_socketio import SocketIO
+from werkzeug.serving import WSGIRequestHandler
 
 from modules.api.apiClient import ApiClient
 from modules.cli.cli import cli
+from modules.metrics.metrics import METRICS
+from modules.metrics.phases import Phases
 from modules.pinOut.pinOut import PinOut
+from modules.routes.broadcaster import FrameBroadcaster
 from modules.routes.index import Routes
 from modules.security.security import Security
+from modules.transport.control import ControlServer
+from modules.transport.events import EventPublisher
+from modules.transport.frame_ring import FrameRing
 
 class App(Routes):
     def __init__(self, client: ApiClient, hardware: dict):
         self.client = client
         self.pinOut = PinOut(**hardware)
         self.security = Security()
+        self.broadcaster = FrameBroadcaster()
+        self.events = EventPublisher()
+        self.pinOut.listeners.append(lambda status: self.events.publish('status', status))
+        self.pinOut.listeners.append(lambda status: METRICS.inc('status_transitions_total', {'status': status}))
+        self.inference_metrics = None # Last metrics pushed by the inference process
+        self.events.publish('status', self.pinOut.status)
 
         # Set RGB led to Green
         self.pinOut.write_rgb(False, True, False)
@@ -28,34 +44,93 @@ class App(Routes):
     def routes(self):
         self.app.add_url_rule('/', 'index', self.index)
         self.app.add_url_rule('/video_feed', 'video_feed', self.video_feed, methods=['POST'])
+        self.app.add_url_rule('/stream', 'stream', self.stream, methods=['GET'])
         self.app.add_url_rule('/password', 'password', self.password, methods=['POST'])
         self.app.add_url_rule('/change_password', 'change_password', self.change_password, methods=['POST'])
         self.app.add_url_rule('/status', 'status', self.status, methods=['GET', 'POST'])
         self.app.add_url_rule('/motion', 'motion', self.motion, methods=['GET'])
+        self.app.add_url_rule('/events', 'events', self.events_stream, methods=['GET'])
+        self.app.add_url_rule('/notifications', 'notifications', self.notifications, methods=['GET'])
+        self.app.add_url_rule('/metrics', 'metrics', self.metrics, methods=['GET', 'POST'])
+
+    def start_local_transport(self, transport: dict):
+        """ Serve status and motion over a unix socket and read frames from a shared memory ring,
+        so the inference process on the same host does not need HTTP nor JPEG encoding per frame
+
+        Args:
+            transport (dict): The transport section of the configuration
+        """
+        try:
+            self.frame_ring = FrameRing.create(transport['frames'], transport['slots'], transport['max_frame_bytes'])
+            self.control = ControlServer(transport['socket'], {
+                'get_status': lambda message: self.pinOut.status,
+                'set_status': lambda message: self.set_status(message['status'], message.get('weapon')),
+                'get_motion': lambda message: self.pinOut.read_pin(),
+                'push_metrics': lambda message: self.set_inference_metrics(message['metrics']),
+            }, events=self.events).start()
+        except OSError as e:
+            print("Local transport not available, using HTTP only:", e)
+            return
+        threading.Thread(target=self.relay_frames, name='frames', daemon=True).start()
+
+    def relay_frames(self):
+        """ Publish the frames of the shared memory ring, they are only encoded while someone is watching """
+        while True:
+            _, _, frame = self.frame_ring.wait()
+            if frame is not None and self.broadcaster.viewers:
+                _, jpeg = cv2.imencode('.jpg', frame)
+                self.broadcaster.publish(jpeg.tobytes())
+
+    def watch_motion(self, interval: float = 0.05):
+        """ Publish the changes of the PIR sensor, so the inference process does not have to ask for them every frame
+
+        Args:
+            interval (float, optional): Seconds between reads of the sensor. Defaults to 0.05.
+        """
+        while True:
+            self.events.publish('motion', bool(self.pinOut.read_pin()))
+            time.sleep(interval)
 
     def run(self, debug=False):
+        threading.Thread(target=self.watch_motion, name='motion', daemon=True).start()
+        # Keep-alive connections, so the inference process reuses a single connection to post frames
+        WSGIRequestHandler.protocol_version = "HTTP/1.1"
         self.socketio.run(self.app, port=5000, debug=debug)
         
 async def main():
+    phases = Phases('app')
     try:
-        config = yaml.safe_load(open("config/config.yml"))
+        with phases.phase('config'), open("config/config.yml") as file:
+            config = yaml.safe_load(file)
         
         # Production
         try:
-            client = await cli(
-                config['base_url'],
-                sys.argv[1],
-                sys.argv[2]
-                )
+            username, password = sys.argv[1], sys.argv[2]
         except IndexError:
             print("Please provide username and password")
             sys.exit(1)
         debug = True
 
+        # The login runs while the local server starts, the inference process only waits for the control socket
+        client = ApiClient(config['base_url'])
+        bootstrap = asyncio.ensure_future(cli(config['base_url'], username, password, client))
+        await asyncio.sleep(0)
+
         print("Starting flask server...")
+        with phases.phase('app'):
+            # Alerts of the inference process are saved from now on and delivered once logged in
+            client.start_notifications(**(config.get('notifications') or {'path': 'data/notifications'}), deliver=False)
+            app = App(client, config['hardware'])
+            if (config.get('transport') or {}).get('mode') == 'local':
+                app.start_local_transport(config['transport'])
+        with phases.phase('login'):
+            client = await bootstrap
+        client.notifications.start()
+
         # Send status to server
-        app = App(client, config['hardware'])
-        await client.patch({'status': True})        
+        with phases.phase('register'):
+            await client.patch({'status': True})
+        print(phases.report())
 
         app.run(debug=debug)
     except client_exceptions.ClientConnectorError:
@@ -70,6 +145,10 @@ async def main():
             app.pinOut.cleanup()
         except:
             pass
+        try:
+            client.close()
+        except:
+            pass
     
 
 if __name__ == "__main__":
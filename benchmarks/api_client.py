@@ -0,0 +1,43 @@
+""" Benchmark the pooled session of ApiClient against a local stub of the API.
+
+It compares the heartbeat PATCH of a new aiohttp session per request (previous) with the
+pooled session. The retries and the shutdown of the client are tested in tests/test_api_client.py.
+
+Usage:
+    python -m benchmarks.api_client [--repeat 50]
+"""
+import argparse
+import asyncio
+
+import aiohttp
+
+from modules.api.apiClient import ApiClient
+from benchmarks.utils import StubServer, measure, print_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    loop = asyncio.get_event_loop()
+
+    with StubServer({'id': 1, 'status': True}) as server:
+        client = ApiClient(server.url, 'token')
+        client.node_config = {'node_id': 1}
+
+        async def new_session():
+            async with aiohttp.ClientSession(headers={'Authorization': 'Bearer token'}) as session:
+                async with session.patch(server.url + '/nodes/1', json={'status': True}) as response:
+                    return await response.json()
+
+        results = {
+            'new session per request (previous)': measure(lambda: loop.run_until_complete(new_session()), args.repeat, 5),
+            'pooled session': measure(lambda: loop.run_until_complete(client.patch({'status': True})), args.repeat, 5),
+            'pooled session, synchronous': measure(lambda: client.send_notification({'message': 'Gun detected', 'type': 3}), args.repeat, 5),
+        }
+        client.close()
+    print_results('Heartbeat PATCH', results)
+
+
+if __name__ == '__main__':
+    main()
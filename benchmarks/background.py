@@ -0,0 +1,82 @@
+""" Benchmark BackgroundRemover.remove_background against the previous implementation, and the
+cost and memory of every background model.
+
+The previous one converted the background to uint8, split the difference in channels,
+thresholded and merged them and finally looked for black pixels with np.where on every frame.
+The frames have a moving square, sensor noise and black pixels over the foreground,
+tests/test_background.py checks that both implementations give the same pixels on them.
+
+Usage:
+    python -m benchmarks.background [--repeat 200] [--threshold 30]
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from modules.preprocessing.background_models import MODELS
+from modules.preprocessing.background_remover import BackgroundRemover
+from benchmarks.utils import measure, print_results, random_frame
+
+
+def remove_background_reference(frame: np.ndarray, static_background: np.ndarray, threshold: int) -> np.ndarray:
+    """ Previous BackgroundRemover.remove_background implementation """
+    background = static_background.astype(dtype=np.uint8)
+    diff = cv2.absdiff(frame, background)
+    b, g, r = cv2.split(diff)
+    _, b_mask = cv2.threshold(b, threshold, 255, cv2.THRESH_BINARY)
+    _, g_mask = cv2.threshold(g, threshold, 255, cv2.THRESH_BINARY)
+    _, r_mask = cv2.threshold(r, threshold, 255, cv2.THRESH_BINARY)
+    mask = cv2.bitwise_or(cv2.bitwise_or(b_mask, g_mask), r_mask)
+    result = cv2.bitwise_and(frame, frame, mask=mask)
+    result[np.where((result == [0, 0, 0]).all(axis=2))] = [255, 255, 255]
+    return result
+
+
+def scene(width: int, height: int, seed: int = 0) -> tuple:
+    """ Build a learned background and a frame of the same scene with someone in it
+
+    Returns:
+        tuple: The float background, as accumulateWeighted leaves it, and the frame
+    """
+    random = np.random.RandomState(seed)
+    background = random_frame(width, height, seed).astype(float) + random.uniform(0, 1, (height, width, 3))
+    background = np.clip(background, 0, 255)
+    noise = random.randint(-40, 41, (height, width, 3))
+    frame = np.clip(background.astype(np.int32) + noise, 0, 255).astype(np.uint8)
+    frame[height // 4:height // 2, width // 4:width // 2] = random_frame(width // 4, height // 4, seed + 1)
+    frame[random.rand(height, width) < 0.01] = 0
+    return background, frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--threshold', type=int, default=30)
+    args = parser.parse_args()
+
+    for width, height in [(640, 480), (1280, 720), (1920, 1080)]:
+        background, frame = scene(width, height)
+        remover = BackgroundRemover(threshold=args.threshold, adapt_rate=0)
+        remover.model.set_background(background)
+        out = np.empty_like(frame)
+
+        print_results('Background removal, {}x{}'.format(width, height), {
+            'previous': measure(lambda: remove_background_reference(frame, background, args.threshold), args.repeat),
+            'fused': measure(lambda: remover.remove_background(frame), args.repeat),
+            'fused, reused output': measure(lambda: remover.remove_background(frame, out), args.repeat),
+        })
+
+        results = {}
+        for name in MODELS:
+            remover = BackgroundRemover(threshold=args.threshold, model=name)
+            for _ in range(30):
+                remover.learn_background(background.astype(np.uint8))
+            timing = measure(lambda: remover.remove_background(frame, out, update=True), args.repeat)
+            stats = remover.stats()
+            results[name] = dict(timing, model_cost_ms=stats['cost_ms'], memory_mb=stats['memory_mb'])
+        print_results('Adaptive background models, {}x{}'.format(width, height), results)
+
+
+if __name__ == '__main__':
+    main()
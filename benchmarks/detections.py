@@ -0,0 +1,66 @@
+""" Benchmark the Detections container against the per box dicts it replaces.
+
+The previous path built a dict per box in YoloTRT, another one in convert_to_roboflow_format and
+filtered them with filter and lambda. The new one keeps the rows of the non max suppression and
+only builds dicts when they are read. tests/test_detections.py checks that both give the same boxes.
+
+Usage:
+    python -m benchmarks.detections [--repeat 500]
+"""
+import argparse
+
+import numpy as np
+
+from modules.model.detections import Detections
+from benchmarks.utils import measure, print_results
+
+CATEGORIES = ("Gun", "Knife")
+THRESHOLDS = (0.6, 0.4)
+
+
+def previous(rows: np.ndarray) -> list:
+    """ Previous YoloTRT.to_detections, Detect.convert_to_roboflow_format and filter_confidence """
+    detections = [{"class": CATEGORIES[int(row[5])], "conf": row[4], "box": row[:4]} for row in rows]
+    result = []
+    for bounding_box in detections:
+        box = list(bounding_box['box'])
+        result.append({
+            "x": (box[0] + box[2])// 2,
+            "y": (box[1] + box[3])// 2,
+            "width": int(box[2] - box[0]),
+            "height": int(box[3] - box[1]),
+            "class": bounding_box['class'],
+            "confidence": bounding_box['conf']
+        })
+    return list(filter(lambda x: x['confidence'] >= THRESHOLDS[CATEGORIES.index(x['class'])], result))
+
+
+def current(rows: np.ndarray, threshold: float = 0.7) -> Detections:
+    detections = Detections(rows, CATEGORIES).filter_size(640, 480, threshold)
+    return detections.filter_confidence(dict(zip(CATEGORIES, THRESHOLDS)))
+
+
+def random_rows(count: int, seed: int = 0) -> np.ndarray:
+    random = np.random.RandomState(seed)
+    xy = random.uniform(0, 500, (count, 2))
+    wh = random.uniform(10, 140, (count, 2))
+    return np.hstack([xy, xy + wh, random.uniform(0.3, 1, (count, 1)), random.randint(0, 2, (count, 1))]).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    for count in [1, 10, 100]:
+        rows = random_rows(count)
+
+        print_results('{} boxes'.format(count), {
+            'per box dicts': measure(lambda: previous(rows), args.repeat),
+            'Detections': measure(lambda: current(rows), args.repeat),
+            'Detections + momentum input': measure(lambda: current(rows).max_confidence(CATEGORIES), args.repeat),
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+""" Benchmark the evidence writer against the previous synchronous PNG snapshot.
+
+It compares the time the detection loop is blocked on a detected frame, tests/test_evidence.py
+checks the frames saved around a detection and the quota eviction.
+
+Usage:
+    python -m benchmarks.evidence [--width 640] [--height 480] [--repeat 20]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import cv2
+
+from modules.evidence.evidence_writer import EvidenceWriter
+from benchmarks.utils import measure, print_results, random_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    frames = [random_frame(args.width, args.height, seed) for seed in range(8)]
+    path = tempfile.mkdtemp(prefix='evidence-')
+
+    try:
+        def synchronous():
+            cv2.imwrite(os.path.join(path, 'img_previous.png'), frames[0])
+
+        results = {'synchronous png (previous)': measure(synchronous, args.repeat, 2)}
+        for format in ('png', 'jpg', 'webp'):
+            writer = EvidenceWriter(path, format, pre_frames=5, post_frames=5, queue_size=args.repeat * 11 + 8).start()
+            for frame in frames:
+                writer.add(frame)
+            results['writer {}, caller'.format(format)] = measure(lambda: writer.add(frames[0], detected=True), args.repeat, 0)
+            writer.stop()
+            results['writer {}, thread'.format(format)] = writer.stats()
+        print_results('Detection loop blocked per detected frame, {}x{}'.format(args.width, args.height), results)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+""" Benchmark the pooled InferenceClient against the previous curl subprocess per frame.
+
+A local stub server answers every request like the roboflow inference server, optionally
+after a delay that emulates the model time, so the asynchronous mode can be compared too.
+
+Usage:
+    python -m benchmarks.inference_client [--delay 0.02] [--in-flight 4] [--repeat 100]
+"""
+import argparse
+import base64
+import json
+import shutil
+import subprocess
+
+import cv2
+
+from modules.model.inference_client import InferenceClient
+from benchmarks.utils import StubServer, measure, print_results, random_frame
+
+PREDICTIONS = [{"x": 123, "y": 219.2, "width": 96, "height": 173, "class": "Gun", "confidence": 0.73}]
+
+
+def curl_predict(url: str, frame) -> list:
+    """ Previous Detect.detection request path """
+    _, img_encoded = cv2.imencode(".jpg", frame)
+    base64_data = base64.b64encode(img_encoded).decode("utf-8")
+    process = subprocess.Popen('curl --silent -d "@-" "{}"'.format(url), stdin=subprocess.PIPE, stdout=subprocess.PIPE, shell=True)
+    stdout, _ = process.communicate(input=base64_data.encode('utf-8'))
+    response = stdout.decode('utf-8')
+    return json.loads(response.split('predictions": ')[1].split('],')[0] + ']')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=0.02, help='Seconds the stub server takes to answer')
+    parser.add_argument('--in-flight', type=int, default=4, help='Frames in flight for the asynchronous mode')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    frame = random_frame(640, 480)
+    with StubServer({'predictions': PREDICTIONS, 'image': {'width': 640, 'height': 480}}, delay=args.delay) as server:
+        client = InferenceClient(server.url, pool_size=args.in_flight)
+
+        def submit_batch():
+            futures = [client.submit(frame) for _ in range(args.in_flight)]
+            return [future.result() for future in futures]
+
+        results = {}
+        if shutil.which('curl'):
+            results['curl subprocess'] = measure(lambda: curl_predict(server.url, frame), args.repeat)
+        results['InferenceClient.predict'] = measure(lambda: client.predict(frame), args.repeat)
+        batch = measure(submit_batch, max(1, args.repeat // args.in_flight))
+        results['submit, {} in flight (per frame)'.format(args.in_flight)] = {key: round(value / args.in_flight, 3) for key, value in batch.items()}
+        client.close()
+
+    print_results('Inference request, server delay {} s'.format(args.delay), results)
+
+
+if __name__ == '__main__':
+    main()
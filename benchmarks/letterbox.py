@@ -0,0 +1,67 @@
+""" Benchmark the letterbox preprocessing of YoloTRT against the previous implementation.
+
+Both paths write a 640x640 tensor into a float32 input buffer, the previous one through
+cvtColor, resize, copyMakeBorder, astype, division, transpose and np.copyto.
+tests/test_letterbox.py checks that both give the same tensor.
+
+Usage:
+    python -m benchmarks.letterbox [--repeat 200]
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from modules.model.letterbox import Letterbox
+from benchmarks.utils import measure, print_results, random_frame
+
+INPUT_W = INPUT_H = 640
+
+
+def letterbox_reference(image_raw: np.ndarray, input_w: int = INPUT_W, input_h: int = INPUT_H) -> np.ndarray:
+    """ Previous YoloTRT.PreProcessImg implementation """
+    h, w, c = image_raw.shape
+    image = cv2.cvtColor(image_raw, cv2.COLOR_BGR2RGB)
+    r_w = input_w / w
+    r_h = input_h / h
+    if r_h > r_w:
+        tw = input_w
+        th = int(r_w * h)
+        tx1 = tx2 = 0
+        ty1 = int((input_h - th) / 2)
+        ty2 = input_h - th - ty1
+    else:
+        tw = int(r_h * w)
+        th = input_h
+        tx1 = int((input_w - tw) / 2)
+        tx2 = input_w - tw - tx1
+        ty1 = ty2 = 0
+    image = cv2.resize(image, (tw, th))
+    image = cv2.copyMakeBorder(image, ty1, ty2, tx1, tx2, cv2.BORDER_CONSTANT, None, (128, 128, 128))
+    image = image.astype(np.float32)
+    image /= 255.0
+    image = np.transpose(image, [2, 0, 1])
+    image = np.expand_dims(image, axis=0)
+    image = np.ascontiguousarray(image)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    letterbox = Letterbox(INPUT_W, INPUT_H)
+    buffer = np.empty(3 * INPUT_H * INPUT_W, dtype=np.float32)
+
+    for width, height in [(640, 480), (1920, 1080)]:
+        frame = random_frame(width, height)
+
+        print_results('Letterbox {}x{} -> {}x{}'.format(width, height, INPUT_W, INPUT_H), {
+            'previous (allocating)': measure(lambda: np.copyto(buffer, letterbox_reference(frame).ravel()), args.repeat),
+            'Letterbox (into buffer)': measure(lambda: letterbox(frame, buffer), args.repeat),
+        })
+
+
+if __name__ == '__main__':
+    main()
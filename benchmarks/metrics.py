@@ -0,0 +1,35 @@
+""" Benchmark the stage histograms of the /metrics endpoint.
+
+It measures the overhead per observation against an untimed stage, tests/test_metrics.py checks
+the buckets, the merge of the metrics pushed by another process and the Prometheus text format.
+
+Usage:
+    python -m benchmarks.metrics [--repeat 100000]
+"""
+import argparse
+
+from modules.metrics.metrics import Metrics
+from benchmarks.utils import measure, print_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100000)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+
+    def timed():
+        with metrics.time('stage'):
+            pass
+
+    results = {
+        'untimed stage': measure(lambda: None, args.repeat, 100),
+        'observe': measure(lambda: metrics.observe('stage', 0.003), args.repeat, 100),
+        'time context manager': measure(timed, args.repeat, 100),
+    }
+    print_results('Overhead per stage and frame', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+""" Benchmark the temporal evidence of the detections against the previous Detect.momentum.
+
+The time per frame over a synthetic detection sequence is compared with the previous per box
+loop over a deque, tests/test_momentum.py checks the evidence on the same sequences.
+
+Usage:
+    python -m benchmarks.momentum [--frames 2000]
+"""
+import argparse
+from collections import deque
+
+import numpy as np
+
+from modules.model.momentum import TemporalEvidence
+from benchmarks.utils import measure, print_results
+
+CLASSES = ('Gun', 'Knife')
+THRESHOLDS = [x * 1.75 for x in (0.6, 0.4)]
+
+
+def momentum_reference(class_name: int, confidence: float, threshold: float, queue: deque, constant: float = 0.5) -> tuple:
+    """ Previous Detect.momentum implementation """
+    calc_momentum = 0
+    queue.append((class_name, confidence))
+    for i in range(len(queue)-1, -1, -1):
+        calc_momentum += queue[i][0] * (queue[i][1] * constant ** i)
+    return calc_momentum >= threshold, queue
+
+
+def sequence(frames: int, seed: int = 0) -> list:
+    """ Synthetic detections: mostly empty frames, with bursts of each class and frames with several boxes """
+    random = np.random.RandomState(seed)
+    result = []
+    for _ in range(frames):
+        boxes = []
+        for _ in range(random.choice([0, 0, 0, 1, 1, 2])):
+            boxes.append({'class': CLASSES[random.randint(len(CLASSES))], 'confidence': float(random.uniform(0.4, 1.0))})
+        result.append(boxes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=2000)
+    args = parser.parse_args()
+
+    frames = sequence(args.frames)
+
+    queues = [deque(maxlen=6) for _ in THRESHOLDS]
+    def previous():
+        for boxes in frames:
+            for i, threshold in enumerate(THRESHOLDS):
+                for box in boxes or [{'class': None, 'confidence': 0}]:
+                    momentum_reference(1 if box['class'] else 0, box['confidence'], threshold, queues[i])
+
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    def incremental():
+        for boxes in frames:
+            evidence.observe(boxes)
+
+    results = {
+        'previous (deque loop)': measure(previous, 10, 1),
+        'temporal evidence': measure(incremental, 10, 1),
+    }
+    for result in results.values():
+        result['us_per_frame'] = round(1000 * result['mean_ms'] / len(frames), 3)
+    print_results('Momentum over {} frames'.format(len(frames)), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+""" Benchmark the vectorized non max suppression against the previous while loop of YoloTRT.
+
+Random clustered boxes of two classes are generated for 10 to 1000 candidates, for single
+images and for a batch of 4 images. tests/test_nms.py checks that both implementations keep
+the same boxes.
+
+Usage:
+    python -m benchmarks.nms [--repeat 50]
+"""
+import argparse
+
+import numpy as np
+
+from modules.model.nms import batched_nms, nms
+from benchmarks.utils import measure, print_results
+
+
+def bbox_iou(box1, box2):
+    """ Previous YoloTRT.bbox_iou for x1y1x2y2 boxes """
+    b1_x1, b1_y1, b1_x2, b1_y2 = box1[:, 0], box1[:, 1], box1[:, 2], box1[:, 3]
+    b2_x1, b2_y1, b2_x2, b2_y2 = box2[:, 0], box2[:, 1], box2[:, 2], box2[:, 3]
+    inter_rect_x1 = np.maximum(b1_x1, b2_x1)
+    inter_rect_y1 = np.maximum(b1_y1, b2_y1)
+    inter_rect_x2 = np.minimum(b1_x2, b2_x2)
+    inter_rect_y2 = np.minimum(b1_y2, b2_y2)
+    inter_area = np.clip(inter_rect_x2 - inter_rect_x1 + 1, 0, None) * \
+                 np.clip(inter_rect_y2 - inter_rect_y1 + 1, 0, None)
+    b1_area = (b1_x2 - b1_x1 + 1) * (b1_y2 - b1_y1 + 1)
+    b2_area = (b2_x2 - b2_x1 + 1) * (b2_y2 - b2_y1 + 1)
+    return inter_area / (b1_area + b2_area - inter_area + 1e-16)
+
+
+def nms_reference(boxes, nms_thres=0.4):
+    """ Previous suppression loop of YoloTRT.NonMaxSuppression """
+    confs = boxes[:, 4]
+    boxes = boxes[np.argsort(-confs)]
+    keep_boxes = []
+    while boxes.shape[0]:
+        large_overlap = bbox_iou(np.expand_dims(boxes[0, :4], 0), boxes[:, :4]) > nms_thres
+        label_match = boxes[0, -1] == boxes[:, -1]
+        invalid = large_overlap & label_match
+        keep_boxes += [boxes[0]]
+        boxes = boxes[~invalid]
+    return np.stack(keep_boxes, 0) if len(keep_boxes) else np.array([])
+
+
+def random_boxes(count: int, seed: int = 0, width: int = 640, height: int = 480) -> np.ndarray:
+    """ Build [x1, y1, x2, y2, conf, class_id] rows clustered around a few objects, like raw detector output """
+    random = np.random.RandomState(seed)
+    centers = random.uniform((0, 0), (width, height), size=(max(1, count // 20), 2))
+    picked = centers[random.randint(0, len(centers), count)] + random.normal(0, 8, (count, 2))
+    sizes = random.uniform(20, 120, (count, 2))
+    boxes = np.empty((count, 6), dtype=np.float32)
+    boxes[:, 0] = np.clip(picked[:, 0] - sizes[:, 0] / 2, 0, width - 1)
+    boxes[:, 1] = np.clip(picked[:, 1] - sizes[:, 1] / 2, 0, height - 1)
+    boxes[:, 2] = np.clip(picked[:, 0] + sizes[:, 0] / 2, 0, width - 1)
+    boxes[:, 3] = np.clip(picked[:, 1] + sizes[:, 1] / 2, 0, height - 1)
+    boxes[:, 4] = random.uniform(0.3, 1.0, count)
+    boxes[:, 5] = random.randint(0, 2, count)
+    return boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    for count in [10, 100, 300, 1000]:
+        boxes = random_boxes(count)
+        batch = [random_boxes(count, seed) for seed in range(4)]
+        print_results('NMS over {} candidate boxes'.format(count), {
+            'previous while loop': measure(lambda: nms_reference(boxes), args.repeat),
+            'nms': measure(lambda: nms(boxes), args.repeat),
+            'previous loop x4 images': measure(lambda: [nms_reference(b) for b in batch], args.repeat),
+            'batched_nms (4 images)': measure(lambda: batched_nms(batch), args.repeat),
+        })
+
+
+if __name__ == '__main__':
+    main()
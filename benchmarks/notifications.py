@@ -0,0 +1,102 @@
+""" Check and benchmark the alert notification queue against a local stub of the API.
+
+It checks delivery, rejection of 4xx answers, persistence across a restart and delivery after an outage, and
+compares the time the caller is blocked with the previous synchronous request while the API is slow.
+
+Usage:
+    python -m benchmarks.notifications [--delay 0.5] [--repeat 10]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import requests
+
+from modules.api.apiClient import ApiClient
+from modules.api.notifications import NotificationQueue
+from benchmarks.utils import StubServer, measure, print_results
+
+
+def wait_delivered(queue: NotificationQueue, timeout: float = 10.0) -> bool:
+    deadline = time.time() + timeout
+    while queue.pending and time.time() < deadline:
+        time.sleep(0.01)
+    return not queue.pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=0.5, help='Seconds the stub API takes to answer')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    path = tempfile.mkdtemp(prefix='notifications-')
+
+    try:
+        with StubServer({'id': 1}) as server:
+            client = ApiClient(server.url, 'token')
+            client.start_notifications(path, backoff=0.05)
+            client.new_alert_notification('Gun detected')
+            assert wait_delivered(client.notifications), 'Not delivered'
+            assert server.requests[-1][1] == '/notifications' and not os.listdir(path), 'Delivered notification was kept'
+            client.notifications.stop()
+
+        with StubServer({'error': 'Bad Request', 'message': 'Invalid type'}, status=400) as server:
+            client = ApiClient(server.url, 'token')
+            client.start_notifications(path, backoff=0.05)
+            client.new_alert_notification('Gun detected')
+            assert wait_delivered(client.notifications) and client.notifications.rejected == 1, 'Rejected notification was retried'
+            client.notifications.stop()
+
+        # A 4xx without an error key is a rejection too, kept in the rejected directory
+        with StubServer({'detail': 'Not found'}, status=404) as server:
+            client = ApiClient(server.url, 'token')
+            client.start_notifications(path, backoff=0.05)
+            client.new_alert_notification('Gun detected')
+            assert wait_delivered(client.notifications) and client.notifications.delivered == 0, 'Rejected notification was delivered'
+            assert len(os.listdir(os.path.join(path, 'rejected'))) == 2, 'Rejected notification was not kept'
+            client.notifications.stop()
+
+        # Saved while the node is down, delivered by the next run
+        with StubServer({'id': 1}) as server:
+            client = ApiClient(server.url, 'token')
+            client.notifications = NotificationQueue(client.send_notification, path)
+            for _ in range(3):
+                client.new_alert_notification('Knife detected')
+            client.start_notifications(path, backoff=0.05)
+            assert wait_delivered(client.notifications) and client.notifications.delivered == 3, 'Pending notifications were lost'
+            client.notifications.stop()
+
+        # The API is not reachable at first, then it comes back on the same port
+        with StubServer() as server:
+            port = server.server_address[1]
+        client = ApiClient('http://127.0.0.1:{}'.format(port), 'token')
+        client.start_notifications(path, backoff=0.05, max_backoff=0.2)
+        client.new_alert_notification('Gun detected')
+        time.sleep(0.5)
+        assert client.notifications.failures > 0 and client.notifications.pending, 'Outage not detected'
+        with StubServer({'id': 1}, port=port):
+            assert wait_delivered(client.notifications), 'Not delivered after the outage'
+        client.notifications.stop()
+
+        with StubServer({'id': 1}, delay=args.delay) as server:
+            def synchronous():
+                requests.post(server.url + '/notifications', json={'message': 'Gun detected', 'type': 3}, headers={'Authorization': 'Bearer token'}).json()
+
+            client = ApiClient(server.url, 'token')
+            client.start_notifications(path)
+            results = {
+                'synchronous request (previous)': measure(synchronous, args.repeat, 1),
+                'queued': measure(lambda: client.new_alert_notification('Gun detected'), args.repeat, 1),
+            }
+            wait_delivered(client.notifications, timeout=args.delay * 3 * args.repeat)
+            results['queue'] = client.notifications.stats()
+            client.notifications.stop()
+        print_results('Caller blocked per notification, API delay {} s'.format(args.delay), results)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
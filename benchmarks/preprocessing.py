@@ -0,0 +1,46 @@
+""" Benchmark ImagePreprocessor.preprocess against the pipeline of resize_image, flip_image and
+change_contrast_and_brightness it replaces.
+
+The parameters come from the preprocessing section of config/config.yml, tests/test_preprocessing.py
+checks that both give the same frames.
+
+Usage:
+    python -m benchmarks.preprocessing [--repeat 200]
+"""
+import argparse
+
+import numpy as np
+import yaml
+
+from modules.preprocessing.image_preprocessing import ImagePreprocessor
+from benchmarks.utils import measure, print_results, random_frame
+
+
+def reference(preprocessor: ImagePreprocessor, frame: np.ndarray) -> np.ndarray:
+    return preprocessor.pipeline(frame,
+        preprocessor.resize_image,
+        preprocessor.flip_image,
+        preprocessor.change_contrast_and_brightness,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with open('config/config.yml') as f:
+        params = yaml.safe_load(f)['preprocessing']
+    preprocessor = ImagePreprocessor(params)
+
+    for width, height in [(640, 480), (1280, 720), (1920, 1080)]:
+        frame = random_frame(width, height)
+
+        print_results('Preprocessing {}x{} to {}x{}'.format(width, height, preprocessor.desired_width, preprocessor.desired_height), {
+            'pipeline': measure(lambda: reference(preprocessor, frame), args.repeat),
+            'compiled plan': measure(lambda: preprocessor.preprocess(frame), args.repeat),
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+""" Benchmark the detection over the regions with foreground against the detection over the whole frame.
+
+The scene is a static background where someone carrying a red object walks in for a fraction
+of the frames. The stand-in detector finds the red object in its input, tests/test_roi.py checks
+the boxes mapped back from the regions against the boxes of the whole frame on the same scene.
+The engine time is emulated with a fixed latency per execution.
+
+Usage:
+    python -m benchmarks.roi [--frames 300] [--presence 0.2] [--latency 0.03]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from modules.model.session import CPUSession
+from modules.model.yoloDet import YoloTRT
+from modules.preprocessing.background_remover import BackgroundRemover
+from modules.preprocessing.roi import RegionFinder
+from benchmarks.utils import print_results
+
+WIDTH, HEIGHT = 640, 480
+
+
+def red_object(inputs: np.ndarray) -> list:
+    """ Stand-in model, it returns the box of the pure red pixels of every input """
+    results = []
+    for image in inputs:
+        ys, xs = np.nonzero((image[0] > 0.95) & (image[1] < 0.05) & (image[2] < 0.05))
+        if len(xs) == 0:
+            results.append([])
+            continue
+        x1, y1, x2, y2 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+        results.append([[(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0.9, 0]])
+    return results
+
+
+def scene(frames: int, presence: float) -> tuple:
+    """ Build the background and the frames, someone walks across the scene during the last presence fraction of them """
+    gradient = np.linspace(40, 200, WIDTH, dtype=np.uint8)
+    background = np.dstack([np.tile(gradient, (HEIGHT, 1))] * 3)
+    walking = int(frames * presence)
+    result = []
+    for i in range(frames):
+        frame = background.copy()
+        step = i - (frames - walking)
+        if step >= 0:
+            x = int(20 + step * (WIDTH - 160) / max(walking, 1))
+            frame[150:400, x:x + 80] = (90, 90, 90)
+            frame[250:280, x + 50:x + 100] = (0, 0, 255)
+        result.append(frame)
+    return background, result
+
+
+def run(model: YoloTRT, remover: BackgroundRemover, frames: list, finder: RegionFinder = None) -> tuple:
+    start_time = time.perf_counter()
+    executions = 0
+    boxes = []
+    for frame in frames:
+        remover.remove_background(frame, update=True)
+        if finder is None:
+            detections, _ = model.Inference(frame)
+            executions += 1
+        else:
+            regions = finder.find(remover.mask)
+            detections, _ = model.InferenceRegions(frame, regions)
+            executions += (len(regions) + model.batch_size - 1) // model.batch_size
+        boxes.append(detections.boxes)
+    elapsed = time.perf_counter() - start_time
+    return boxes, {
+        'ms_per_frame': round(1000 * elapsed / len(frames), 3),
+        'engine_executions': executions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--presence', type=float, default=0.2, help='Fraction of the frames with someone in the scene')
+    parser.add_argument('--latency', type=float, default=0.03, help='Emulated seconds per engine execution')
+    args = parser.parse_args()
+
+    background, frames = scene(args.frames, args.presence)
+    model = YoloTRT(conf=0.3, yolo_ver="v5", session=CPUSession(batch_size=4, model=red_object, latency=args.latency))
+    results = {}
+    boxes = {}
+    for name, finder in [('whole frame', None), ('regions', RegionFinder())]:
+        remover = BackgroundRemover()
+        for _ in range(10):
+            remover.learn_background(background)
+        boxes[name], results[name] = run(model, remover, frames, finder)
+        if finder is not None:
+            results[name].update(finder.stats())
+
+    print_results('Detection over {} frames, someone in {:.0%} of them'.format(args.frames, args.presence), results)
+
+
+if __name__ == '__main__':
+    main()
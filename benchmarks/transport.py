@@ -0,0 +1,113 @@
+""" Benchmark the latency from frame capture to the dashboard process, through the shared memory
+ring and through the previous JPEG + HTTP POST path.
+
+For the ring a second process plays the server: it waits for every frame and, like App.relay_frames
+with a viewer connected, encodes it as JPEG before it is available to the dashboard. For HTTP the
+frame is encoded and posted to a local keep-alive stub server, the latency is measured until the
+server answered. Status reads are compared through the pushed events, the control channel and HTTP as well.
+
+Usage:
+    python -m benchmarks.transport [--frames 200] [--width 640 --height 480]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import requests
+
+from modules.transport.control import ControlClient, ControlServer
+from modules.transport.events import EventPublisher, EventSubscriber
+from modules.transport.frame_ring import FrameRing
+from benchmarks.utils import StubServer, measure, print_results, random_frame
+
+
+def latency_stats(latencies: list) -> dict:
+    return {
+        'frames': len(latencies),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'max_ms': round(float(np.max(latencies)), 3),
+    }
+
+
+def ring_reader(path: str, frames: int, encode: bool, results):
+    ring = FrameRing.open(path)
+    latencies = []
+    while len(latencies) < frames:
+        _, timestamp, frame = ring.wait(timeout=5)
+        if frame is None:
+            break
+        if encode:
+            cv2.imencode('.jpg', frame)
+        latencies.append(1000 * (time.time() - timestamp))
+    ring.close()
+    results.put(latencies)
+
+
+def ring_latency(frame, frames: int, encode: bool) -> dict:
+    path = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'benchmark-frames')
+    ring = FrameRing.create(path, 4, frame.nbytes)
+    results = multiprocessing.Queue()
+    reader = multiprocessing.Process(target=ring_reader, args=(path, frames, encode, results))
+    reader.start()
+    time.sleep(0.5)
+    for _ in range(frames):
+        ring.write(frame, time.time())
+        time.sleep(0.01) # Let the reader consume every frame, like a 30 fps camera would
+    latencies = results.get()
+    reader.join()
+    ring.close(unlink=True)
+    return latency_stats(latencies)
+
+
+def http_latency(frame, frames: int) -> dict:
+    with StubServer() as server:
+        session = requests.Session()
+        latencies = []
+        for _ in range(frames):
+            timestamp = time.time()
+            _, image_data = cv2.imencode('.jpg', frame)
+            session.post(server.url + '/video_feed', data=image_data.tobytes(), headers={'Content-Type': 'image/jpeg'})
+            latencies.append(1000 * (time.time() - timestamp))
+    return latency_stats(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    args = parser.parse_args()
+
+    frame = random_frame(args.width, args.height)
+    print_results('Capture to dashboard latency, {}x{}'.format(args.width, args.height), {
+        'shared memory ring': ring_latency(frame, args.frames, encode=False),
+        'shared memory ring + JPEG for viewers': ring_latency(frame, args.frames, encode=True),
+        'JPEG + HTTP POST (keep-alive)': http_latency(frame, args.frames),
+    })
+
+    address = os.path.join(tempfile.gettempdir(), 'benchmark-control.sock')
+    publisher = EventPublisher()
+    publisher.publish('status', 'standby')
+    control = ControlServer(address, {'get_status': lambda message: 'standby'}, events=publisher).start()
+    client = ControlClient(address)
+    events = EventSubscriber(address=address, report_interval=float('inf')).start()
+    events.connected.wait(2)
+    with StubServer({'status': 200, 'message': 'standby'}) as server:
+        session = requests.Session()
+        print_results('Status request', {
+            'pushed events (local copy)': measure(lambda: events.get('status')),
+            'control channel': measure(lambda: client.request('get_status')),
+            'HTTP GET (keep-alive)': measure(lambda: session.get(server.url + '/status').json()),
+            'HTTP GET (new connection)': measure(lambda: requests.get(server.url + '/status').json()),
+        })
+    client.close()
+    control.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+
+def measure(function, repeat: int = 100, warmup: int = 5) -> dict:
+    """ Time a function
+
+    Args:
+        function (callable): Function to time, it receives no arguments
+        repeat (int, optional): Number of timed calls. Defaults to 100.
+        warmup (int, optional): Number of calls before timing. Defaults to 5.
+
+    Returns:
+        dict: Mean, p50 and p95 time per call in milliseconds
+    """
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(1000 * (time.perf_counter() - start_time))
+    return {
+        'mean_ms': round(float(np.mean(times)), 3),
+        'p50_ms': round(float(np.percentile(times, 50)), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3),
+    }
+
+
+def random_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """ Build a reproducible random BGR frame
+
+    Args:
+        width (int): Frame width
+        height (int): Frame height
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        np.ndarray: The frame
+    """
+    return np.random.RandomState(seed).randint(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def print_results(title: str, results: dict):
+    print(title)
+    for name, result in results.items():
+        print("  {:<32} {}".format(name, ', '.join('{}={}'.format(k, v) for k, v in result.items())))
+
+
+class StubServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, response: dict = None, status: int = 200, delay: float = 0.0, port: int = 0):
+        """ Local HTTP/1.1 keep-alive server that answers every request with a fixed JSON response
+
+        Args:
+            response (dict, optional): JSON body of every response. Defaults to an empty dict.
+            status (int, optional): Status code of every response. Defaults to 200.
+            delay (float, optional): Seconds to wait before answering. Defaults to 0.0.
+            port (int, optional): Port to listen on, 0 picks a free one. Defaults to 0.
+        """
+        self.response = response or {}
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in a single segment, otherwise Nagle and the delayed ACK of the
+            # client stall every keep-alive response about 40 ms, which a real server does not do
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def handle_request(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                server.requests.append((self.command, self.path, body))
+                if server.delay:
+                    time.sleep(server.delay)
+                data = json.dumps(server.response).encode()
+                self.send_response(server.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(('127.0.0.1', port), Handler)
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
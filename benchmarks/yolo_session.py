@@ -0,0 +1,54 @@
+""" Benchmark YoloTRT with a session reused across calls.
+
+Without arguments it runs on the CPU stand-in session, which measures the Python side of
+YoloTRT (preprocessing, postprocessing and buffer handling). With --engine it runs on the
+TensorRT session and also measures what creating a context and a stream per frame used to cost.
+
+Usage:
+    python -m benchmarks.yolo_session [--engine yolov5.engine --library libmyplugins.so] [--batch 4]
+"""
+import argparse
+
+from modules.model.session import CPUSession, TRTSession
+from modules.model.yoloDet import YoloTRT
+from benchmarks.utils import measure, print_results, random_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', help='Serialized TensorRT engine, the CPU stand-in is used when missing')
+    parser.add_argument('--library', help='TensorRT plugins library')
+    parser.add_argument('--batch', type=int, default=4, help='Number of frames for the batched run')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.engine:
+        session = TRTSession(args.library, args.engine)
+    else:
+        session = CPUSession(batch_size=args.batch)
+    model = YoloTRT(conf=0.3, yolo_ver="v5", session=session)
+    frame = random_frame(640, 480)
+    frames = [random_frame(640, 480, seed) for seed in range(args.batch)]
+
+    results = {
+        'Inference (1 frame)': measure(lambda: model.Inference(frame), args.repeat),
+        'InferenceBatch ({} frames)'.format(args.batch): measure(lambda: model.InferenceBatch(frames), args.repeat),
+    }
+    if args.engine:
+        import pycuda.driver as cuda
+
+        def create_context():
+            session.cuda_context.push()
+            try:
+                session.engine.create_execution_context()
+                cuda.Stream()
+            finally:
+                session.cuda_context.pop()
+
+        results['context + stream per call'] = measure(create_context, args.repeat)
+
+    print_results('YoloTRT on {}'.format(type(session).__name__), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+""" Detect weapons offline in folders of images and video files, e.g. to evaluate an engine or new thresholds
+on recorded incidents.
+
+Worker processes decode the files, the detector gets the frames of several files in every batch and
+every file has its own temporal filter, as if it was a camera. The boxes and the alerts are written
+as JSON lines or as the columns of a compressed numpy archive.
+
+Usage:
+    python bulk.py videos/ images/ --output results.jsonl [--format npz] [--workers 4] [--batch 8] [--stride 1]
+        [--preprocess] [--confidence 0.6 0.4] [--momentum 1.05 0.7] [--size 0.7]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+from modules.model.detections import Detections
+from modules.model.momentum import TemporalEvidence
+from modules.model.session import trt
+from modules.preprocessing.image_preprocessing import ImagePreprocessor
+
+if trt is not None:
+    from modules.model.detect_w_trt import Detect
+else:
+    from modules.model.detect import Detect
+
+IMAGES = ('.bmp', '.jpeg', '.jpg', '.png', '.webp')
+VIDEOS = ('.avi', '.mkv', '.mov', '.mp4')
+
+
+def find_files(paths: list) -> list:
+    """ Images and videos of the paths, folders are searched recursively
+
+    Args:
+        paths (list): Files and folders
+
+    Returns:
+        list: Sorted file paths
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in names if name.lower().endswith(IMAGES + VIDEOS)]
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def read_file(path: str, stride: int = 1):
+    """ Decode an image or every stride frames of a video
+
+    Yields:
+        tuple: Frame index, seconds from the start of the video (None for images) and BGR frame
+    """
+    if path.lower().endswith(IMAGES):
+        frame = cv2.imread(path)
+        if frame is None:
+            raise ValueError("Image not readable")
+        yield 0, None, frame
+        return
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Video not readable")
+    fps = capture.get(cv2.CAP_PROP_FPS) or None
+    index = 0
+    try:
+        while capture.grab():
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield index, index / fps if fps else None, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def decode(tasks, frames, stride: int, preprocessing: dict):
+    """ Worker process: decode the files of the task queue into the frame queue, in order within a file.
+    The end of a file is a (file_id, None, frames, error) item and the end of the worker a None, they are
+    always sent, whatever fails while decoding a file """
+    try:
+        preprocessor = ImagePreprocessor(preprocessing) if preprocessing else None
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            file_id, path = task
+            count, error = 0, None
+            try:
+                for index, seconds, frame in read_file(path, stride):
+                    if preprocessor:
+                        # The frames of the preprocessor are reused, the queue pickles them later
+                        frame = preprocessor.preprocess(frame).copy()
+                    frames.put((file_id, index, seconds, frame))
+                    count += 1
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            finally:
+                frames.put((file_id, None, count, error))
+    finally:
+        frames.put(None)
+
+
+def predict_batch(detection, frames: list) -> list:
+    """ Detections of every frame, in a single engine batch or with a request in flight per frame to the inference server.
+    The exception of a frame the server did not answer takes the place of its detections """
+    if hasattr(detection, 'client'):
+        futures = [detection.client.submit(frame) for frame in frames]
+        results = []
+        for future in futures:
+            try:
+                results.append(Detections.from_roboflow(future.result()))
+            except Exception as e:
+                results.append(e)
+        return results
+    detections, _ = detection.model.InferenceBatch(frames)
+    return detections
+
+
+class JSONLWriter:
+    def __init__(self, path: str):
+        """ Write a line per frame with boxes or an alert and a summary line per file """
+        self.file = open(path, 'w')
+
+    def frame(self, path: str, index: int, seconds: float, boxes: Detections, alert: bool):
+        if len(boxes) or alert:
+            self.file.write(json.dumps({'type': 'frame', 'file': path, 'frame': index, 'time': seconds, 'alert': alert, 'boxes': boxes.to_roboflow()}) + '\n')
+
+    def summary(self, summary: dict):
+        self.file.write(json.dumps(dict(summary, type='file')) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnarWriter:
+    def __init__(self, path: str, categories: tuple = ("Gun", "Knife")):
+        """ Write the boxes and the file summaries as columns of a compressed numpy archive, box_file is the
+        row of the file of every box. Read it with np.load(path) """
+        self.path = path
+        self.categories = categories
+        self.boxes = []
+        self.box_columns = []
+        self.summaries = []
+        self.file_ids = {}
+
+    def frame(self, path: str, index: int, seconds: float, boxes: Detections, alert: bool):
+        if len(boxes):
+            file_id = self.file_ids.setdefault(path, len(self.file_ids))
+            self.boxes.append(boxes.array)
+            self.box_columns.append(np.array([[file_id, index, np.nan if seconds is None else seconds, alert]] * len(boxes)))
+
+    def summary(self, summary: dict):
+        self.file_ids.setdefault(summary['file'], len(self.file_ids))
+        self.summaries.append(summary)
+
+    def close(self):
+        boxes = np.concatenate(self.boxes) if self.boxes else np.zeros((0, 6), dtype=np.float32)
+        columns = np.concatenate(self.box_columns) if self.box_columns else np.zeros((0, 4))
+        summaries = sorted(self.summaries, key=lambda summary: self.file_ids[summary['file']])
+        np.savez_compressed(
+            self.path,
+            categories=np.array(self.categories),
+            file=np.array([summary['file'] for summary in summaries]),
+            file_frames=np.array([summary['frames'] for summary in summaries], dtype=np.int64),
+            file_alerts=np.array([len(summary['alerts']) for summary in summaries], dtype=np.int64),
+            file_first_alert=np.array([summary['alerts'][0] if summary['alerts'] else -1 for summary in summaries], dtype=np.int64),
+            file_failed=np.array([summary['failed'] for summary in summaries], dtype=np.int64),
+            file_error=np.array([summary['error'] or '' for summary in summaries]),
+            box_file=columns[:, 0].astype(np.int64),
+            box_frame=columns[:, 1].astype(np.int64),
+            box_time=columns[:, 2],
+            box_alert=columns[:, 3].astype(bool),
+            boxes=boxes[:, :4],
+            confidence=boxes[:, 4],
+            class_id=boxes[:, 5].astype(np.int64),
+        )
+
+
+class BulkDetection:
+    def __init__(self, detection=None, workers: int = None, batch_size: int = 8, stride: int = 1, preprocessing: dict = None,
+                 queue_size: int = 64, size_threshold: float = 0.7, confidence_thresholds: tuple = None, momentum_thresholds: list = None,
+                 poll: float = 1.0):
+        """ Offline detection over files with the filters and the temporal evidence of Detect
+
+        Args:
+            detection (Detect, optional): Detector, its engine or its inference server client is used. Defaults to
+                a Detect loaded once the decoding processes are forked, so they do not inherit the engine.
+            workers (int, optional): Decoding processes. Defaults to the CPU count minus one.
+            batch_size (int, optional): Frames per detector call. Defaults to 8.
+            stride (int, optional): Detect one of every stride frames of the videos. Defaults to 1.
+            preprocessing (dict, optional): Preprocessing section to apply to the frames, for raw camera footage. Defaults to None.
+            queue_size (int, optional): Decoded frames waiting for the detector. Defaults to 64.
+            size_threshold (float, optional): Threshold of filter_gigant_bounding_boxes. Defaults to 0.7.
+            confidence_thresholds (tuple, optional): Thresholds of filter_confidence. Defaults to the ones of Detect.
+            momentum_thresholds (list, optional): Thresholds of the temporal evidence. Defaults to the ones of Detect.
+            poll (float, optional): Seconds without frames before checking that the decoding processes are alive. Defaults to 1.0.
+        """
+        self.detection = detection
+        self.workers = workers or max(multiprocessing.cpu_count() - 1, 1)
+        self.batch_size = batch_size
+        self.stride = stride
+        self.preprocessing = preprocessing
+        self.queue_size = queue_size
+        self.size_threshold = size_threshold
+        self.poll = poll
+        self.classes = ('Gun', 'Knife')
+        self.confidence_thresholds = dict(zip(self.classes, confidence_thresholds or Detect.confidence_thresholds))
+        # Every file is a stream of its own, as if it was a camera
+        self.evidence = TemporalEvidence(self.classes, momentum_thresholds or Detect.momentum_thresholds, window=6, decay=Detect.constant)
+
+    def run(self, files: list, writer) -> dict:
+        """ Detect over the files and write the results
+
+        Args:
+            files (list): Image and video paths
+            writer (JSONLWriter or ColumnarWriter): Output
+
+        Returns:
+            dict: Files, frames, frames per second, files with alerts and files with errors
+        """
+        tasks, frames = multiprocessing.Queue(), multiprocessing.Queue(self.queue_size)
+        for task in enumerate(files):
+            tasks.put(task)
+        processes = [multiprocessing.Process(target=decode, args=(tasks, frames, self.stride, self.preprocessing), daemon=True) for _ in range(self.workers)]
+        for process in processes:
+            tasks.put(None)
+            process.start()
+        if self.detection is None:
+            self.detection = Detect() if trt is not None else Detect(in_flight=self.batch_size)
+
+        start = time.time()
+        self.summaries = {file_id: {'file': path, 'frames': 0, 'failed': 0, 'alerts': [], 'max_confidence': dict.fromkeys(self.classes, 0.0), 'error': None}
+                          for file_id, path in enumerate(files)}
+        finished = set()
+        batch, running = [], len(processes)
+        while running:
+            try:
+                item = frames.get(timeout=self.poll)
+            except queue.Empty:
+                # A process killed, e.g. out of memory, never sends its end marker
+                if not any(process.is_alive() for process in processes):
+                    print("Decoding processes exited with codes", [process.exitcode for process in processes])
+                    break
+                continue
+            if item is None:
+                running -= 1
+            elif item[1] is None:
+                # The frames of the file still in the batch come first
+                self.flush(batch, writer)
+                self.finish(item[0], item[3], writer)
+                finished.add(item[0])
+            else:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch, writer)
+        self.flush(batch, writer)
+        for file_id in sorted(set(self.summaries) - finished):
+            self.finish(file_id, 'Decoding process exited before the end of the file', writer)
+        for process in processes:
+            process.join()
+        writer.close()
+
+        elapsed = time.time() - start
+        total = sum(summary['frames'] for summary in self.summaries.values())
+        return {
+            'files': len(files),
+            'frames': total,
+            'fps': round(total / elapsed, 2) if elapsed else None,
+            'files_with_alerts': sum(bool(summary['alerts']) for summary in self.summaries.values()),
+            'errors': sum(summary['error'] is not None for summary in self.summaries.values()),
+        }
+
+    def flush(self, batch: list, writer):
+        if not batch:
+            return
+        for (file_id, index, seconds, frame), detections in zip(batch, predict_batch(self.detection, [item[3] for item in batch])):
+            summary = self.summaries[file_id]
+            if isinstance(detections, Exception):
+                summary['failed'] += 1
+                summary['error'] = "{} frames not detected, last: {}".format(summary['failed'], str(detections) or type(detections).__name__)
+                continue
+            boxes = detections.filter_size(frame.shape[1], frame.shape[0], self.size_threshold).filter_confidence(self.confidence_thresholds)
+            alert = self.evidence.observe(boxes, file_id)
+            summary['frames'] += 1
+            if alert:
+                summary['alerts'].append(index)
+            for name, confidence in zip(self.classes, boxes.max_confidence(self.classes)):
+                summary['max_confidence'][name] = max(summary['max_confidence'][name], round(float(confidence), 3))
+            writer.frame(summary['file'], index, seconds, boxes, alert)
+        del batch[:]
+
+    def finish(self, file_id: int, error: str, writer):
+        summary = self.summaries[file_id]
+        summary['error'] = error or summary['error']
+        self.evidence.reset(file_id)
+        writer.summary(summary)
+        print("{}: {} frames, {} alerts{}".format(summary['file'], summary['frames'], len(summary['alerts']), ', ' + summary['error'] if summary['error'] else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Images, videos and folders')
+    parser.add_argument('--output', default='detections.jsonl')
+    parser.add_argument('--format', choices=('jsonl', 'npz'), default='jsonl')
+    parser.add_argument('--workers', type=int, help='Decoding processes, defaults to the CPU count minus one')
+    parser.add_argument('--batch', type=int, default=8, help='Frames per detector call')
+    parser.add_argument('--stride', type=int, default=1, help='Detect one of every stride frames of the videos')
+    parser.add_argument('--preprocess', action='store_true', help='Apply the preprocessing of the configuration, for raw camera footage')
+    parser.add_argument('--confidence', type=float, nargs=2, metavar=('GUN', 'KNIFE'), help='Confidence thresholds')
+    parser.add_argument('--momentum', type=float, nargs=2, metavar=('GUN', 'KNIFE'), help='Momentum thresholds')
+    parser.add_argument('--size', type=float, default=0.7, help='Max box size as a fraction of the frame')
+    parser.add_argument('--config', default='config/config.yml')
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    bulk = BulkDetection(None, args.workers, args.batch, args.stride, config['preprocessing'] if args.preprocess else None,
+        size_threshold=args.size, confidence_thresholds=args.confidence, momentum_thresholds=args.momentum)
+    writer = JSONLWriter(args.output) if args.format == 'jsonl' else ColumnarWriter(args.output)
+    print(bulk.run(files, writer))
+
+
+if __name__ == '__main__':
+    main()
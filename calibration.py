@@ -1,26 +1,158 @@
+import argparse
+import copy
 import cv2
+import json
+import multiprocessing
 import numpy as np
+import os
+import sys
 import yaml
 import time
 from modules.preprocessing.background_remover import BackgroundRemover
 from modules.preprocessing.image_preprocessing import ImagePreprocessor
+from modules.camera.camera import CameraReader
+from utils.csi import CaptureConfig
 # from modules.preprocessing.image_preprocessing import ImagePreprocessor
 
-try:
+from modules.model.session import trt
+if trt is not None:
     from modules.model.detect_w_trt import Detect
-except ModuleNotFoundError:
+else:
     from modules.model.detect import Detect
 
 with open("config/config.yml", 'r') as ymlfile:
     cfg = yaml.safe_load(ymlfile)
     image = cfg['preprocessing']
     CAMERA = cfg['camera']
+    CAPTURE = CaptureConfig(image, **(cfg.get('capture') or {}))
     print("Camera:", CAMERA)
     background_threshold = cfg['background_threshold']
+    background_model = cfg.get('background_model')
 
-if __name__ == '__main__':
-    imagePreprocessor = ImagePreprocessor(image)
-    background_remover = BackgroundRemover(threshold=background_threshold)
+
+def replay_combination(job: tuple, detection=None) -> dict:
+    """ Replay the clip with a combination of parameters, in a process of the pool with the stand-in detector or
+    in the main process with the detector
+
+    Args:
+        job (tuple): Clip path (None for the synthetic clip), timeline, parameters and options of the replay
+        detection (Detect, optional): Detector shared by the combinations, its momentum is reset before the replay.
+            Defaults to None, the stand-in of replay.py.
+
+    Returns:
+        dict: The parameters and their score
+    """
+    from replay import Replay, read_clip, synthetic_clip
+    clip, timeline, params, options = job
+    config = copy.deepcopy(cfg)
+    config['preprocessing'].update(alpha=params['alpha'], beta=params['beta'], width=params['width'], height=params['height'])
+    config['background_threshold'] = params['background_threshold']
+    if detection is not None:
+        detection.evidence.reset()
+    replay = Replay(timeline, config, detection, false_positives=options['false_positives'], seed=options['seed'])
+    results = replay.run(read_clip(clip) if clip else synthetic_clip(timeline, seed=options['seed']))
+
+    detected = [t for t in results['time_to_alert_s'] if t is not None]
+    return {
+        'params': params,
+        'detection_rate': round(len(detected) / len(timeline.weapons), 3) if timeline.weapons else None,
+        'false_alarms_per_hour': round(results['false_alarms'] * 3600 / results['duration_s'], 2) if results['duration_s'] else 0.0,
+        'mean_time_to_alert_s': round(sum(detected) / len(detected), 3) if detected else None,
+        'detector_frames': results['detector_frames'],
+        'latency_p50_ms': results['latency_ms']['p50'],
+        'latency_p95_ms': results['latency_ms']['p95'],
+    }
+
+
+def rank(score: dict, max_latency: float = None) -> tuple:
+    """ Sort key of a score: combinations over the latency budget last, then the highest detection rate, the
+    fewest false alarms, the fastest alert and the fewest frames sent to the detector. Only the latency budget
+    depends on the machine, so the same clip always gives the same ranking """
+    return (
+        max_latency is not None and score['latency_p95_ms'] is not None and score['latency_p95_ms'] > max_latency,
+        -(score['detection_rate'] or 0),
+        score['false_alarms_per_hour'],
+        score['mean_time_to_alert_s'] if score['mean_time_to_alert_s'] is not None else float('inf'),
+        score['detector_frames'],
+    )
+
+
+def autotune():
+    """ Sweep alpha, beta, size and background threshold by replaying a clip with labelled weapons in a process
+    pool, and save the best combination into config.yml when replayed with the detector """
+    parser = argparse.ArgumentParser(description="Tune the preprocessing by replaying a clip, see replay.py for the timeline format")
+    parser.add_argument('--autotune', metavar='CLIP', required=True, help="Video file, 'synthetic' for the synthetic clip of replay.py")
+    parser.add_argument('--timeline', help='Timeline JSON with the weapon intervals, defaults to the clip with the .json extension')
+    parser.add_argument('--alpha', type=float, nargs='+', default=[round(image['alpha'] * x, 2) for x in (0.75, 1, 1.25)])
+    parser.add_argument('--beta', type=float, nargs='+', default=[max(image['beta'] + x, 0) for x in (-25, 0, 25)])
+    parser.add_argument('--size', nargs='+', default=['{}x{}'.format(image['width'], image['height'])], help='Sizes as WIDTHxHEIGHT')
+    parser.add_argument('--threshold', type=int, nargs='+', default=[max(background_threshold + x, 1) for x in (-10, 0, 10)])
+    parser.add_argument('--workers', type=int, default=max(multiprocessing.cpu_count() - 1, 1), help='Processes of the pool, ignored with --engine')
+    parser.add_argument('--max-latency', type=float, help='p95 ms per frame, slower combinations are ranked last')
+    parser.add_argument('--engine', action='store_true', help='Replay with the detector instead of the stand-in of replay.py, one combination at a time in this process')
+    parser.add_argument('--false-positives', type=float, default=0.0, help='Probability of a stand-in box without weapon')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', help='Write the score of every combination to this JSON file')
+    parser.add_argument('--dry-run', action='store_true', help='Do not save the best combination, always the case without --engine')
+    args = parser.parse_args()
+
+    # Imported before the pool is forked, so the workers do not import inference.py again
+    from replay import Timeline
+    clip = None if args.autotune == 'synthetic' else args.autotune
+    if args.timeline or clip:
+        timeline = Timeline.load(args.timeline or os.path.splitext(clip)[0] + '.json')
+    else:
+        timeline = Timeline.synthetic()
+    if not timeline.weapons:
+        sys.exit("The timeline has no weapon intervals to score the detection")
+
+    options = {'false_positives': args.false_positives, 'seed': args.seed}
+    jobs = [
+        (clip, timeline, {'alpha': alpha, 'beta': beta, 'width': int(size.split('x')[0]), 'height': int(size.split('x')[1]), 'background_threshold': threshold}, options)
+        for size in args.size for alpha in args.alpha for beta in args.beta for threshold in args.threshold
+    ]
+    start = time.time()
+    if args.engine:
+        # A single engine and CUDA context: one per process would exhaust the memory shared with the GPU of a
+        # Jetson, and a context does not survive the fork of the pool anyway
+        print("Replaying {} combinations with the detector in this process".format(len(jobs)))
+        detection = Detect()
+        scores = [replay_combination(job, detection) for job in jobs]
+    else:
+        print("Replaying {} combinations in {} processes".format(len(jobs), args.workers))
+        with multiprocessing.Pool(args.workers) as pool:
+            scores = pool.map(replay_combination, jobs, chunksize=1)
+    # sorted is stable, ties keep the order of the grid
+    scores = sorted(scores, key=lambda score: rank(score, args.max_latency))
+    print("Sweep finished in {:.0f} s".format(time.time() - start))
+    for score in scores[:10]:
+        print(score)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(scores, f, indent=2)
+    best = scores[0]['params']
+    if not args.engine:
+        # The stand-in finds the weapon of the timeline wherever it runs, whatever the pixels are
+        print("Scored with the stand-in detector, the scores only reflect the ROI and background removal, not the detection")
+        print("Best combination:", best)
+        print("Not saved, use --engine to save the best combination into config.yml")
+        return
+    if args.dry_run:
+        print("Best combination:", best)
+        return
+    cfg['preprocessing'].update(alpha=best['alpha'], beta=best['beta'], width=best['width'], height=best['height'])
+    cfg['background_threshold'] = best['background_threshold']
+    with open('config/config.yml', 'w') as f:
+        yaml.dump(cfg, f, default_flow_style=False)
+        print("Best combination saved into config.yml:", best)
+
+
+if __name__ == '__main__' and '--autotune' in sys.argv:
+    autotune()
+elif __name__ == '__main__':
+    imagePreprocessor = ImagePreprocessor(image, flip=not (CAPTURE.flip and CAPTURE.at_source(CAMERA)))
+    background_remover = BackgroundRemover.from_config(background_threshold, background_model)
     detection = Detect()
     
     cv2.namedWindow("Calibration")
@@ -38,18 +170,16 @@ if __name__ == '__main__':
     bg = input("Remove background? (y/N): ")
     status = 'learning'
     start_bg_time = time.time()
-    if CAMERA == 'CSI':
-        from utils.csi import gstreamer_pipeline
-        cap = cv2.VideoCapture(gstreamer_pipeline(flip_method=0), cv2.CAP_GSTREAMER)
-    else:
-        cap = cv2.VideoCapture(CAMERA)
+    camera = CameraReader(CAMERA, capture=CAPTURE).start()
+    print(CAPTURE.report(CAMERA))
 
     # Check if the webcam is opened correctly
-    if not cap.isOpened():
+    if camera.read(timeout=10)[2] is None:
+        camera.stop()
         raise IOError("Cannot open webcam")
 
     while True:
-        ret, frame = cap.read()
+        _, _, frame = camera.read()
         
         try:
             cv2.imshow('Input', frame)
@@ -57,11 +187,7 @@ if __name__ == '__main__':
             print(frame)
             continue
 
-        image = imagePreprocessor.pipeline(frame,
-            imagePreprocessor.resize_image,
-            imagePreprocessor.flip_image,
-            imagePreprocessor.change_contrast_and_brightness,
-        )
+        image = imagePreprocessor.preprocess(frame)
         
         cv2.imshow('Preprocessed', image)
         
@@ -78,7 +204,7 @@ if __name__ == '__main__':
                 continue
             
             if status == 'standby':
-                image = background_remover.remove_background(image)
+                image = background_remover.remove_background(image, update=True)
                 print("Background removed")
 
         detected, results = detection.detection(image)
@@ -107,7 +233,7 @@ if __name__ == '__main__':
         if c == 27: # ESC
             break
 
-    cap.release()
+    camera.stop()
     cv2.destroyAllWindows()
     
     cfg['preprocessing'] = imagePreprocessor.get_params()
@@ -1,32 +1,103 @@
+import time
+from modules.metrics.phases import Phases
+PHASES = Phases('inference') # Started first, so the report includes the imports
+
 import requests
 import cv2
-import time
 import sys
+import threading
 import yaml
-import datetime
-import os
 
-try:
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.model.session import trt
+if trt is not None:
     from modules.model.detect_w_trt import Detect
-except ModuleNotFoundError:
+else:
     from modules.model.detect import Detect
 from modules.preprocessing.image_preprocessing import ImagePreprocessor
 from modules.preprocessing.background_remover import BackgroundRemover
+from modules.preprocessing.roi import RegionFinder
+from modules.pipeline.pipeline import Pipeline
+from modules.camera.camera import CameraReader
+from modules.evidence.evidence_writer import EvidenceWriter
+from modules.metrics.metrics import METRICS
+from modules.transport.control import ControlClient
+from modules.transport.events import EventSubscriber
+from modules.transport.frame_ring import FrameRing
+from utils.csi import CaptureConfig
 
-time.sleep(5)
-
-with open('config/config.yml') as f:
+with PHASES.phase('config'), open('config/config.yml') as f:
     config = yaml.safe_load(f)
     CAMERA = config['camera']
+    CAPTURE = CaptureConfig(config['preprocessing'], **(config.get('capture') or {}))
     background_threshold = config['background_threshold']
+    PIPELINE = config.get('pipeline') or {}
+    TRANSPORT = config.get('transport') or {}
 weapon = None
 last_weapon = None
 global_time = time.time()
 class APIHandler:
     server_url = 'http://127.0.0.1:5000'
     prev_status = None
+    control = None
+    events = None
+
+    def wait_for_server(self, timeout: float = 60.0) -> str:
+        """ Wait until the server is ready: its control socket accepts connections in local mode, the HTTP
+        status answers otherwise. The server opens the socket before it logs in, so it is usually ready at
+        the first attempt, then it is retried with a growing delay instead of polling every second
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Defaults to 60.0.
+
+        Raises:
+            ConnectionError: If the server is not ready in time
+
+        Returns:
+            str: The status of the server
+        """
+        delay, deadline = 0.02, time.time() + timeout
+        while True:
+            if TRANSPORT.get('mode') == 'local':
+                try:
+                    self.control = ControlClient(TRANSPORT['socket'])
+                    return self.control.request('get_status')
+                except OSError as e:
+                    self.control = None
+                    error = e
+            try:
+                return requests.get(self.server_url + '/status', timeout=1.0).json()['message']
+            except (requests.RequestException, ValueError, KeyError) as e:
+                error = e
+            if time.time() + delay > deadline:
+                raise ConnectionError("Server not ready after {} s: {}".format(timeout, error))
+            if delay == 0.02:
+                print('Waiting for server...')
+            time.sleep(delay)
+            delay = min(2 * delay, 1.0)
+
+    def subscribe_events(self, timeout: float = 2.0):
+        """ Keep status and motion up to date with the changes pushed by the server, so reading them
+        needs no request per frame. The requests are kept as a fallback while it is not connected
+
+        Args:
+            timeout (float, optional): Seconds to wait for the first snapshot. Defaults to 2.0.
+        """
+        self.events = EventSubscriber(
+            address=TRANSPORT['socket'] if self.control else None,
+            url=self.server_url + '/events'
+        ).start()
+        if not self.events.connected.wait(timeout):
+            print("Events not available yet, requesting status and motion meanwhile")
 
     def get_status(self):
+        try:
+            return self.events.get('status')
+        except (AttributeError, KeyError):
+            pass
+        if self.control:
+            return self.control.request('get_status')
         attempt = 0
         while True:
             response = requests.get(self.server_url + '/status')
@@ -40,6 +111,35 @@ class APIHandler:
                     raise Exception("Server not responding")
                 time.sleep(1)            
 
+    def start_metrics(self, interval: float = 5.0):
+        """ Push the metrics of this process to the server from a background thread, so no frame waits for it
+
+        Args:
+            interval (float, optional): Seconds between pushes. Defaults to 5.0.
+        """
+        threading.Thread(target=self.push_metrics, args=(interval,), name='metrics', daemon=True).start()
+
+    def push_metrics(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.push_metrics_once()
+
+    def push_metrics_once(self):
+        """ Send the metrics of this process to the server, it serves them on /metrics with its own """
+        if self.camera:
+            METRICS.set('dropped_frames_total', self.camera.dropped_frames, {'stage': 'camera'})
+        if self.pipeline:
+            for name, stage in self.pipeline.stats().items():
+                METRICS.set('dropped_frames_total', stage['dropped'], {'stage': name})
+        METRICS.set('dropped_frames_total', self.evidenceWriter.dropped, {'stage': 'evidence'})
+        try:
+            if self.control:
+                self.control.request('push_metrics', metrics=METRICS.snapshot())
+            else:
+                requests.post(self.server_url + '/metrics', json=METRICS.snapshot(), timeout=1.0)
+        except (OSError, requests.RequestException) as e:
+            print("Metrics not pushed:", e)
+
     @property
     def status(self):
         return self.prev_status if self.prev_status else self.get_status()
@@ -61,59 +161,100 @@ class APIHandler:
             
         if self.prev_status != status:
             global_time = time.time()
-            response = requests.post(self.server_url + '/status', json=data)
+            if self.control:
+                message = self.control.request('set_status', **data)
+            else:
+                message = requests.post(self.server_url + '/status', json=data).json()['message']
             self.prev_status = status
-            print(response.json()['message'])
+            if self.events:
+                self.events.set('status', status)
+            print(message)
     @property
     def motion(self):
+        try:
+            return self.events.get('motion')
+        except (AttributeError, KeyError):
+            pass
+        if self.control:
+            return self.control.request('get_motion')
         response = requests.get(self.server_url + '/motion')
         return response.json()['message']
     
 class StreamHandler:
-    if CAMERA == 'CSI':
-        from utils.csi import gstreamer_pipeline
-        video_capture = cv2.VideoCapture(gstreamer_pipeline(flip_method=0), cv2.CAP_GSTREAMER)
-    else:
-        video_capture = cv2.VideoCapture(CAMERA)
-        
+    camera = None
+    frame_sequence = 0
+    frame_time = None
+    stream_session = None
+    viewers = None
+    last_frame_sent = 0
+    frame_ring = None
+    pipeline = None
+
+    def start_camera(self):
+        self.camera = CameraReader(CAMERA, capture=CAPTURE).start()
+        print(CAPTURE.report(CAMERA))
+
+    def open_frame_ring(self):
+        """ Send frames through the shared memory ring of the server, HTTP is kept when it is not available """
+        if TRANSPORT.get('mode') != 'local':
+            return
+        try:
+            self.frame_ring = FrameRing.open(TRANSPORT['frames'])
+        except (OSError, ValueError) as e:
+            print("Shared memory frames not available, using HTTP:", e)
+
     def convert_to_bytes(self, frame):
-        _, image_data = cv2.imencode('.jpg', frame)
+        with METRICS.time('encode'):
+            _, image_data = cv2.imencode('.jpg', frame)
         return image_data.tostring()
         
     def get_frame(self):
-        _, frame = self.video_capture.read()
+        with METRICS.time('capture'):
+            self.frame_sequence, self.frame_time, frame = self.camera.read()
         return frame
     
     def send_frame(self, image):
-        response = requests.post(self.image_url, data=self.convert_to_bytes(image))
+        if self.frame_ring:
+            try:
+                return self.frame_ring.write(image, self.frame_time)
+            except ValueError as e:
+                print(e)
+        # Without viewers a frame per second is enough to know when someone starts watching
+        if self.viewers == 0 and time.time() - self.last_frame_sent < 1:
+            return None
+        if self.stream_session is None:
+            self.stream_session = requests.Session() # Keep-alive connection used only to post frames
+        response = self.stream_session.post(self.image_url, data=self.convert_to_bytes(image), headers={'Content-Type': 'image/jpeg'})
+        self.last_frame_sent = time.time()
+        self.viewers = int(response.headers.get('X-Viewers', 1))
         return response
 
 class ImageHandler:
-    config = yaml.safe_load(open("config/config.yml"))
-    imagePreprocessor = ImagePreprocessor(config['preprocessing'])
-    backgroundRemover = BackgroundRemover(threshold=background_threshold)   
+    # Frames alive at the same time: the ones in the pipeline queues and the one of every stage
+    imagePreprocessor = ImagePreprocessor(config['preprocessing'], buffers=2 * PIPELINE.get('queue_size', 2) + 4,
+        flip=not (CAPTURE.flip and CAPTURE.at_source(CAMERA)))
+    backgroundRemover = BackgroundRemover.from_config(background_threshold, config.get('background_model'))
+    roi = config.get('roi') or {}
+    regionFinder = RegionFinder(**{key: value for key, value in roi.items() if key != 'enabled'}) if roi.get('enabled') else None
     
     def preprocess(self, image):
         try:
-            return self.imagePreprocessor.pipeline(image,
-                self.imagePreprocessor.resize_image,
-                self.imagePreprocessor.flip_image,
-                self.imagePreprocessor.change_contrast_and_brightness,
-            )
+            with METRICS.time('preprocess'):
+                return self.imagePreprocessor.preprocess(image)
         except cv2.error as e:
             print(e)
             return image
     
     def background_removal(self, image):
         print("Removing bg...")
-        return self.backgroundRemover.remove_background(image)
+        with METRICS.time('background_removal'):
+            return self.backgroundRemover.remove_background(image, update=True)
     
     def background_learning(self, frame):
-        if self.status == 'standby' and (time.time() - self.start_bg_time) > 300:
-            self.status = 'learning'
-            self.start_bg_time = time.time() # Reset start time for background learning
-        
-        elif self.status == 'learning' and (time.time() - self.start_bg_time) > self.backgroundRemover.learning_time:
+        """ Learn the background while the status is learning. There is no periodic relearning,
+        the background model keeps adapting to every frame once it is learned.
+        """
+        if self.status == 'learning' and (time.time() - self.start_bg_time) > self.backgroundRemover.learning_time:
             print("Background learned in ", time.time() - self.start_bg_time, " seconds")
             self.status = 'standby'
             self.backgroundRemover.set_static_background()
@@ -127,21 +268,46 @@ class ImageHandler:
                 print("Motion detected while learning background")
                 print("Background learning stopped")
                 self.status = 'standby'
+                self.backgroundRemover.set_static_background()
         return frame
         
 class InferenceHandler(APIHandler, StreamHandler, ImageHandler):
-    detection = Detect()
+    detection = None
     
-    def __init__(self):
+    def __init__(self, camera_timeout: float = 10.0):
+        """ Load the detector, open the camera and connect to the server at the same time, the detector
+        and the camera do not need the server
+
+        Args:
+            camera_timeout (float, optional): Max seconds to wait for the first frame. Defaults to 10.0.
+        """
         global global_time
         self.image_url = self.server_url + '/video_feed'
-        while self.status not in ['standby', 'learning', 'starting', 'running', 'sent', 'alarm', 'password']:
-            print('Waiting for server...')
-            time.sleep(1)
-        print('Server is ready!')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            camera = executor.submit(PHASES.run, 'camera', self.open_camera, camera_timeout)
+            server = executor.submit(PHASES.run, 'server', self.connect_server)
+            # The engine is loaded on this thread, the CUDA context of pycuda.autoinit belongs to it
+            self.detection = PHASES.run('engine', Detect)
+            server.result()
+            camera.result()
+        self.evidenceWriter = EvidenceWriter.from_config(config.get('evidence')).start()
+        self.start_metrics()
         self.status = 'learning'
         self.start_bg_time = time.time()
         global_time = time.time()
+        print(PHASES.report())
+
+    def connect_server(self):
+        self.wait_for_server()
+        print('Server is ready!')
+        self.subscribe_events()
+        self.open_frame_ring()
+
+    def open_camera(self, timeout: float):
+        """ Start the camera and wait for its first frame """
+        self.start_camera()
+        if self.camera.read(timeout)[2] is None:
+            print("No frame from the camera after {} s, it keeps retrying".format(timeout))
     
     def state_machine(self) -> bool:
         """ The state machine for the pin.
@@ -168,7 +334,135 @@ class InferenceHandler(APIHandler, StreamHandler, ImageHandler):
             return False # Return False
     
     def obj_detect(self, image):
-        return self.detection.detection(image)
+        """ Detect weapons only in the regions with foreground, the detector does not run when there is none """
+        if self.regionFinder is None or self.backgroundRemover.mask is None:
+            return self.detection.detection(image)
+        return self.detection.detection(image, self.regionFinder.find(self.backgroundRemover.mask))
+
+    def process_frame(self, frame, show: bool = True) -> tuple:
+        """ Run the state machine, the background handling and the detection over a preprocessed frame
+
+        Args:
+            frame (np.ndarray): The preprocessed frame
+            show (bool, optional): Show the frame without background in a window. Defaults to True.
+
+        Returns:
+            tuple: The annotated frame and a boolean value that determines if a weapon was detected
+        """
+        global weapon, last_weapon
+        weapon_detection = self.state_machine()
+        frame = self.background_learning(frame)
+        detected = False
+
+        if weapon_detection: # If motion is detected
+            try:
+                frame_wo_bg = self.background_removal(frame)
+            except Exception as e:
+                print(e)
+            detected, results = self.obj_detect(frame_wo_bg)
+            # print("Detected: ", detected)
+            # print("Results: ", results)
+
+            if show:
+                try:
+                    cv2.imshow('proprocessed frame', frame_wo_bg)
+                except cv2.error as e:
+                    pass
+
+            if detected:
+                weapon = results[0]['class']
+                METRICS.inc('detections_total', {'class': weapon})
+                self.status = 'sent'
+
+                print("-"*10, results, "-"*10)
+
+                # raise Exception("Weapon detected")
+                weapon_detection = False
+
+            if results:
+                try:
+                    # print(results)
+                    start_point = int(results[0]['x'] - results[0]['width']//2), int(results[0]['y'] - results[0]['height']//2)
+                    end_point = int(results[0]['x'] + results[0]['width']//2), int(results[0]['y'] + results[0]['height']//2)
+                    cv2.rectangle(frame,
+                        start_point,
+                        end_point,
+                        (0, 255, 0),
+                        2)
+                    cv2.putText(frame, f"{results[0]['class']}: {results[0]['confidence']}", (start_point[0], start_point[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+                    last_weapon = results[0]['class']
+                except (IndexError, KeyError) as e:
+                    print(e)
+        elif self.status != 'learning':
+            self.backgroundRemover.update(frame) # Keep adapting the background while nobody is moving
+
+        if self.status == 'sent':
+            message = f"Alarm will sound in {15 - int(time.time() - global_time)} seconds"
+            cv2.putText(frame, message, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+
+        if self.status == 'alarm' or self.status == 'sent':
+            self.status = self.get_status()
+
+        return frame, detected
+
+    def publish_frame(self, frame, detected: bool, fps: float):
+        """ Hand the frame to the evidence writer, it saves the frames around a detection, and send it to the server
+
+        Args:
+            frame (np.ndarray): The annotated frame
+            detected (bool): If a weapon was detected in the frame
+            fps (float): Frames per second drawn in the right bottom corner
+        """
+        self.evidenceWriter.add(frame, detected)
+
+        # Add fps to right bottom corner
+        cv2.putText(frame, f"FPS: {fps}", (frame.shape[1] - 170, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+
+        with METRICS.time('publish'):
+            self.send_frame(frame)
+
+def run_sequential(inferenceHandler: InferenceHandler):
+    """ Run every step of the inference one after another for each frame """
+    while True:
+        start_time = time.time()
+        # print("Status: ", inferenceHandler.status)
+        frame = inferenceHandler.get_frame()
+        frame = inferenceHandler.preprocess(frame)
+        frame, detected = inferenceHandler.process_frame(frame)
+
+        # print("Inference time: ", time.time() - global_time)
+        fps = round(1.0 / (time.time() - start_time),2)
+        inferenceHandler.publish_frame(frame, detected, fps)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+def run_pipeline(inferenceHandler: InferenceHandler):
+    """ Run capture, preprocess, detect and publish as pipeline stages, each one in its own thread.
+    The state machine only runs in the detect stage, so its semantics are the same as in the sequential mode.
+    """
+    last_publish = [time.time()]
+
+    def publish(item):
+        frame, detected = item
+        now = time.time()
+        fps = round(1.0 / max(now - last_publish[0], 1e-6), 2)
+        last_publish[0] = now
+        inferenceHandler.publish_frame(frame, detected, fps)
+
+    pipeline = inferenceHandler.pipeline = Pipeline(queue_size=PIPELINE.get('queue_size', 2))
+    pipeline.add_stage('capture', inferenceHandler.get_frame)
+    pipeline.add_stage('preprocess', inferenceHandler.preprocess)
+    pipeline.add_stage('detect', lambda frame: inferenceHandler.process_frame(frame, show=False))
+    pipeline.add_stage('publish', publish)
+    try:
+        pipeline.run_forever(report_interval=PIPELINE.get('report_interval', 10))
+    finally:
+        print(pipeline.report())
+        print("Camera:", inferenceHandler.camera.stats())
+        print("Evidence:", inferenceHandler.evidenceWriter.stats())
+        if inferenceHandler.regionFinder:
+            print("Regions:", inferenceHandler.regionFinder.stats())
 
 if __name__ == '__main__':
     try:
@@ -178,74 +472,11 @@ if __name__ == '__main__':
         if status not in ['standby', 'learning', 'starting', 'running', 'sent', 'alarm', 'password']:
             print("Server connection not established")
             sys.exit(1)
-        while True:
-            start_time = time.time()
-            # print("Status: ", inferenceHandler.status)
-            frame = inferenceHandler.get_frame()
-            frame = inferenceHandler.preprocess(frame)
-            weapon_detection = inferenceHandler.state_machine()
-            frame = inferenceHandler.background_learning(frame)
-            detected = False
-            
-            if weapon_detection: # If motion is detected
-                try:
-                    frame_wo_bg = inferenceHandler.background_removal(frame)
-                except Exception as e:
-                    print(e)
-                detected, results = inferenceHandler.obj_detect(frame_wo_bg)
-                # print("Detected: ", detected)
-                # print("Results: ", results)
-                
-                try:
-                    cv2.imshow('proprocessed frame', frame_wo_bg)
-                except cv2.error as e:
-                    pass
-                    
-                if detected:
-                    weapon = results[0]['class']
-                    inferenceHandler.status = 'sent'
-                    
-                    print("-"*10, results, "-"*10)
-                    
-                    # raise Exception("Weapon detected")
-                    weapon_detection = False
-                
-                if results:
-                    try:
-                        # print(results)
-                        start_point = int(results[0]['x'] - results[0]['width']//2), int(results[0]['y'] - results[0]['height']//2)
-                        end_point = int(results[0]['x'] + results[0]['width']//2), int(results[0]['y'] + results[0]['height']//2)
-                        cv2.rectangle(frame, 
-                            start_point,
-                            end_point,
-                            (0, 255, 0),
-                            2)
-                        cv2.putText(frame, f"{results[0]['class']}: {results[0]['confidence']}", (start_point[0], start_point[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                        last_weapon = results[0]['class']
-                    except (IndexError, KeyError) as e:
-                        print(e)
-            if detected:
-                now = datetime.datetime.now()
-                p = os.path.sep.join(['images', "img_{}.png".format(str(now).replace(":",''))])
-                cv2.imwrite(p, frame)
-            
-            if inferenceHandler.status == 'sent':
-                message = f"Alarm will sound in {15 - int(time.time() - global_time)} seconds"
-                cv2.putText(frame, message, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-                
-            if inferenceHandler.status == 'alarm' or inferenceHandler.status == 'sent':
-                inferenceHandler.status = inferenceHandler.get_status()
-            
-            # print("Inference time: ", time.time() - global_time)
-            # Add fps to right bottom corner
-            fps = round(1.0 / (time.time() - start_time),2)
-            cv2.putText(frame, f"FPS: {fps}", (frame.shape[1] - 170, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-            
-            inferenceHandler.send_frame(frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-    except requests.exceptions.ConnectionError:
+        if '--pipeline' in sys.argv or PIPELINE.get('enabled', False):
+            run_pipeline(inferenceHandler)
+        else:
+            run_sequential(inferenceHandler)
+    except (requests.exceptions.ConnectionError, ConnectionError):
         print("Server is not running\nPress Ctrl+C to exit")
         sys.exit(1)
     except KeyboardInterrupt:
@@ -1,21 +1,148 @@
 import aiohttp
-import requests
+import asyncio
+import inspect
+import json
 import sys
+import threading
 import yaml
 
 from pathlib import Path
 
+from .notifications import NotificationQueue
+
 class ApiClient:
     base_path = Path(__file__).parent
     filename = (base_path / "config.yml").resolve()
     node_config = None
     node_data = None
     status = None
+    notifications = None
     
-    def __init__(self, base_url: str, token: str):
+    def __init__(self, base_url: str, token: str = None, timeout: float = 5.0, retries: int = 2, backoff: float = 0.5, pool_size: int = 4):
+        """ Client of the backend API. Every request goes through a single aiohttp session with a pool of
+        keep-alive connections, owned by an event loop in a background thread, so the TLS handshake is paid
+        once. Coroutines of any event loop and synchronous code of any thread share it.
+
+        Args:
+            base_url (str): Url of the API
+            token (str, optional): Bearer token, it can be set later with authorize. Defaults to None.
+            timeout (float, optional): Seconds for a whole request. Defaults to 5.0.
+            retries (int, optional): Retries of a request that could not connect, timed out or got a 5xx. Defaults to 2.
+            backoff (float, optional): Seconds before the first retry, doubled on every retry. Defaults to 0.5.
+            pool_size (int, optional): Max connections of the pool. Defaults to 4.
+        """
         print(self.filename)
         self.base_url = base_url
         self.__token = token
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.session = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_loop, name='api', daemon=True)
+        self.thread.start()
+        self.call_soon(self.open_session()).result()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(connector=connector)
+
+    def call_soon(self, coroutine):
+        """ Schedule a coroutine on the loop of the client
+
+        Returns:
+            concurrent.futures.Future: Its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def call(self, coroutine):
+        """ Await a coroutine of the client from the event loop of the caller """
+        return await asyncio.wrap_future(self.call_soon(coroutine))
+
+    def request_timeout(self):
+        # aiohttp >= 3.3 takes a ClientTimeout, older versions the total seconds
+        if hasattr(aiohttp, 'ClientTimeout'):
+            return aiohttp.ClientTimeout(total=self.timeout)
+        return self.timeout
+
+    def authorize(self, token: str):
+        """ Set the bearer token of the requests """
+        self.__token = token
+
+    async def request(self, method: str, path: str, retries: int = None, authorized: bool = True, strict: bool = False, **kwargs) -> dict:
+        """ Send a request through the pooled session, it must run on the loop of the client
+
+        Args:
+            method (str): HTTP method
+            path (str): Path after the base url
+            retries (int, optional): Retries of the request. Defaults to the retries of the client.
+            authorized (bool, optional): Send the bearer token. Defaults to True.
+            strict (bool, optional): Raise AssertionError when the API rejects the request, i.e. any other 4xx status
+                or a body that is not a JSON object. Defaults to False.
+            **kwargs: Arguments of aiohttp.ClientSession.request, e.g. json or params
+
+        Raises:
+            AssertionError: If strict and the API rejected the request
+            ConnectionError: If the API answered with a 5xx, 408 or 429 status on the last attempt
+            aiohttp.ClientError: If the API could not be reached on the last attempt
+            asyncio.TimeoutError: If the last attempt timed out
+
+        Returns:
+            dict: The JSON response
+        """
+        retries = self.retries if retries is None else retries
+        headers = {'Authorization': f'Bearer {self.__token}'} if authorized and self.__token else {}
+        for attempt in range(retries + 1):
+            try:
+                async with self.session.request(method, self.base_url + path, headers=headers, timeout=self.request_timeout(), **kwargs) as response:
+                    if response.status < 500 and response.status not in (408, 429):
+                        if not strict:
+                            return await response.json(content_type=None)
+                        return self.parse(method, path, response.status, await response.read())
+                    error = ConnectionError(f"{method} {path} answered {response.status}")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt == retries:
+                raise error
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    @staticmethod
+    def parse(method: str, path: str, status: int, body: bytes) -> dict:
+        """ Get the JSON object of an answer that is not retried
+
+        Raises:
+            AssertionError: If the status is an error or the body is not a JSON object
+        """
+        text = body.decode('utf-8', errors='replace')
+        if status >= 400:
+            raise AssertionError(f"{method} {path} answered {status}: {text[:200]}")
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            raise AssertionError(f"{method} {path} answered no JSON object: {text[:200]}")
+        return data
+
+    def close(self, timeout: float = 5.0):
+        """ Stop the delivery of notifications, close the pooled connections and stop the loop of the client """
+        if self.notifications:
+            self.notifications.stop(timeout)
+        if self.session is not None:
+            self.call_soon(self.close_session()).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+    async def close_session(self):
+        closing = self.session.close()
+        if inspect.isawaitable(closing): # Only a coroutine since aiohttp 3.0
+            await closing
+        self.session = None
         
     async def get(self) -> dict:
         """ This method is used to get data from the API
@@ -28,11 +155,8 @@ class ApiClient:
             dict: The response of the API
         """
         
-        url = f"{self.base_url}/nodes"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params={'id': self.node_config['node_id']}, headers={'Authorization': f'Bearer {self.__token}'}) as response:
-                self.node_data = await response.json()
-                return self.node_data
+        self.node_data = await self.call(self.request('GET', '/nodes', params={'id': self.node_config['node_id']}))
+        return self.node_data
             
     async def post(self, data: dict) -> dict:
         """ This method is used to create a new node
@@ -45,14 +169,11 @@ class ApiClient:
             dict: The response of the API
         """
         
-        url = f"{self.base_url}/nodes"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=data, headers={'Authorization': f'Bearer {self.__token}'}) as response:
-                    data = await response.json()
-                    assert 'error' not in data.keys(), data['message']
-                    self.node_data = data
-                    return self.node_data
+            data = await self.call(self.request('POST', '/nodes', json=data))
+            assert 'error' not in data.keys(), data['message']
+            self.node_data = data
+            return self.node_data
         except AssertionError as error:
             print(error)
             sys.exit()
@@ -68,34 +189,94 @@ class ApiClient:
             dict: The response of the API
         """
         
-        url = f"{self.base_url}/nodes/{self.node_config['node_id']}"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.patch(url, json=data, headers={'Authorization': f'Bearer {self.__token}'}) as response:
-                    data = await response.json()
-                    assert 'error' not in data.keys(), data['message']
-                    self.node_data = data
-                    return self.node_data
+            data = await self.call(self.request('PATCH', f"/nodes/{self.node_config['node_id']}", json=data))
+            assert 'error' not in data.keys(), data['message']
+            self.node_data = data
+            return self.node_data
         except AssertionError as error:
             print(error)
             sys.exit()
 
-    def new_alert_notification(self, message: str):
-        """ This method is used to create a new notification synchronously with requests
+    def start_notifications(self, path: str, backoff: float = 1.0, max_backoff: float = 60.0, timeout: float = None, deliver: bool = True):
+        """ Deliver the notifications from a persistent queue in a background thread
 
         Args:
-            message (str): The message of the notification
+            path (str): Directory of the pending notifications
+            backoff (float, optional): Seconds before the first retry, doubled on every failure. Defaults to 1.0.
+            max_backoff (float, optional): Max seconds between retries. Defaults to 60.0.
+            timeout (float, optional): Seconds to wait for the API. Defaults to the timeout of the client.
+            deliver (bool, optional): Start the delivery thread, otherwise the notifications are only saved until
+                notifications.start() is called, e.g. once logged in. Defaults to True.
         """
-        url = f"{self.base_url}/notifications"
-        
+        self.timeout = timeout or self.timeout
+        retry = (ConnectionError, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+        self.notifications = NotificationQueue(self.send_notification, path, backoff, max_backoff, retry)
+        if deliver:
+            self.notifications.start()
+
+    def new_alert_notification(self, message: str = None, weapon: str = None):
+        """ This method is used to create a new notification, it is queued when the notifications were started
+        and sent synchronously otherwise
+
+        Args:
+            message (str, optional): The message of the notification
+            weapon (str, optional): The detected weapon, the message naming the node is written when the
+                notification is sent, so it does not need the node configuration yet
+        """
+        payload = { "message": message, "type": 3 } if message else { "weapon": weapon, "type": 3 }
+        if self.notifications:
+            self.notifications.put(payload)
+            return
         try:
-            response = requests.post(url, json={ "message": message, "type": 3 }, headers={'Authorization': f'Bearer {self.__token}'})
-            data = response.json()
-            print(data)
-            assert 'error' not in data.keys(), data['message']
+            self.send_notification(payload)
         except AssertionError as error:
             print(error)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as error:
+            print("Notification not delivered:", error)
+
+    def send_notification(self, payload: dict) -> dict:
+        """ This method is used to send a notification synchronously, through the pooled session of the client.
+        It is not retried here, the notification queue retries it with its own backoff
+
+        Args:
+            payload (dict): The notification
+
+        Raises:
+            AssertionError: If the API rejected the notification, with a 4xx status, an error or a body that is not JSON
+            ConnectionError: If the API failed or asked to retry later
+            aiohttp.ClientConnectionError: If the API is not reachable
+            asyncio.TimeoutError: If the API did not answer in time
+
+        Returns:
+            dict: The response of the API
+        """
+        if 'message' not in payload and 'weapon' in payload:
+            payload = { "message": self.alert_message(payload['weapon']), "type": payload['type'] }
+        data = self.call_soon(self.request('POST', '/notifications', retries=0, strict=True, json=payload)).result()
+        print(data)
+        if 'error' in data:
+            raise AssertionError(data.get('message') or data['error'])
+        return data
                 
+    def alert_message(self, weapon: str) -> str:
+        """ Message of the alert of a detected weapon, e.g. 'Gun detected at Entrance - Building A by node 3'
+
+        Raises:
+            ConnectionError: If the node is not registered yet, the notification is sent later
+        """
+        if self.node_config is None:
+            raise ConnectionError("Node not registered yet")
+        return ' '.join([
+            (weapon or 'weapon').title(),
+            'detected at',
+            self.node_config['name'],
+            '-',
+            self.node_config['location'],
+            'by node',
+            str(self.node_config['node_id'])
+        ])
+
     def save_config(self, data: dict) -> None:
         """ This method is used to save the configuration of the nodes in a file, this file must only contains node_id, name and location
 
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class NotificationQueue:
+    def __init__(self, send, path: str, backoff: float = 1.0, max_backoff: float = 60.0, retry: tuple = (ConnectionError, TimeoutError)):
+        """ Deliver notifications in a background thread, so the caller never waits for the remote API.
+        Every notification is saved in its own file until it is delivered, so the pending ones are sent
+        again after a restart or a network outage. The ones the API rejects are moved to the rejected
+        directory, so a bad notification never blocks the ones after it.
+
+        Args:
+            send (callable): Sends the payload of a notification. It raises one of the retry exceptions to
+                send it again later, any other exception rejects it.
+            path (str): Directory of the pending notifications
+            backoff (float, optional): Seconds before the first retry, doubled on every failure. Defaults to 1.0.
+            max_backoff (float, optional): Max seconds between retries. Defaults to 60.0.
+            retry (tuple, optional): Exceptions of a failure that is retried, e.g. a timeout. Defaults to
+                ConnectionError and TimeoutError.
+        """
+        self.send = send
+        self.path = path
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry = retry
+        self.rejected_path = os.path.join(path, 'rejected')
+        self.condition = threading.Condition()
+        self.pending = deque()
+        self.sequence = 0
+        self.thread = None
+        self.running = False
+
+        self.delivered = 0
+        self.rejected = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=100)
+
+        os.makedirs(path, exist_ok=True)
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.json'):
+                self.pending.append(os.path.join(path, name))
+        if self.pending:
+            print("{} notifications pending from a previous run".format(len(self.pending)))
+
+    def start(self):
+        """ Start the delivery thread
+
+        Returns:
+            NotificationQueue: The queue itself
+        """
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name='notifications', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def put(self, payload: dict):
+        """ Save a notification and wake up the delivery thread
+
+        Args:
+            payload (dict): JSON body of the notification
+        """
+        with self.condition:
+            self.sequence += 1
+            filename = os.path.join(self.path, '{:.6f}-{:06d}.json'.format(time.time(), self.sequence))
+            # Written to a temporary file first, so a crash never leaves half a notification
+            with open(filename + '.tmp', 'w') as file:
+                json.dump({'created': time.time(), 'payload': payload}, file)
+            os.replace(filename + '.tmp', filename)
+            self.pending.append(filename)
+            self.condition.notify()
+
+    def run(self):
+        delay = self.backoff
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or not self.running)
+                if not self.running:
+                    return
+                filename = self.pending[0]
+
+            try:
+                with open(filename) as file:
+                    notification = json.load(file)
+            except (OSError, ValueError) as e:
+                print("Dropping unreadable notification {}: {}".format(filename, e))
+                self.remove(filename)
+                continue
+
+            try:
+                self.send(notification['payload'])
+            except self.retry as e:
+                self.failures += 1
+                print("Notification not delivered, retrying in {:.0f} s: {}".format(delay, e))
+                with self.condition:
+                    self.condition.wait_for(lambda: not self.running, delay)
+                delay = min(2 * delay, self.max_backoff)
+                continue
+            except Exception as error:
+                print("Notification rejected, moved to {}: {!r}".format(self.rejected_path, error))
+                self.rejected += 1
+                delay = self.backoff
+                self.remove(filename, reject=True)
+                continue
+            else:
+                self.delivered += 1
+                self.latencies.append(time.time() - notification['created'])
+                print("Notification delivered in {:.2f} s".format(self.latencies[-1]))
+            delay = self.backoff
+            self.remove(filename)
+
+    def remove(self, filename: str, reject: bool = False):
+        """ Remove a notification from the queue, a rejected one is kept in the rejected directory to be inspected """
+        with self.condition:
+            self.pending.popleft()
+        try:
+            if reject:
+                os.makedirs(self.rejected_path, exist_ok=True)
+                os.replace(filename, os.path.join(self.rejected_path, os.path.basename(filename)))
+                return
+        except OSError:
+            pass
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """ Get the delivery counters
+
+        Returns:
+            dict: Notifications waiting, delivered, rejected, failed attempts and p50/p95 delivery latency in seconds
+        """
+        latencies = list(self.latencies)
+        return {
+            'depth': len(self.pending),
+            'delivered': self.delivered,
+            'rejected': self.rejected,
+            'failures': self.failures,
+            'latency_p50_s': round(float(np.percentile(latencies, 50)), 3) if latencies else None,
+            'latency_p95_s': round(float(np.percentile(latencies, 95)), 3) if latencies else None,
+        }
@@ -1,26 +1,76 @@
 import aiohttp
+import os
 import sys
+import yaml
 
 from pathlib import Path
 
 
 class Auth:    
-    def __init__(self, base_url: str):
+    base_path = Path(__file__).parent
+    filename = (base_path / "token.yml").resolve()
+    cached = False
+
+    def __init__(self, base_url: str, client=None):
+        """ Authentication against the API
+
+        Args:
+            base_url (str): Url of the API
+            client (ApiClient, optional): Client whose pooled session is used for the login, the connection
+                is then reused by the requests after it. Defaults to a session of its own.
+        """
         self.base_url = base_url
+        self.client = client
         
-    async def login(self, username: str, password: str) -> str or None:
-        """ Login to the API.
+    async def login(self, username: str, password: str, cached: bool = True) -> str or None:
+        """ Login to the API. The token of the last login of the user is reused, so a reboot does not wait
+        for the login, call it again with cached=False when the API rejects it.
         
         Args:
             username (str): The username of the user.
             password (str): The password of the user.
+            cached (bool, optional): Use the token of the last login. Defaults to True.
         """
+        self.cached = False
+        if cached:
+            token = self.cached_token(username)
+            if token:
+                self.cached = True
+                return self.authorize(token)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f'{self.base_url}/auth/login', json={'username': username, 'password': password}) as response:
-                    response = await response.json()
-                    self.token = response['token']
-                    return self.token
+            if self.client is not None:
+                response = await self.client.call(self.client.request('POST', '/auth/login', authorized=False, json={'username': username, 'password': password}))
+            else:
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(f'{self.base_url}/auth/login', json={'username': username, 'password': password}) as response:
+                        response = await response.json()
+            self.save_token(username, response['token'])
+            return self.authorize(response['token'])
         except KeyError:
             print('Username or password incorrect')
-            sys.exit(1)
\ No newline at end of file
+            sys.exit(1)
+
+    def authorize(self, token: str) -> str:
+        self.token = token
+        if self.client is not None:
+            self.client.authorize(token)
+        return token
+
+    def cached_token(self, username: str) -> str or None:
+        """ Get the token of the last login of the user against the same API """
+        try:
+            with open(self.filename) as file:
+                data = yaml.safe_load(file) or {}
+        except OSError:
+            return None
+        if data.get('base_url') == self.base_url and data.get('username') == username:
+            return data.get('token')
+        return None
+
+    def save_token(self, username: str, token: str):
+        """ Save the token, only readable by the user of the node """
+        try:
+            with open(os.open(self.filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+                yaml.dump({'base_url': self.base_url, 'username': username, 'token': token}, file, default_flow_style=False)
+        except OSError as e:
+            print("Token not cached:", e)
@@ -0,0 +1,134 @@
+import threading
+import time
+
+import cv2
+
+
+class CameraReader:
+    def __init__(self, source, reconnect_delay: float = 1.0, max_failures: int = 10, capture=None):
+        """ Read frames from a camera in a background thread, so consumers always get the most recent frame
+        instead of the oldest one waiting in the OpenCV/GStreamer buffer
+
+        Args:
+            source (str or int): 'CSI' for the Jetson CSI camera, otherwise a device index, file or url for cv2.VideoCapture
+            reconnect_delay (float, optional): Seconds to wait before reopening a source that dropped. Defaults to 1.0.
+            max_failures (int, optional): Consecutive failed reads before the source is reopened. Defaults to 10.
+            capture (CaptureConfig, optional): Capture settings of the CSI camera. Defaults to 960x540 frames without flip.
+        """
+        self.source = source
+        self.capture_config = capture
+        self.reconnect_delay = reconnect_delay
+        self.max_failures = max_failures
+
+        self.capture = None
+        self.thread = None
+        self.running = False
+        self.condition = threading.Condition()
+
+        self.frame = None
+        self.sequence = 0
+        self.timestamp = None
+        self.consumed_sequence = 0
+
+        self.dropped_frames = 0
+        self.reconnects = 0
+        self.fps = 0.0
+
+    def open(self) -> cv2.VideoCapture:
+        """ Open the video source
+
+        Returns:
+            cv2.VideoCapture: The opened capture
+        """
+        if self.source == 'CSI':
+            from utils.csi import gstreamer_pipeline
+            pipeline = self.capture_config.pipeline() if self.capture_config else gstreamer_pipeline(flip_method=0)
+            return cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+        return cv2.VideoCapture(self.source)
+
+    def start(self):
+        """ Start the reader thread
+
+        Returns:
+            CameraReader: The reader itself
+        """
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name='camera', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """ Stop the reader thread and release the video source """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(2 * self.reconnect_delay)
+        self.release()
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def run(self):
+        """ Reader loop, it reopens the source when it is not available or keeps failing """
+        failures = 0
+        while self.running:
+            if self.capture is None or not self.capture.isOpened():
+                self.release()
+                self.capture = self.open()
+                if not self.capture.isOpened():
+                    print("Camera not available, retrying in", self.reconnect_delay, "seconds")
+                    time.sleep(self.reconnect_delay)
+                    continue
+                failures = 0
+
+            ret, frame = self.capture.read()
+            if not ret or frame is None:
+                failures += 1
+                if failures >= self.max_failures:
+                    print("Camera dropped, reconnecting...")
+                    self.release()
+                    self.reconnects += 1
+                    time.sleep(self.reconnect_delay)
+                continue
+            failures = 0
+
+            now = time.time()
+            with self.condition:
+                if self.frame is not None and self.consumed_sequence < self.sequence:
+                    self.dropped_frames += 1
+                if self.timestamp is not None and now > self.timestamp:
+                    self.fps = 0.9 * self.fps + 0.1 * (1.0 / (now - self.timestamp))
+                self.frame = frame
+                self.sequence += 1
+                self.timestamp = now
+                self.condition.notify_all()
+
+    def read(self, timeout: float = None) -> tuple:
+        """ Wait for a frame newer than the last one returned
+
+        Args:
+            timeout (float, optional): Max seconds to wait, None waits forever. Defaults to None.
+
+        Returns:
+            tuple: The sequence number, the capture timestamp and the frame, the frame is None on timeout
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.sequence > self.consumed_sequence, timeout):
+                return self.sequence, self.timestamp, None
+            self.consumed_sequence = self.sequence
+            return self.sequence, self.timestamp, self.frame
+
+    def stats(self) -> dict:
+        """ Get the capture counters
+
+        Returns:
+            dict: Capture fps, frames captured, frames dropped before being read and reconnections
+        """
+        return {
+            'fps': round(self.fps, 2),
+            'frames': self.sequence,
+            'dropped': self.dropped_frames,
+            'reconnects': self.reconnects,
+        }
@@ -1,11 +1,14 @@
+import asyncio
 import sys
 from ..auth.auth import Auth
 from modules.api.apiClient import ApiClient
 
-async def cli(base_url: str, username: str, password: str) -> ApiClient:
-    auth = Auth(base_url)
-    token = await auth.login(username, password)    
-    client = ApiClient(base_url, token)
+async def cli(base_url: str, username: str, password: str, client: ApiClient = None) -> ApiClient:
+    # The login opens the pooled connection of the client, the requests after it reuse it
+    client = client or ApiClient(base_url)
+    auth = Auth(base_url, client)
+    login = asyncio.ensure_future(auth.login(username, password))
+    await asyncio.sleep(0) # The login request is sent while the local configuration is verified
     
     try:
         print('Verifying node information...')
@@ -24,8 +27,16 @@ async def cli(base_url: str, username: str, password: str) -> ApiClient:
     else:
         print('Node information verified')        
 
+    await login
     try:
-        await client.compare_local_server()
+        try:
+            await client.compare_local_server()
+        except AssertionError:
+            if not auth.cached:
+                raise
+            print('Cached token not accepted, logging in again')
+            await auth.login(username, password, cached=False)
+            await client.compare_local_server()
     except AssertionError as error:
         print(error)
         if input('Not registered on server, do you want to do it now? (y/N): ') == 'y':
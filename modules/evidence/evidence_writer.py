@@ -0,0 +1,182 @@
+import datetime
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from modules.metrics.metrics import METRICS
+
+
+class EvidenceWriter:
+    FORMATS = {
+        'jpg': lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality],
+        'webp': lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+        # Lossless, the quality is ignored and the fastest compression level is used
+        'png': lambda quality: [cv2.IMWRITE_PNG_COMPRESSION, 1],
+    }
+    PREFIX = 'img_'
+
+    def __init__(self, path: str = 'images', format: str = 'jpg', quality: int = 90, pre_frames: int = 5,
+                 post_frames: int = 5, max_mb: float = 512, queue_size: int = 64):
+        """ Save the frames around a detection as evidence, encoded and written in a background thread, so
+        the detection loop only copies the frame. The last pre_frames frames are kept in a ring of reused
+        buffers and saved with the detected frame and the post_frames frames after it. The oldest evidence
+        is deleted once the images take more than max_mb.
+
+        Args:
+            path (str, optional): Directory of the images. Defaults to 'images'.
+            format (str, optional): jpg, webp or png. Defaults to 'jpg'.
+            quality (int, optional): Quality of jpg and webp, from 0 to 100. Defaults to 90.
+            pre_frames (int, optional): Frames saved before the detection. Defaults to 5.
+            post_frames (int, optional): Frames saved after the detection. Defaults to 5.
+            max_mb (float, optional): Disk quota of the images in MB. Defaults to 512.
+            queue_size (int, optional): Frames waiting to be written, frames are dropped when it is full. Defaults to 64.
+        """
+        if format not in self.FORMATS:
+            raise ValueError("Unknown evidence format {}, use one of {}".format(format, ', '.join(self.FORMATS)))
+        self.path = path
+        self.extension = '.' + format
+        self.params = self.FORMATS[format](int(quality))
+        self.pre_frames = pre_frames
+        self.post_frames = post_frames
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        self.ring = [None] * pre_frames
+        self.filled = 0
+        self.index = 0
+        self.event = None
+        self.event_index = 0
+        self.remaining = 0
+        self.queue = queue.Queue(queue_size)
+        self.thread = None
+        self.running = False
+
+        self.written = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.encode_ms = 0.0
+
+        os.makedirs(path, exist_ok=True)
+        # Evidence of previous runs counts towards the quota, the oldest one is deleted first
+        files = [os.path.join(path, name) for name in os.listdir(path) if name.startswith(self.PREFIX)]
+        self.files = deque((file, os.path.getsize(file)) for file in sorted(files, key=os.path.getmtime))
+        self.bytes = sum(size for _, size in self.files)
+
+    @classmethod
+    def from_config(cls, config: dict = None):
+        """ Build the writer of the evidence section of the configuration, saving PNG frames of the detections
+        only when the section is missing, like the previous snapshots """
+        if config is None:
+            return cls(format='png', pre_frames=0, post_frames=0)
+        return cls(**config)
+
+    def start(self):
+        """ Start the writer thread
+
+        Returns:
+            EvidenceWriter: The writer itself
+        """
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name='evidence', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """ Stop the writer thread once the queued frames are written """
+        if self.running:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            self.running = False
+
+    def add(self, frame: np.ndarray, detected: bool = False):
+        """ Add a frame of the detection loop, it is copied so the caller can reuse it
+
+        Args:
+            frame (np.ndarray): The annotated frame
+            detected (bool, optional): If a weapon was detected in the frame. Defaults to False.
+        """
+        if detected:
+            self.event = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            self.event_index = 0
+            # The buffers of the ring are handed to the writer, new ones are allocated for the next frames
+            for i in range(self.filled):
+                slot = (self.index - self.filled + i) % self.pre_frames
+                self.enqueue(self.ring[slot])
+                self.ring[slot] = None
+            self.filled = 0
+            self.enqueue(frame.copy(), detected=True)
+            self.remaining = self.post_frames
+        elif self.remaining:
+            self.enqueue(frame.copy())
+            self.remaining -= 1
+        elif self.pre_frames:
+            buffer = self.ring[self.index]
+            if buffer is None or buffer.shape != frame.shape:
+                buffer = self.ring[self.index] = np.empty_like(frame)
+            np.copyto(buffer, frame)
+            self.index = (self.index + 1) % self.pre_frames
+            self.filled = min(self.filled + 1, self.pre_frames)
+
+    def enqueue(self, frame: np.ndarray, detected: bool = False):
+        name = '{}{}_{:03d}{}{}'.format(self.PREFIX, self.event, self.event_index, '_detection' if detected else '', self.extension)
+        self.event_index += 1
+        try:
+            self.queue.put_nowait((os.path.join(self.path, name), frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            filename, frame = item
+            start = time.perf_counter()
+            ok, data = cv2.imencode(self.extension, frame, self.params)
+            elapsed = (time.perf_counter() - start) * 1000
+            METRICS.observe('evidence_encode', elapsed / 1000)
+            self.encode_ms = 0.9 * self.encode_ms + 0.1 * elapsed if self.written else elapsed
+            if not ok:
+                print("Evidence not encoded:", filename)
+                continue
+            try:
+                with open(filename, 'wb') as file:
+                    file.write(data.tobytes())
+            except OSError as e:
+                print("Evidence not written:", e)
+                continue
+            self.written += 1
+            self.files.append((filename, len(data)))
+            self.bytes += len(data)
+            self.evict()
+
+    def evict(self):
+        """ Delete the oldest evidence until the images fit in the quota, the newest image is always kept """
+        while self.bytes > self.max_bytes and len(self.files) > 1:
+            filename, size = self.files.popleft()
+            self.bytes -= size
+            self.evicted += 1
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """ Get the counters of the writer
+
+        Returns:
+            dict: Frames written, dropped and waiting, files deleted by the quota, MB used and mean encode time
+        """
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+            'evicted': self.evicted,
+            'mb': round(self.bytes / 1024 / 1024, 1),
+            'encode_ms': round(self.encode_ms, 2),
+        }
@@ -0,0 +1,122 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        """ Latency histogram with fixed buckets, an observation is a bisect and three increments.
+        It takes no lock, every stage is timed from a single thread, e.g. the thread of its pipeline stage
+
+        Args:
+            buckets (tuple, optional): Upper bounds in seconds, sorted. Defaults to 0.5 ms to 1 s.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+
+class Metrics:
+    def __init__(self, prefix: str = 'weapon_detector'):
+        """ Latency histograms of the stages of the hot path and counters of the events of a process.
+        The snapshot is JSON, so a process can push it to the one serving /metrics. Counters and gauges
+        take a lock, they are updated from several threads, e.g. the Flask requests and the pin listeners
+
+        Args:
+            prefix (str, optional): Prefix of the metric names. Defaults to 'weapon_detector'.
+        """
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        """ Time the block as a stage """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name: str, labels: dict = None, value: float = 1):
+        """ Add to a counter, e.g. inc('detections', {'class': 'Gun'}) """
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: dict = None):
+        """ Set a counter kept by someone else, e.g. the frames dropped by the camera """
+        with self.lock:
+            self.counters[(name, tuple(sorted((labels or {}).items())))] = value
+
+    def gauge(self, name: str, value: float, labels: dict = None):
+        """ Set a value that goes up and down, e.g. the notifications waiting """
+        with self.lock:
+            self.gauges[(name, tuple(sorted((labels or {}).items())))] = value
+
+    def snapshot(self) -> dict:
+        """ Get the histograms and counters
+
+        Returns:
+            dict: JSON serializable histograms by stage, [name, labels, value] counters and gauges
+        """
+        with self.lock:
+            counters, gauges = list(self.counters.items()), list(self.gauges.items())
+        return {
+            'histograms': {stage: histogram.snapshot() for stage, histogram in list(self.histograms.items())},
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters],
+            'gauges': [[name, dict(labels), value] for (name, labels), value in gauges],
+        }
+
+    def render(self, *snapshots: dict) -> str:
+        """ Render snapshots in the Prometheus text format, e.g. the one of this process and the one pushed by another
+
+        Returns:
+            str: The exposition text
+        """
+        name = self.prefix + '_stage_seconds'
+        lines = ['# HELP {} Time per frame of every stage of the hot path'.format(name), '# TYPE {} histogram'.format(name)]
+        for snapshot in snapshots:
+            for stage, histogram in sorted(snapshot['histograms'].items()):
+                cumulative = 0
+                for bound, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                    cumulative += count
+                    lines.append('{}_bucket{{stage="{}",le="{}"}} {}'.format(name, stage, bound, cumulative))
+                lines.append('{}_sum{{stage="{}"}} {}'.format(name, stage, histogram['sum']))
+                lines.append('{}_count{{stage="{}"}} {}'.format(name, stage, histogram['count']))
+
+        for kind in ('counter', 'gauge'):
+            metrics = {}
+            for snapshot in snapshots:
+                for metric, labels, value in snapshot.get(kind + 's', []):
+                    metrics.setdefault(metric, []).append((labels, value))
+            for metric, values in sorted(metrics.items()):
+                lines.append('# TYPE {}_{} {}'.format(self.prefix, metric, kind))
+                for labels, value in values:
+                    text = ','.join('{}="{}"'.format(key, label) for key, label in sorted(labels.items()))
+                    lines.append('{}_{}{} {}'.format(self.prefix, metric, '{' + text + '}' if text else '', value))
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()  # Metrics of the process, shared by every module of the hot path
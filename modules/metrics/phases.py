@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+
+from .metrics import METRICS
+
+
+class Phases:
+    def __init__(self, name: str, start: float = None):
+        """ Duration of the phases of the startup of a process, phases may run at the same time in several threads
+
+        Args:
+            name (str): Name of the process in the report
+            start (float, optional): time.time() of the start of the process. Defaults to now.
+        """
+        self.name = name
+        self.start = start or time.time()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """ Time the block as a phase """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start, time.time()))
+            METRICS.gauge('startup_phase_seconds', round(time.time() - start, 3), {'process': self.name, 'phase': name})
+
+    def run(self, name: str, function, *args, **kwargs):
+        """ Call a function as a phase, e.g. submitted to an executor
+
+        Returns:
+            Any: The result of the function
+        """
+        with self.phase(name):
+            return function(*args, **kwargs)
+
+    def report(self) -> str:
+        """ Build a report of every phase, its start and duration since the start of the process, and the total time to ready """
+        lines = ["{} ready in {:.2f} s".format(self.name.title(), time.time() - self.start)]
+        for name, start, end in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append("  {:<12} +{:>6.2f} s {:>6.2f} s".format(name, start - self.start, end - start))
+        return '\n'.join(lines)
@@ -1,123 +1,126 @@
 import numpy as np
-import subprocess
+import requests
 from collections import deque
-import base64
-import json
-import cv2
+
+from modules.metrics.metrics import METRICS
+
+from .inference_client import InferenceClient
+from .detections import Detections
+from .momentum import TemporalEvidence
 
 class Detect:
-    curl_command = 'curl --silent -d "@-" "http://localhost:9001/weapons-28-jun/4?api_key=7rRyq2IXnl3yEIKk7GCw"'
-    # curl_command = 'curl --silent -d "@-" "http://localhost:9001"'
+    url = "http://localhost:9001/weapons-28-jun/4?api_key=7rRyq2IXnl3yEIKk7GCw"
+    # url = "http://localhost:9001"
     confidence_thresholds = 0.6, 0.4
     momentum_thresholds = [x*1.75 for x in confidence_thresholds]
-    queues = [deque(maxlen=6), deque(maxlen=6)]
     constant = 0.5
     
-    # def __init__(self):
-    #     print("Momentums: ", self.momentum_thresholds)
+    def __init__(self, url: str = None, in_flight: int = 1):
+        """ Weapon detection through the roboflow inference server
+
+        Args:
+            url (str, optional): Model url. Defaults to the url class attribute.
+            in_flight (int, optional): Frames sent to the server before waiting for a response. With more than one the
+                results of detection belong to the frame sent in_flight - 1 calls before. Defaults to 1.
+        """
+        self.client = InferenceClient(url or self.url, pool_size=max(in_flight, 1))
+        self.in_flight = in_flight
+        self.pending = deque()
+        # Every instance, and every stream of an instance, has its own momentum
+        self.evidence = TemporalEvidence(('Gun', 'Knife'), self.momentum_thresholds, window=6, decay=self.constant)
+
+    def predict(self, frame: np.ndarray, origin: tuple = (0, 0)):
+        """ Get the predictions of the server for a frame, in asynchronous mode the predictions of the oldest frame in flight
+
+        Args:
+            frame (np.ndarray): The frame to be processed
+            origin (tuple, optional): Position of the frame when it is a crop, predictions are moved to it. Defaults to (0, 0).
+
+        Returns:
+            list: Predictions, None while the requests in flight are not enough to get a result
+        """
+        if self.in_flight <= 1:
+            return self.move(self.client.predict(frame), origin)
+
+        self.pending.append((self.client.submit(frame), origin))
+        if len(self.pending) < self.in_flight:
+            return None
+        future, origin = self.pending.popleft()
+        return self.move(future.result(), origin)
+
+    def move(self, predictions: list, origin: tuple) -> list:
+        if predictions and origin != (0, 0):
+            for prediction in predictions:
+                prediction['x'] += origin[0]
+                prediction['y'] += origin[1]
+        return predictions
         
-    def filter_gigant_bounding_boxes(self, bounding_boxes: list, threshold: float = 0.7, image_shape: tuple = (640, 640, 3)) -> list:
+    def filter_gigant_bounding_boxes(self, detections: Detections, threshold: float = 0.7, image_shape: tuple = (640, 640, 3)) -> Detections:
         """ This function is used to filter bounding boxes that are too big
         
         Args:
-            bounding_boxes (list): List of bounding boxes
-            threshold (float, optional): Threshold to filter bounding boxes. Defaults to 0.8.
-            image_shape (tuple, optional): Image shape. Defaults to (640, 640, 3).
+            detections (Detections): Detections of the frame
+            threshold (float, optional): Max width and height of a box as a fraction of the frame. Defaults to 0.7.
+            image_shape (tuple, optional): Frame shape, height first. Defaults to (640, 640, 3).
         Returns:
-            list: List of bounding boxes
+            Detections: Detections smaller than the threshold
         """
-        try:
-            return list(filter(lambda x: x['xmax'] - x['xmin'] < image_shape[0] * threshold and x['ymax'] - x['ymin'] < image_shape[1] * threshold, bounding_boxes))
-        except (ValueError, KeyError):
-            return bounding_boxes
+        return detections.filter_size(image_shape[1], image_shape[0], threshold)
         
-    def filter_confidence(self, class_name: tuple, bounding_boxes: list, thresholds: tuple= (0.8, 0.8)) -> list:
+    def filter_confidence(self, class_name: tuple, detections: Detections, thresholds: tuple= (0.8, 0.8)) -> Detections:
         """ This function is used to filter bounding boxes which confidence is lower than threshold
         
         Args:
             class_name (tuple): Class name, could be Gun or Knife
-            bounding_boxes (list): List of bounding boxes
+            detections (Detections): Detections of the frame
             threshold (tuple, optional): Thresholds to filter bounding boxes. Defaults to (0.8, 0.8).
         
         Returns:
-            list: List of bounding boxes
+            Detections: Detections above the threshold of their class
         """
-        try:
-            return list(filter(lambda x: x['confidence'] >= thresholds[class_name.index(x['class'])], bounding_boxes))
-        except (ValueError, KeyError):
-            return bounding_boxes
+        return detections.filter_confidence(dict(zip(class_name, thresholds)))
     
-    def momentum(self, class_name: int, confidence: float, threshold: float, queue: deque, constant: float = 0.5) -> tuple:
-        """ Momentum is a measure of how many frames in a row a given class has been, it considers a queue of the last 10 frames and returns the most frequent class in the queue, consudering a pondered sum of the last 10 frames. Each frame has a weight of a constant value between 0 and 1, where the first frame has the lowest weight confidense multiplied by the constant power to n, where n is the frame index, and the last frame has the highest weight confidense multiplied by the constant power to 0.
-
-        Args:
-            class_name (int): Class name, could be 0 or 1, where 0 is no class and 1 is class.
-            confidence (float): Confidence of the class, between 0 and 1.
-
-        Returns:
-            int: Class name, could be 0 or 1, where 0 is no class and 1 is class.
-        """
-        calc_momentum = 0
-        queue.append((class_name, confidence))
-        for i in range(len(queue)-1, -1, -1):
-            calc_momentum += queue[i][0] * (queue[i][1] * constant ** i)
-
-        # print("Class: ", class_name, end=' ')
-        # print("Momentum: ", calc_momentum)
-
-        return calc_momentum >= threshold, queue
-    
-    def detection(self, frame: np.ndarray) -> tuple:
+    def detection(self, frame: np.ndarray, regions: list = None, stream=0) -> tuple:
         """ This function is used to detect weapons in a frame
 
         Args:
             frame (np.ndarray): The frame to be processed
+            regions (list, optional): (x1, y1, x2, y2) regions with movement, the server gets a single crop around them
+                and no request is made when it is empty. Defaults to the whole frame.
+            stream (hashable, optional): Camera of the frame, every camera has its own momentum. Defaults to 0.
 
         Returns:
-            tuple: Return two values: A boolean value that determines if detection is correct and a list of bounding boxes detected in the last frame
+            tuple: Return two values: A boolean value that determines if detection is correct and the Detections of the last frame,
+                they behave like the list of roboflow dicts
         """
 
-        # Convert the frame to base64
-        _, img_encoded = cv2.imencode(".jpg", frame)
-        base64_data = base64.b64encode(img_encoded).decode("utf-8")
-
-        # Run the curl command and pass the base64 data as input
-        process = subprocess.Popen(self.curl_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, shell=True)
-        stdout, _ = process.communicate(input=base64_data.encode('utf-8'))
-
-        # Decode the response
-        response = stdout.decode('utf-8')
-
         try:        
             # Getting predictions
-            bounding_boxes_text = response.split('predictions": ')[1].split('],')[0] + ']'
-            
-            # Converting to list
-            bounding_boxes = json.loads(bounding_boxes_text)
+            if regions is None:
+                with METRICS.time('execute'):
+                    bounding_boxes = self.predict(frame)
+            elif regions:
+                x1, y1 = min(region[0] for region in regions), min(region[1] for region in regions)
+                x2, y2 = max(region[2] for region in regions), max(region[3] for region in regions)
+                with METRICS.time('execute'):
+                    bounding_boxes = self.predict(frame[y1:y2, x1:x2], (x1, y1))
+            else:
+                bounding_boxes = [] # Nothing moves, the momentum still decays
+            if bounding_boxes is None:
+                return False, []
+            bounding_boxes = Detections.from_roboflow(bounding_boxes)
             
             # Filter gigant bounding boxes
-            bounding_boxes = self.filter_gigant_bounding_boxes(bounding_boxes)
+            bounding_boxes = self.filter_gigant_bounding_boxes(bounding_boxes, image_shape=frame.shape)
             
             # Filter confidence
             bounding_boxes = self.filter_confidence(('Gun', 'Knife'), bounding_boxes, self.confidence_thresholds)
             
-            bounding_boxes = bounding_boxes or [{'class': None, 'confidence': 0}]
-            
             # Check momentums
-            for i, threshold in enumerate(self.momentum_thresholds):
-                for bounding_box in bounding_boxes:
-                    class_name = bounding_box['class']
-                    confidence = bounding_box['confidence']
-                    momentum_result, self.queues[i] = self.momentum(1 if class_name else 0, float(confidence), float(threshold), self.queues[i], self.constant)
-                    
-                    if momentum_result:
-                        # print("Weapon detected")
-                        self.queues[0].clear()
-                        self.queues[1].clear()
-                        return True, bounding_boxes
-                else:
-                    return False, bounding_boxes
-            
+            with METRICS.time('momentum'):
+                detected = self.evidence.observe(bounding_boxes, stream)
+            return detected, bounding_boxes
             
-        except IndexError as e:
+        except (KeyError, requests.RequestException) as e:
+            print(e)
             return False, []
\ No newline at end of file
@@ -1,78 +1,66 @@
 import numpy as np
-import subprocess
-from collections import deque
 import cv2
-import imutils
-import sys
 
 from pathlib import Path
+
+from modules.metrics.metrics import METRICS
+from .detections import Detections
+from .momentum import TemporalEvidence
 from .yoloDet import YoloTRT
 
 class Detect:
     __actual_path = Path(__file__).parent.absolute()
-    model = YoloTRT(library=f"{__actual_path}/yolov5/build/libmyplugins.so", engine=f"{__actual_path}/yolov5/build/yolov5.engine", conf=0.3, yolo_ver="v5")
+    library = f"{__actual_path}/yolov5/build/libmyplugins.so"
+    engine = f"{__actual_path}/yolov5/build/yolov5.engine"
+    model = None
     confidence_thresholds = 0.6, 0.4
     momentum_thresholds = [x*1.75 for x in confidence_thresholds]
-    queues = [deque(maxlen=6) for _ in range(len(momentum_thresholds))]
     constant = 0.5
+
+    def __init__(self, model: YoloTRT = None):
+        """ Weapon detection with the TensorRT engine
+
+        Args:
+            model (YoloTRT, optional): Detector of the instance, e.g. over a CPUSession. Defaults to the engine
+                shared by every instance, it is loaded by the first one.
+        """
+        if model is not None:
+            self.model = model
+        elif Detect.model is None:
+            Detect.model = YoloTRT(library=self.library, engine=self.engine, conf=0.3, yolo_ver="v5")
+        # Every instance, and every stream of an instance, has its own momentum
+        self.evidence = TemporalEvidence(('Gun', 'Knife'), self.momentum_thresholds, window=6, decay=self.constant)
         
-    def filter_gigant_bounding_boxes(self, bounding_boxes: list, threshold: float = 0.7, image_shape: tuple = (640, 640, 3)) -> list:
+    def filter_gigant_bounding_boxes(self, detections: Detections, threshold: float = 0.7, image_shape: tuple = (640, 640, 3)) -> Detections:
         """ This function is used to filter bounding boxes that are too big
         
         Args:
-            bounding_boxes (list): List of bounding boxes
-            threshold (float, optional): Threshold to filter bounding boxes. Defaults to 0.8.
-            image_shape (tuple, optional): Image shape. Defaults to (640, 640, 3).
+            detections (Detections): Detections of the frame
+            threshold (float, optional): Max width and height of a box as a fraction of the frame. Defaults to 0.7.
+            image_shape (tuple, optional): Frame shape, height first. Defaults to (640, 640, 3).
         Returns:
-            list: List of bounding boxes
+            Detections: Detections smaller than the threshold
         """
-        try:
-            return list(filter(lambda x: x['xmax'] - x['xmin'] < image_shape[0] * threshold and x['ymax'] - x['ymin'] < image_shape[1] * threshold, bounding_boxes))
-        except (ValueError, KeyError):
-            return bounding_boxes
+        return detections.filter_size(image_shape[1], image_shape[0], threshold)
         
-    def filter_confidence(self, class_name: tuple, bounding_boxes: list, thresholds: tuple= (0.8, 0.8)) -> list:
+    def filter_confidence(self, class_name: tuple, detections: Detections, thresholds: tuple= (0.8, 0.8)) -> Detections:
         """ This function is used to filter bounding boxes which confidence is lower than threshold
         
         Args:
             class_name (tuple): Class name, could be Gun or Knife
-            bounding_boxes (list): List of bounding boxes
+            detections (Detections): Detections of the frame
             threshold (tuple, optional): Thresholds to filter bounding boxes. Defaults to (0.8, 0.8).
         
         Returns:
-            list: List of bounding boxes
+            Detections: Detections above the threshold of their class
         """
-        try:
-            return list(filter(lambda x: x['confidence'] >= thresholds[class_name.index(x['class'])], bounding_boxes))
-        except (ValueError, KeyError):
-            return bounding_boxes
+        return detections.filter_confidence(dict(zip(class_name, thresholds)))
     
-    def momentum(self, class_name: int, confidence: float, threshold: float, queue: deque, constant: float = 0.5) -> tuple:
-        """ Momentum is a measure of how many frames in a row a given class has been, it considers a queue of the last 10 frames and returns the most frequent class in the queue, consudering a pondered sum of the last 10 frames. Each frame has a weight of a constant value between 0 and 1, where the first frame has the lowest weight confidense multiplied by the constant power to n, where n is the frame index, and the last frame has the highest weight confidense multiplied by the constant power to 0.
+    def convert_to_roboflow_format(self, detections: Detections) -> list:
+        """ This function is used to convert bounding boxes to roboflow format, only needed at the API edge
 
         Args:
-            class_name (int): Class name, could be 0 or 1, where 0 is no class and 1 is class.
-            confidence (float): Confidence of the class, between 0 and 1.
-
-        Returns:
-            int: Class name, could be 0 or 1, where 0 is no class and 1 is class.
-        """
-        calc_momentum = 0
-        queue.append((class_name, confidence))
-        for i in range(len(queue)-1, -1, -1):
-            calc_momentum += queue[i][0] * (queue[i][1] * constant ** i)
-
-        print("Class: ", class_name, end=' ')
-        print("Momentum: ", calc_momentum)
-
-        return calc_momentum >= threshold, queue
-    
-    def convert_to_roboflow_format(self, bounding_boxes: list) -> list:
-        """ This function is used to convert bounding boxes to roboflow format
-
-        Args:
-            bounding_boxes (list): List of bounding boxes as the example: 
-                [{'class': 'Gun', 'conf': 0.5830196, 'box': array([293.85294,  72.27049, 409.61057, 161.91927], dtype=float32)}]
+            detections (Detections): Detections of the frame
 
         Returns:
             list: List of bounding boxes as example: "predictions": 
@@ -87,60 +75,34 @@ class Detect:
                 }
             ],
         """
-        result = []
-        for bounding_box in bounding_boxes:
-            box = list(bounding_box['box'])
-            result.append({
-                "x": (box[0] + box[2])// 2,
-                "y": (box[1] + box[3])// 2,
-                "width": int(box[2] - box[0]),
-                "height": int(box[3] - box[1]),
-                "class": bounding_box['class'],
-                "confidence": bounding_box['conf']
-            })
-        return result
+        return detections.to_roboflow()
     
-    def detection(self, frame: np.ndarray) -> tuple:
+    def detection(self, frame: np.ndarray, regions: list = None, stream=0) -> tuple:
         """ This function is used to detect weapons in a frame
 
         Args:
             frame (np.ndarray): The frame to be processed
+            regions (list, optional): (x1, y1, x2, y2) regions with movement, only their crops are sent to the model
+                and it does not run when it is empty. Defaults to the whole frame.
+            stream (hashable, optional): Camera of the frame, every camera has its own momentum. Defaults to 0.
 
         Returns:
-            tuple: Return two values: A boolean value that determines if detection is correct and a list of bounding boxes detected in the last frame
+            tuple: Return two values: A boolean value that determines if detection is correct and the Detections of the last frame,
+                they behave like the list of roboflow dicts
         """
 
-        detections, t = self.model.Inference(frame) # returns detections and inference time
+        if regions is None:
+            detections, t = self.model.Inference(frame) # returns detections and inference time
+        else:
+            detections, t = self.model.InferenceRegions(frame, regions)
+        
+        # Filter gigant bounding boxes
+        bounding_boxes = self.filter_gigant_bounding_boxes(detections, image_shape=frame.shape)
+        
+        # Filter confidence
+        bounding_boxes = self.filter_confidence(('Gun', 'Knife'), bounding_boxes, self.confidence_thresholds)
         
-        try:        
-            bounding_boxes = self.convert_to_roboflow_format(detections)
-            
-            # Filter gigant bounding boxes
-            bounding_boxes = self.filter_gigant_bounding_boxes(bounding_boxes)
-            
-            # Filter confidence
-            bounding_boxes = self.filter_confidence(('Gun', 'Knife'), bounding_boxes, self.confidence_thresholds)
-            
-            bounding_boxes = bounding_boxes or [{'class': None, 'confidence': 0}]
-            
-            # Check momentums
-            for i, threshold in enumerate(self.momentum_thresholds):
-                for bounding_box in bounding_boxes:
-                    class_name = bounding_box['class']
-                    confidence = bounding_box['confidence']
-                    momentum_result, self.queues[i] = self.momentum(1 if class_name else 0, float(confidence), float(threshold), self.queues[i], self.constant)
-                    
-                    # print("Class: ", class_name, end=' ')
-                    # print("Momentum: ", momentum_result)
-                    
-                    if momentum_result:
-                        # print("Weapon detected")
-                        self.queues[0].clear()
-                        self.queues[1].clear()
-                        return True, bounding_boxes
-                else:
-                    return False, bounding_boxes
-            
-            
-        except IndexError as e:
-            return False, []
+        # Check momentums
+        with METRICS.time('momentum'):
+            detected = self.evidence.observe(bounding_boxes, stream)
+        return detected, bounding_boxes
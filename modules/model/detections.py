@@ -0,0 +1,101 @@
+import numpy as np
+
+
+class Detections:
+    __slots__ = ('array', 'categories')
+
+    def __init__(self, array: np.ndarray = None, categories: tuple = ("Gun", "Knife")):
+        """ Detections of a frame as the (N, 6) rows [x1, y1, x2, y2, confidence, class_id] of the non max suppression,
+        without a Python object per box. They behave like the list of roboflow dicts of the API, built only when
+        a box is accessed.
+
+        Args:
+            array (np.ndarray, optional): (N, 6) rows, it is used without copying. Defaults to no detections.
+            categories (tuple, optional): Names of the class ids. Defaults to ("Gun", "Knife").
+        """
+        self.array = np.zeros((0, 6), dtype=np.float32) if array is None or not len(array) else array.reshape(-1, 6)
+        self.categories = tuple(categories)
+
+    @classmethod
+    def from_roboflow(cls, predictions: list, categories: tuple = ("Gun", "Knife")):
+        """ Build the detections of the predictions of the roboflow inference server, classes out of the categories are dropped
+
+        Args:
+            predictions (list): Dicts with x, y (center), width, height, class and confidence
+            categories (tuple, optional): Names of the class ids. Defaults to ("Gun", "Knife").
+
+        Returns:
+            Detections: The detections
+        """
+        rows = [
+            [p['x'] - p['width'] / 2, p['y'] - p['height'] / 2, p['x'] + p['width'] / 2, p['y'] + p['height'] / 2, p['confidence'], categories.index(p['class'])]
+            for p in predictions if p.get('class') in categories
+        ]
+        return cls(np.array(rows, dtype=np.float32), categories)
+
+    @property
+    def boxes(self) -> np.ndarray:
+        return self.array[:, :4]
+
+    @property
+    def confidence(self) -> np.ndarray:
+        return self.array[:, 4]
+
+    @property
+    def class_id(self) -> np.ndarray:
+        return self.array[:, 5].astype(int)
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, index: int) -> dict:
+        return self.to_roboflow_box(self.array[index])
+
+    def __iter__(self):
+        return (self.to_roboflow_box(row) for row in self.array)
+
+    def __repr__(self) -> str:
+        return repr(self.to_roboflow())
+
+    def filter(self, mask: np.ndarray):
+        return Detections(self.array[mask], self.categories)
+
+    def filter_size(self, width: int, height: int, threshold: float = 0.7):
+        """ Drop the boxes as wide or as high as threshold times the frame """
+        sizes = self.array[:, 2:4] - self.array[:, 0:2]
+        return self.filter((sizes[:, 0] < width * threshold) & (sizes[:, 1] < height * threshold))
+
+    def filter_confidence(self, thresholds: dict):
+        """ Drop the boxes under the confidence threshold of their class, classes without threshold are kept
+
+        Args:
+            thresholds (dict): Class name to its min confidence
+        """
+        minimum = np.array([thresholds.get(name, 0) for name in self.categories], dtype=np.float32)
+        return self.filter(self.confidence >= minimum[self.class_id])
+
+    def offset(self, x: float, y: float):
+        """ Move the boxes, e.g. from a crop to its frame, in place """
+        self.array[:, :4] += np.array([x, y, x, y], dtype=self.array.dtype)
+        return self
+
+    def max_confidence(self, classes: tuple) -> np.ndarray:
+        """ Highest confidence of every class, 0 for the classes without boxes """
+        confidences = np.zeros(len(self.categories))
+        np.maximum.at(confidences, self.class_id, self.confidence)
+        return np.array([confidences[self.categories.index(name)] if name in self.categories else 0 for name in classes])
+
+    def to_roboflow_box(self, row: np.ndarray) -> dict:
+        x1, y1, x2, y2, confidence, class_id = row.tolist()
+        return {
+            "x": (x1 + x2) // 2,
+            "y": (y1 + y2) // 2,
+            "width": int(x2 - x1),
+            "height": int(y2 - y1),
+            "class": self.categories[int(class_id)],
+            "confidence": confidence
+        }
+
+    def to_roboflow(self) -> list:
+        """ Convert to the list of dicts of the API, e.g. [{"x": 123, "y": 219.0, "width": 96, "height": 173, "class": "Gun", "confidence": 0.73}] """
+        return [self.to_roboflow_box(row) for row in self.array]
@@ -0,0 +1,86 @@
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class InferenceClient:
+    def __init__(self, url: str, timeout: float = 2.0, retries: int = 2, backoff: float = 0.1, pool_size: int = 4):
+        """ Client of the roboflow inference server, it keeps its connections alive in a pool instead
+        of opening a new one per frame
+
+        Args:
+            url (str): Model url, including the api key
+            timeout (float, optional): Seconds to wait for a response. Defaults to 2.0.
+            retries (int, optional): Times a request is retried after a connection error, a timeout or a 5xx response. Defaults to 2.
+            backoff (float, optional): Seconds to wait before the first retry, doubled on every retry. Defaults to 0.1.
+            pool_size (int, optional): Max number of connections and of requests in flight. Defaults to 4.
+        """
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def encode(self, frame) -> bytes:
+        """ Encode a frame as the base64 JPEG body expected by the server """
+        _, img_encoded = cv2.imencode(".jpg", frame)
+        return base64.b64encode(img_encoded)
+
+    def predict(self, frame) -> list:
+        """ Send a frame to the server and wait for its predictions
+
+        Args:
+            frame (np.ndarray): The frame to be processed
+
+        Raises:
+            requests.RequestException: When the server is not available after every retry
+            KeyError: When the response has no predictions
+
+        Returns:
+            list: Predictions as returned by the server, e.g. [{"x": 123, "y": 219.2, "width": 96, "height": 173, "class": "Gun", "confidence": 0.73}]
+        """
+        return self.post(self.encode(frame))
+
+    def post(self, data: bytes) -> list:
+        """ Send an encoded frame to the server, retrying with backoff
+
+        Args:
+            data (bytes): Base64 JPEG body
+
+        Returns:
+            list: Predictions as returned by the server
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'}, timeout=self.timeout)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+                return response.json()['predictions']
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as error:
+                if attempt == self.retries:
+                    raise error
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def submit(self, frame):
+        """ Send a frame without waiting for the response, the frame is encoded before returning so the caller can modify it
+
+        Args:
+            frame (np.ndarray): The frame to be processed
+
+        Returns:
+            concurrent.futures.Future: Future with the result of predict
+        """
+        return self.executor.submit(self.post, self.encode(frame))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+
+class Letterbox:
+    def __init__(self, input_w: int, input_h: int, pad_value: int = 128):
+        """ Letterbox preprocessing for YOLO engines. The geometry is computed once per input resolution
+        and the normalized RGB CHW tensor is written straight into a caller supplied buffer, so the only
+        intermediate array is a resize buffer that is reused across frames.
+
+        Args:
+            input_w (int): Engine input width
+            input_h (int): Engine input height
+            pad_value (int, optional): Value of the border, before normalization. Defaults to 128.
+        """
+        self.input_w = input_w
+        self.input_h = input_h
+        self.pad_value = np.float32(pad_value) / np.float32(255.0)
+        self.geometries = {}
+
+    def geometry(self, h: int, w: int) -> tuple:
+        """ Get the letterbox geometry of an input resolution
+
+        Args:
+            h (int): Frame height
+            w (int): Frame width
+
+        Returns:
+            tuple: Resized width and height, left and top offsets and the resize buffer
+        """
+        key = (h, w)
+        if key not in self.geometries:
+            r_w = self.input_w / w
+            r_h = self.input_h / h
+            if r_h > r_w:
+                tw = self.input_w
+                th = int(r_w * h)
+                tx1 = 0
+                ty1 = int((self.input_h - th) / 2)
+            else:
+                tw = int(r_h * w)
+                th = self.input_h
+                tx1 = int((self.input_w - tw) / 2)
+                ty1 = 0
+            self.geometries[key] = (tw, th, tx1, ty1, np.empty((th, tw, 3), dtype=np.uint8))
+        return self.geometries[key]
+
+    def __call__(self, img: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """ Letterbox a BGR frame
+
+        Args:
+            img (np.ndarray): BGR frame
+            out (np.ndarray, optional): Float32 buffer with room for 3 * input_h * input_w values, e.g. a slice of the engine input buffer. Defaults to None, a new buffer.
+
+        Returns:
+            np.ndarray: The (3, input_h, input_w) RGB tensor normalized to [0, 1], a view of out
+        """
+        h, w = img.shape[:2]
+        tw, th, tx1, ty1, resized = self.geometry(h, w)
+        if out is None:
+            out = np.empty(3 * self.input_h * self.input_w, dtype=np.float32)
+        chw = out.reshape(3, self.input_h, self.input_w)
+
+        cv2.resize(img, (tw, th), dst=resized)
+
+        chw[:, :ty1, :] = self.pad_value
+        chw[:, ty1 + th:, :] = self.pad_value
+        chw[:, :, :tx1] = self.pad_value
+        chw[:, :, tx1 + tw:] = self.pad_value
+
+        # BGR to RGB and normalization in a single pass per channel
+        for c in range(3):
+            np.divide(resized[:, :, 2 - c], np.float32(255.0), out=chw[c, ty1:ty1 + th, tx1:tx1 + tw], dtype=np.float32, casting='unsafe')
+        return chw
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class TemporalEvidence:
+    EPSILON = 1e-9  # Float error allowed when comparing the evidence with the thresholds, e.g. 0.35 + 0.7 < 1.05
+
+    def __init__(self, classes: tuple, thresholds: list, window: int = 6, decay: float = 0.5, verbose: bool = False):
+        """ Momentum of the detections of every class over the last frames of every stream. The evidence of
+        a class is the sum of its confidence in the last window frames, weighted by decay to the power of
+        the age of the frame, so the newest frame weights the most. A frame without the class adds 0.
+
+        The evidence is updated in O(1) per frame: evidence = decay * evidence + new - decay^window * oldest,
+        with the last window confidences of every class kept in a ring array. The float error of the running
+        sum is bounded: it is clamped at 0 and computed again from the ring every time the ring wraps.
+
+        Args:
+            classes (tuple): Class names, e.g. ('Gun', 'Knife')
+            thresholds (list): Evidence needed to report every class
+            window (int, optional): Number of frames of the momentum. Defaults to 6.
+            decay (float, optional): Weight of a frame relative to the next one, between 0 and 1. Defaults to 0.5.
+            verbose (bool, optional): Print the evidence of every frame. Defaults to False.
+        """
+        self.classes = tuple(classes)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.window = window
+        self.decay = decay
+        self.weights = decay ** np.arange(window)  # Weight of a frame by its age, 0 is the newest
+        self.dropped_weight = decay ** window  # Weight the oldest frame would have once it leaves the window
+        self.verbose = verbose
+        self.streams = {}
+
+    def state(self, stream) -> dict:
+        if stream not in self.streams:
+            self.streams[stream] = {
+                'ring': np.zeros((self.window, len(self.classes))),
+                'index': 0,
+                'evidence': np.zeros(len(self.classes)),
+            }
+        return self.streams[stream]
+
+    def update(self, confidences, stream=0) -> np.ndarray:
+        """ Add a frame to the momentum of a stream
+
+        Args:
+            confidences (array like): Confidence of every class in the frame, 0 when it was not detected
+            stream (hashable, optional): Camera of the frame. Defaults to 0.
+
+        Returns:
+            np.ndarray: Evidence of every class
+        """
+        state = self.state(stream)
+        confidences = np.asarray(confidences, dtype=np.float64)
+        ring, index = state['ring'], state['index']
+        state['evidence'] *= self.decay
+        state['evidence'] += confidences - self.dropped_weight * ring[index]
+        np.maximum(state['evidence'], 0, out=state['evidence'])
+        ring[index] = confidences
+        state['index'] = (index + 1) % self.window
+        if state['index'] == 0:
+            # The newest frame is the last row, the weights run from the newest to the oldest
+            state['evidence'][:] = self.weights @ ring[::-1]
+        return state['evidence']
+
+    def confidences(self, bounding_boxes) -> np.ndarray:
+        """ Highest confidence of every class among the Detections of a frame, or its bounding boxes in roboflow format """
+        if hasattr(bounding_boxes, 'max_confidence'):
+            return bounding_boxes.max_confidence(self.classes)
+        confidences = np.zeros(len(self.classes))
+        for bounding_box in bounding_boxes:
+            if bounding_box.get('class') in self.classes:
+                i = self.classes.index(bounding_box['class'])
+                confidences[i] = max(confidences[i], float(bounding_box['confidence']))
+        return confidences
+
+    def observe(self, bounding_boxes: list, stream=0) -> bool:
+        """ Add the bounding boxes of a frame and check the momentum of every class. The momentum of
+        the stream starts again after a detection
+
+        Args:
+            bounding_boxes (Detections or list): Detections of the frame, or its bounding boxes in roboflow format
+            stream (hashable, optional): Camera of the frame. Defaults to 0.
+
+        Returns:
+            bool: If the evidence of a class reached its threshold
+        """
+        evidence = self.update(self.confidences(bounding_boxes), stream)
+        if self.verbose:
+            print("Momentum: ", dict(zip(self.classes, np.round(evidence, 3))))
+        if (evidence >= self.thresholds - self.EPSILON).any():
+            self.reset(stream)
+            return True
+        return False
+
+    def evidence(self, stream=0) -> np.ndarray:
+        """ Evidence of every class computed from the window, the incremental value must be the same """
+        state = self.state(stream)
+        # Ring positions from the newest frame to the oldest one
+        ages = (state['index'] - 1 - np.arange(self.window)) % self.window
+        return self.weights @ state['ring'][ages]
+
+    def reset(self, stream=0):
+        self.streams.pop(stream, None)
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def iou_matrix(boxes: np.ndarray) -> np.ndarray:
+    """ Pairwise IoU of boxes in pixel coordinates, using the same +1 convention and order of operations as
+    YoloTRT.bbox_iou, so the result is bit exact. It works in place on three buffers of the output size
+
+    Args:
+        boxes (np.ndarray): (..., N, 4) array of [x1, y1, x2, y2], e.g. (groups, N, 4) for several images
+
+    Returns:
+        np.ndarray: (..., N, N) IoU matrix
+    """
+    x1, y1, x2, y2 = boxes[..., 0], boxes[..., 1], boxes[..., 2], boxes[..., 3]
+    inter = np.minimum(x2[..., :, None], x2[..., None, :])
+    other = np.maximum(x1[..., :, None], x1[..., None, :])
+    inter -= other
+    inter += 1
+    np.clip(inter, 0, None, out=inter)
+    height = np.minimum(y2[..., :, None], y2[..., None, :])
+    np.maximum(y1[..., :, None], y1[..., None, :], out=other)
+    height -= other
+    height += 1
+    np.clip(height, 0, None, out=height)
+    inter *= height
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    np.add(area[..., :, None], area[..., None, :], out=other)
+    other -= inter
+    other += 1e-16
+    inter /= other
+    return inter
+
+
+def batched_nms(batch: list, nms_thres: float = 0.4, max_det: int = None) -> list:
+    """ Class aware greedy non max suppression over the boxes of several images at once. The boxes are
+    grouped by image and class and padded into a single (groups, N, 4) array, so the IoU and the suppression
+    matrices of every group are computed in a few NumPy operations, and boxes of different images or
+    classes are never compared.
+
+    The greedy pass keeps a box when no kept box of higher confidence suppresses it. That is solved as a
+    fixed point: every iteration is a batched product of the kept boxes with the suppression matrices, and
+    the first k boxes of a group are final after k iterations. It stops as soon as the kept boxes do not
+    change, which takes as many iterations as the longest chain of suppressions, a few for detector output.
+
+    Args:
+        batch (list): One (N, 6) array of rows [x1, y1, x2, y2, confidence, class_id] per image
+        nms_thres (float, optional): Boxes overlapping a better one of the same class above this IoU are removed. Defaults to 0.4.
+        max_det (int, optional): Max number of boxes kept per image, None keeps all of them. Defaults to None.
+
+    Returns:
+        list: One array per image with the kept rows sorted by confidence, an empty array when nothing is kept
+    """
+    counts = np.array([len(boxes) for boxes in batch], dtype=np.int64)
+    if not counts.sum():
+        return [np.array([]) for _ in batch]
+
+    # Sorted per image with the same argsort as the previous loop, so ties keep the same order
+    ordered = [boxes[np.argsort(-boxes[:, 4])] for boxes in batch]
+    boxes = np.concatenate([rows for rows in ordered if len(rows)])
+    image = np.repeat(np.arange(len(batch)), counts)
+
+    # Group of every box, by image then class, with its rank by confidence inside the group
+    _, class_index = np.unique(boxes[:, 5], return_inverse=True)
+    _, group = np.unique(image * (class_index.max() + 1) + class_index.ravel(), return_inverse=True)
+    group = group.ravel()
+    order = np.argsort(group, kind='stable')
+    sizes = np.bincount(group)
+    rank = np.empty(len(boxes), dtype=np.int64)
+    rank[order] = np.arange(len(boxes)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+    padded = np.zeros((len(sizes), sizes.max(), 4), dtype=boxes.dtype)
+    padded[group, rank] = boxes[:, :4]
+    valid = np.zeros(padded.shape[:2], dtype=bool)
+    valid[group, rank] = True
+
+    suppress = iou_matrix(padded) > nms_thres
+    suppress &= valid[..., :, None] & valid[..., None, :]
+    # A box is only suppressed by the boxes before it, of higher confidence
+    suppress = np.triu(suppress, 1).astype(np.float32)
+
+    keep = valid
+    while True:
+        update = valid & ((keep[:, None, :].astype(np.float32) @ suppress)[:, 0] == 0)
+        if np.array_equal(update, keep):
+            break
+        keep = update
+
+    kept = np.split(keep[group, rank], np.cumsum(counts)[:-1])
+    return [rows[mask][:max_det] if len(rows) else np.array([]) for rows, mask in zip(ordered, kept)]
+
+
+def nms(boxes: np.ndarray, nms_thres: float = 0.4, max_det: int = None) -> np.ndarray:
+    """ Class aware greedy non max suppression over the boxes of one image
+
+    Args:
+        boxes (np.ndarray): (N, 6) array of rows [x1, y1, x2, y2, confidence, class_id]
+        nms_thres (float, optional): IoU threshold. Defaults to 0.4.
+        max_det (int, optional): Max number of boxes kept. Defaults to None.
+
+    Returns:
+        np.ndarray: The kept rows sorted by confidence, an empty array when nothing is kept
+    """
+    return batched_nms([boxes], nms_thres, max_det)[0]
@@ -0,0 +1,130 @@
+import ctypes
+import time
+
+import numpy as np
+
+try:
+    import tensorrt as trt
+    import pycuda.driver as cuda
+except ModuleNotFoundError:
+    trt = None
+    cuda = None
+
+
+class TRTSession:
+    def __init__(self, library: str, engine: str):
+        """ TensorRT inference session, it owns its execution context, CUDA stream and pinned buffers
+        for its whole lifetime, so several sessions can coexist in the same process. A session must
+        not be used by two threads at the same time, but it can be used from any thread.
+
+        Args:
+            library (str): Path to the plugins library
+            engine (str): Path to the serialized engine
+        """
+        if trt is None:
+            raise ModuleNotFoundError("No module named 'tensorrt'")
+        import pycuda.autoinit
+
+        self.cuda_context = pycuda.autoinit.context
+        ctypes.CDLL(library)
+
+        with open(engine, 'rb') as f:
+            serialized_engine = f.read()
+
+        runtime = trt.Runtime(trt.Logger(trt.Logger.INFO))
+        self.engine = runtime.deserialize_cuda_engine(serialized_engine)
+        self.batch_size = self.engine.max_batch_size
+
+        self.host_inputs = []
+        self.cuda_inputs = []
+        self.host_outputs = []
+        self.cuda_outputs = []
+        self.bindings = []
+        for binding in self.engine:
+            size = trt.volume(self.engine.get_binding_shape(binding)) * self.batch_size
+            dtype = trt.nptype(self.engine.get_binding_dtype(binding))
+            host_mem = cuda.pagelocked_empty(size, dtype)
+            cuda_mem = cuda.mem_alloc(host_mem.nbytes)
+
+            self.bindings.append(int(cuda_mem))
+            if self.engine.binding_is_input(binding):
+                self.input_w = self.engine.get_binding_shape(binding)[-1]
+                self.input_h = self.engine.get_binding_shape(binding)[-2]
+                self.host_inputs.append(host_mem)
+                self.cuda_inputs.append(cuda_mem)
+            else:
+                self.host_outputs.append(host_mem)
+                self.cuda_outputs.append(cuda_mem)
+
+        self.context = self.engine.create_execution_context()
+        self.stream = cuda.Stream()
+
+    @property
+    def input_buffer(self) -> np.ndarray:
+        """ Flat pinned input buffer, frame i of the batch goes in the slice [i * 3 * h * w, (i + 1) * 3 * h * w) """
+        return self.host_inputs[0]
+
+    def execute(self, batch_size: int) -> np.ndarray:
+        """ Run the engine over the first batch_size frames of the input buffer
+
+        Args:
+            batch_size (int): Number of frames in the input buffer
+
+        Returns:
+            np.ndarray: Flat output buffer, it is overwritten by the next call
+        """
+        self.cuda_context.push()
+        try:
+            cuda.memcpy_htod_async(self.cuda_inputs[0], self.host_inputs[0], self.stream)
+            self.context.execute_async(batch_size, self.bindings, stream_handle=self.stream.handle)
+            cuda.memcpy_dtoh_async(self.host_outputs[0], self.cuda_outputs[0], self.stream)
+            self.stream.synchronize()
+        finally:
+            self.cuda_context.pop()
+        return self.host_outputs[0]
+
+
+class CPUSession:
+    LEN_ONE_RESULT = 38
+    MAX_OUTPUT_BBOX_COUNT = 1000
+
+    def __init__(self, input_h: int = 640, input_w: int = 640, batch_size: int = 1, model=None, latency: float = 0.0):
+        """ Stand-in for TRTSession with the same interface, it runs on the CPU so YoloTRT can be
+        tested and benchmarked without a GPU. The output follows the layout of the yolov5 plugin:
+        the number of boxes followed by MAX_OUTPUT_BBOX_COUNT rows of LEN_ONE_RESULT values.
+
+        Args:
+            input_h (int, optional): Input height of the fake engine. Defaults to 640.
+            input_w (int, optional): Input width of the fake engine. Defaults to 640.
+            batch_size (int, optional): Max batch size of the fake engine. Defaults to 1.
+            model (callable, optional): Receives the (batch, 3, h, w) input and returns, for every frame, an array
+                of rows [center_x, center_y, width, height, confidence, class_id] in input coordinates. Defaults to None, no detections.
+            latency (float, optional): Seconds to sleep on every execution, to emulate the engine time. Defaults to 0.0.
+        """
+        self.input_h = input_h
+        self.input_w = input_w
+        self.batch_size = batch_size
+        self.model = model
+        self.latency = latency
+        self.len_all_result = 1 + self.MAX_OUTPUT_BBOX_COUNT * self.LEN_ONE_RESULT
+        self.host_input = np.zeros(batch_size * 3 * input_h * input_w, dtype=np.float32)
+        self.host_output = np.zeros(batch_size * self.len_all_result, dtype=np.float32)
+
+    @property
+    def input_buffer(self) -> np.ndarray:
+        return self.host_input
+
+    def execute(self, batch_size: int) -> np.ndarray:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.model is None:
+            self.host_output[::self.len_all_result] = 0
+            return self.host_output
+
+        inputs = self.host_input[:batch_size * 3 * self.input_h * self.input_w].reshape(batch_size, 3, self.input_h, self.input_w)
+        for i, rows in enumerate(self.model(inputs)):
+            rows = np.asarray(rows, dtype=np.float32).reshape(-1, 6)[:self.MAX_OUTPUT_BBOX_COUNT]
+            output = self.host_output[i * self.len_all_result: (i + 1) * self.len_all_result]
+            output[0] = len(rows)
+            output[1:].reshape(-1, self.LEN_ONE_RESULT)[:len(rows), :6] = rows
+        return self.host_output
@@ -1,143 +1,153 @@
-import cv2
 import numpy as np
-import tensorrt as trt
-import pycuda.autoinit
-import ctypes
-import pycuda.driver as cuda
 import time
 
-EXPLICIT_BATCH = 1 << (int)(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH)
-host_inputs  = []
-cuda_inputs  = []
-host_outputs = []
-cuda_outputs = []
-bindings = []
+from modules.metrics.metrics import METRICS
+
+from .detections import Detections
+from .letterbox import Letterbox
+from .nms import batched_nms, nms
+from .session import TRTSession
 
 
 class YoloTRT():
-    def __init__(self, library, engine, conf, yolo_ver):
+    def __init__(self, library=None, engine=None, conf=0.5, yolo_ver="v5", session=None, max_det=None):
         self.CONF_THRESH = conf 
         self.IOU_THRESHOLD = 0.4
+        self.MAX_DET = max_det
         self.LEN_ALL_RESULT = 38001
         self.LEN_ONE_RESULT = 38
         self.yolo_version = yolo_ver
-        self.categories = ["Gun","Knife"]
-        TRT_LOGGER = trt.Logger(trt.Logger.INFO)
-
-        ctypes.CDLL(library)
-
-        with open(engine, 'rb') as f:
-            serialized_engine = f.read()
-
-        runtime = trt.Runtime(TRT_LOGGER)
-        self.engine = runtime.deserialize_cuda_engine(serialized_engine)
-        self.batch_size = self.engine.max_batch_size
-
-        for binding in self.engine:
-            size = trt.volume(self.engine.get_binding_shape(binding)) * self.batch_size
-            dtype = trt.nptype(self.engine.get_binding_dtype(binding))
-            host_mem = cuda.pagelocked_empty(size, dtype)
-            cuda_mem = cuda.mem_alloc(host_mem.nbytes)
-
-            bindings.append(int(cuda_mem))
-            if self.engine.binding_is_input(binding):
-                self.input_w = self.engine.get_binding_shape(binding)[-1]
-                self.input_h = self.engine.get_binding_shape(binding)[-2]
-                host_inputs.append(host_mem)
-                cuda_inputs.append(cuda_mem)
-            else:
-                host_outputs.append(host_mem)
-                cuda_outputs.append(cuda_mem)
-
-    def PreProcessImg(self, img):
+        self.categories = ("Gun", "Knife")
+
+        # The session owns the execution context, the stream and the buffers, use a CPUSession to run without a GPU
+        self.session = session if session is not None else TRTSession(library, engine)
+        self.batch_size = self.session.batch_size
+        self.input_w = self.session.input_w
+        self.input_h = self.session.input_h
+        self.letterbox = Letterbox(self.input_w, self.input_h)
+
+    def PreProcessImg(self, img, out=None):
+        """ Letterbox a frame into the engine input layout
+
+        Args:
+            img (np.ndarray): BGR frame
+            out (np.ndarray, optional): Buffer where the tensor is written, e.g. a slice of the session input buffer. Defaults to None.
+
+        Returns:
+            tuple: The (1, 3, input_h, input_w) tensor, the original frame, its height and its width
+        """
         image_raw = img
-        try:
-            h, w, c = image_raw.shape
-        except ValueError:
-            h, w = image_raw.shape
-            c = 1
-        image = cv2.cvtColor(image_raw, cv2.COLOR_BGR2RGB)
-        r_w = self.input_w / w
-        r_h = self.input_h / h
-        if r_h > r_w:
-            tw = self.input_w
-            th = int(r_w * h)
-            tx1 = tx2 = 0
-            ty1 = int((self.input_h - th) / 2)
-            ty2 = self.input_h - th - ty1
-        else:
-            tw = int(r_h * w)
-            th = self.input_h
-            tx1 = int((self.input_w - tw) / 2)
-            tx2 = self.input_w - tw - tx1
-            ty1 = ty2 = 0
-        image = cv2.resize(image, (tw, th))
-        image = cv2.copyMakeBorder(image, ty1, ty2, tx1, tx2, cv2.BORDER_CONSTANT, None, (128, 128, 128))
-        image = image.astype(np.float32)
-        image /= 255.0
-        image = np.transpose(image, [2, 0, 1])
-        image = np.expand_dims(image, axis=0)
-        image = np.ascontiguousarray(image)
-        return image, image_raw, h, w
+        h, w = image_raw.shape[:2]
+        image = self.letterbox(image_raw, out)
+        return image[np.newaxis], image_raw, h, w
 
     def Inference(self, img):
-        input_image, image_raw, origin_h, origin_w = self.PreProcessImg(img)
-        np.copyto(host_inputs[0], input_image.ravel())
-        stream = cuda.Stream()
-        self.context = self.engine.create_execution_context()
-        cuda.memcpy_htod_async(cuda_inputs[0], host_inputs[0], stream)
-        t1 = time.time()
-        self.context.execute_async(self.batch_size, bindings, stream_handle=stream.handle)
-        cuda.memcpy_dtoh_async(host_outputs[0], cuda_outputs[0], stream)
-        stream.synchronize()
-        t2 = time.time()
-        output = host_outputs[0]
-                
-        for i in range(self.batch_size):
-            result_boxes, result_scores, result_classid = self.PostProcess(output[i * self.LEN_ALL_RESULT: (i + 1) * self.LEN_ALL_RESULT], origin_h, origin_w)
-            
-        det_res = []
-        for j in range(len(result_boxes)):
-            box = result_boxes[j]
-            det = dict()
-            det["class"] = self.categories[int(result_classid[j])]
-            det["conf"] = result_scores[j]
-            det["box"] = box 
-            det_res.append(det)
+        det_res, t = self.InferenceBatch([img])
+        return det_res[0], t
+
+    def InferenceBatch(self, imgs: list) -> tuple:
+        """ Run the detector over several frames, e.g. one per camera, sharing the engine batch.
+        When there are more frames than the engine batch size they are split in sub-batches, and
+        a partial batch only runs the frames that are ready.
+
+        Args:
+            imgs (list): List of BGR frames, they may have different resolutions
+
+        Returns:
+            tuple: A list with the detections of every frame and the total execution time
+        """
+        det_res, total_time = [], 0
+        for start in range(0, len(imgs), self.batch_size):
+            batch_res, t = self.execute_batch(imgs[start:start + self.batch_size])
+            det_res += batch_res
+            total_time += t
+        return det_res, total_time
+
+    def InferenceRegions(self, img, regions: list) -> tuple:
+        """ Run the detector over regions of a frame, batched, and map the boxes back to the frame
+
+        Args:
+            img (np.ndarray): BGR frame
+            regions (list): (x1, y1, x2, y2) regions of the frame, the detector does not run when it is empty
+
+        Returns:
+            tuple: The detections of the frame and the execution time
+        """
+        if not regions:
+            return Detections(categories=self.categories), 0
+        det_res, t = self.InferenceBatch([img[y1:y2, x1:x2] for x1, y1, x2, y2 in regions])
+        boxes = [detections.offset(x1, y1).array for (x1, y1, _, _), detections in zip(regions, det_res) if len(detections)]
+        if not boxes:
+            return Detections(categories=self.categories), t
+        # Regions may overlap, the same object can be found in more than one
+        return self.to_detections(nms(np.concatenate(boxes), self.IOU_THRESHOLD, self.MAX_DET)), t
+
+    def execute_batch(self, imgs: list) -> tuple:
+        """ Fill the input buffer with up to batch_size frames and run a single execute_async
+
+        Args:
+            imgs (list): List of BGR frames, no longer than the engine batch size
+
+        Returns:
+            tuple: A list with the detections of every frame and the execution time
+        """
+        batch_size = len(imgs)
+        input_size = 3 * self.input_h * self.input_w
+        shapes = []
+        t0 = time.perf_counter()
+        for i, img in enumerate(imgs):
+            _, _, origin_h, origin_w = self.PreProcessImg(img, self.session.input_buffer[i * input_size: (i + 1) * input_size])
+            shapes.append((origin_h, origin_w))
+
+        t1 = time.perf_counter()
+        output = self.session.execute(batch_size)
+        t2 = time.perf_counter()
+
+        # Suppress the boxes of the whole batch at once
+        candidates = []
+        for i, (origin_h, origin_w) in enumerate(shapes):
+            prediction = self.Decode(output[i * self.LEN_ALL_RESULT: (i + 1) * self.LEN_ALL_RESULT])
+            candidates.append(self.FilterBoxes(prediction, origin_h, origin_w, conf_thres=self.CONF_THRESH))
+        det_res = [self.to_detections(boxes) for boxes in batched_nms(candidates, self.IOU_THRESHOLD, self.MAX_DET)]
+        METRICS.observe('letterbox', t1 - t0)
+        METRICS.observe('execute', t2 - t1)
+        METRICS.observe('nms', time.perf_counter() - t2)
         return det_res, t2-t1
 
+    def to_detections(self, boxes) -> Detections:
+        """ Wrap the (N, 6) rows of the non max suppression, without a Python object per box """
+        return Detections(boxes, self.categories)
+
     def PostProcess(self, output, origin_h, origin_w):
+        boxes = self.NonMaxSuppression(self.Decode(output), origin_h, origin_w, conf_thres=self.CONF_THRESH, nms_thres=self.IOU_THRESHOLD)
+        return self.SplitBoxes(boxes)
+
+    def Decode(self, output):
         num = int(output[0])
         if self.yolo_version == "v5":
             pred = np.reshape(output[1:], (-1, self.LEN_ONE_RESULT))[:num, :]
             pred = pred[:, :6]
         elif self.yolo_version == "v7":
             pred = np.reshape(output[1:], (-1, 6))[:num, :]
-        
-        boxes = self.NonMaxSuppression(pred, origin_h, origin_w, conf_thres=self.CONF_THRESH, nms_thres=self.IOU_THRESHOLD)
+        return pred
+
+    def SplitBoxes(self, boxes):
         result_boxes = boxes[:, :4] if len(boxes) else np.array([])
         result_scores = boxes[:, 4] if len(boxes) else np.array([])
         result_classid = boxes[:, 5] if len(boxes) else np.array([])
         return result_boxes, result_scores, result_classid
-    
+
     def NonMaxSuppression(self, prediction, origin_h, origin_w, conf_thres=0.5, nms_thres=0.4):
+        return nms(self.FilterBoxes(prediction, origin_h, origin_w, conf_thres), nms_thres, self.MAX_DET)
+
+    def FilterBoxes(self, prediction, origin_h, origin_w, conf_thres=0.5):
+        """ Keep the predictions above the confidence threshold as [x1, y1, x2, y2, conf, class_id] rows in frame coordinates """
         boxes = prediction[prediction[:, 4] >= conf_thres]
         boxes[:, :4] = self.xywh2xyxy(origin_h, origin_w, boxes[:, :4])
         boxes[:, 0] = np.clip(boxes[:, 0], 0, origin_w -1)
         boxes[:, 2] = np.clip(boxes[:, 2], 0, origin_w -1)
         boxes[:, 1] = np.clip(boxes[:, 1], 0, origin_h -1)
         boxes[:, 3] = np.clip(boxes[:, 3], 0, origin_h -1)
-        confs = boxes[:, 4]
-        boxes = boxes[np.argsort(-confs)]
-        keep_boxes = []
-        while boxes.shape[0]:
-            large_overlap = self.bbox_iou(np.expand_dims(boxes[0, :4], 0), boxes[:, :4]) > nms_thres
-            label_match = boxes[0, -1] == boxes[:, -1]
-            # Indices of boxes with lower confidence scores, large IOUs and matching labels
-            invalid = large_overlap & label_match
-            keep_boxes += [boxes[0]]
-            boxes = boxes[~invalid]
-        boxes = np.stack(keep_boxes, 0) if len(keep_boxes) else np.array([])
         return boxes
     
     def xywh2xyxy(self, origin_h, origin_w, x):
@@ -157,28 +167,3 @@ class YoloTRT():
             y[:, 3] = x[:, 1] + x[:, 3] / 2
             y /= r_h
         return y
-    
-    def bbox_iou(self, box1, box2, x1y1x2y2=True):
-        if not x1y1x2y2:
-            # Transform from center and width to exact coordinates
-            b1_x1, b1_x2 = box1[:, 0] - box1[:, 2] / 2, box1[:, 0] + box1[:, 2] / 2
-            b1_y1, b1_y2 = box1[:, 1] - box1[:, 3] / 2, box1[:, 1] + box1[:, 3] / 2
-            b2_x1, b2_x2 = box2[:, 0] - box2[:, 2] / 2, box2[:, 0] + box2[:, 2] / 2
-            b2_y1, b2_y2 = box2[:, 1] - box2[:, 3] / 2, box2[:, 1] + box2[:, 3] / 2
-        else:
-            # Get the coordinates of bounding boxes
-            b1_x1, b1_y1, b1_x2, b1_y2 = box1[:, 0], box1[:, 1], box1[:, 2], box1[:, 3]
-            b2_x1, b2_y1, b2_x2, b2_y2 = box2[:, 0], box2[:, 1], box2[:, 2], box2[:, 3]
-
-        inter_rect_x1 = np.maximum(b1_x1, b2_x1)
-        inter_rect_y1 = np.maximum(b1_y1, b2_y1)
-        inter_rect_x2 = np.minimum(b1_x2, b2_x2)
-        inter_rect_y2 = np.minimum(b1_y2, b2_y2)
-        inter_area = np.clip(inter_rect_x2 - inter_rect_x1 + 1, 0, None) * \
-                     np.clip(inter_rect_y2 - inter_rect_y1 + 1, 0, None)
-        b1_area = (b1_x2 - b1_x1 + 1) * (b1_y2 - b1_y1 + 1)
-        b2_area = (b2_x2 - b2_x1 + 1) * (b2_y2 - b2_y1 + 1)
-
-        iou = inter_area / (b1_area + b2_area - inter_area + 1e-16)
-
-        return iou
\ No newline at end of file
@@ -23,6 +23,7 @@ class PinOut:
         self.input_pin = input_pin
         self.relay_pin = relay_pin
         self.led_pins = led_pins
+        self.listeners = [] # Functions called with the new status every time it is set
         
         GPIO.setmode(GPIO.BCM)
         GPIO.setwarnings(False)
@@ -59,6 +60,9 @@ class PinOut:
             self.write_relay(True)
         else:
             self.write_relay(False)
+
+        for listener in self.listeners:
+            listener(status)
             
         # print('Status set to: ', self.status)
 
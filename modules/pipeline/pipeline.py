@@ -0,0 +1,198 @@
+import queue
+import threading
+import time
+
+
+class DropOldestQueue(queue.Queue):
+    """ Bounded queue that never blocks the producer, when it is full the oldest item is discarded """
+
+    def put_latest(self, item) -> bool:
+        """ Put an item in the queue, discarding the oldest one if the queue is full
+
+        Args:
+            item (Any): The item to put in the queue
+
+        Returns:
+            bool: True if an item was discarded to make room for the new one
+        """
+        dropped = False
+        while True:
+            try:
+                self.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                    dropped = True
+                except queue.Empty:
+                    pass
+
+
+class Stage:
+    def __init__(self, name: str, function, inbox: DropOldestQueue = None, outbox: DropOldestQueue = None):
+        """ A pipeline stage, it runs a function in its own worker thread
+
+        Args:
+            name (str): Name of the stage, used in the throughput report
+            function (callable): Function applied to every item, source stages receive no arguments. If it returns None the item is not forwarded
+            inbox (DropOldestQueue, optional): Queue to read items from, None for a source stage. Defaults to None.
+            outbox (DropOldestQueue, optional): Queue to write results to, None for a sink stage. Defaults to None.
+        """
+        self.name = name
+        self.function = function
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.error = None
+        self.thread = None
+
+    def run(self, stop_event: threading.Event):
+        """ Worker loop, runs until the stop event is set or the function raises an exception
+
+        Args:
+            stop_event (threading.Event): Event shared by every stage of the pipeline
+        """
+        try:
+            while not stop_event.is_set():
+                if self.inbox is None:
+                    args = ()
+                else:
+                    try:
+                        args = (self.inbox.get(timeout=0.1),)
+                    except queue.Empty:
+                        continue
+
+                start_time = time.time()
+                result = self.function(*args)
+                self.busy_time += time.time() - start_time
+                self.processed += 1
+
+                if result is not None and self.outbox is not None:
+                    self.dropped += self.outbox.put_latest(result)
+        except Exception as e:
+            self.error = e
+            stop_event.set()
+
+    def stats(self, elapsed: float) -> dict:
+        """ Get the throughput of the stage
+
+        Args:
+            elapsed (float): Seconds since the pipeline started
+
+        Returns:
+            dict: Frames per second, mean time per item in milliseconds, busy ratio and items dropped by the next stage
+        """
+        return {
+            'fps': round(self.processed / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': round(1000 * self.busy_time / self.processed, 2) if self.processed else 0.0,
+            'busy': round(self.busy_time / elapsed, 2) if elapsed else 0.0,
+            'dropped': self.dropped,
+        }
+
+
+class Pipeline:
+    def __init__(self, queue_size: int = 2):
+        """ A staged pipeline with one worker per stage and bounded drop-oldest queues between stages,
+        so a slow stage only lowers the throughput but never builds up latency
+
+        Args:
+            queue_size (int, optional): Max number of items waiting between two stages. Defaults to 2.
+        """
+        self.queue_size = queue_size
+        self.stages = []
+        self.stop_event = threading.Event()
+        self.start_time = None
+
+    def add_stage(self, name: str, function):
+        """ Append a stage to the pipeline, the first stage added is the source
+
+        Args:
+            name (str): Name of the stage
+            function (callable): Function applied by the stage
+
+        Returns:
+            Pipeline: The pipeline itself, so calls can be chained
+        """
+        inbox = None
+        if self.stages:
+            inbox = DropOldestQueue(maxsize=self.queue_size)
+            self.stages[-1].outbox = inbox
+        self.stages.append(Stage(name, function, inbox))
+        return self
+
+    def start(self):
+        """ Start one worker thread per stage """
+        self.stop_event.clear()
+        self.start_time = time.time()
+        for stage in self.stages:
+            stage.thread = threading.Thread(target=stage.run, args=(self.stop_event,), name=stage.name, daemon=True)
+            stage.thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """ Stop every worker and wait for them to finish
+
+        Args:
+            timeout (float, optional): Seconds to wait for every worker. Defaults to 2.0.
+        """
+        self.stop_event.set()
+        for stage in self.stages:
+            if stage.thread is not None:
+                stage.thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self.start_time is not None and not self.stop_event.is_set()
+
+    def raise_errors(self):
+        """ Re-raise in the caller thread the first exception raised by a worker """
+        for stage in self.stages:
+            if stage.error is not None:
+                raise stage.error
+
+    def stats(self) -> dict:
+        """ Get the throughput of every stage
+
+        Returns:
+            dict: Stats of every stage by name
+        """
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
+
+    def report(self) -> str:
+        """ Build a human readable throughput report, the stage that takes the longest per item is the bottleneck
+
+        Returns:
+            str: The report
+        """
+        stats = self.stats()
+        bottleneck = max(stats, key=lambda name: stats[name]['latency_ms']) if stats else None
+        lines = []
+        for name, stage in stats.items():
+            lines.append("{:<12} {:>7} fps {:>8} ms/frame {:>5.0%} busy {:>6} dropped{}".format(
+                name, stage['fps'], stage['latency_ms'], stage['busy'], stage['dropped'],
+                ' <- bottleneck' if name == bottleneck else ''
+            ))
+        return '\n'.join(lines)
+
+    def run_forever(self, report_interval: float = 10.0, poll=None):
+        """ Start the pipeline and block until it is stopped, printing the throughput report periodically
+
+        Args:
+            report_interval (float, optional): Seconds between reports. Defaults to 10.0.
+            poll (callable, optional): Called on the caller thread every iteration, returning True stops the pipeline. Defaults to None.
+        """
+        self.start()
+        last_report = time.time()
+        try:
+            while self.running:
+                if poll is not None and poll():
+                    break
+                if time.time() - last_report > report_interval:
+                    print(self.report())
+                    last_report = time.time()
+                time.sleep(0.01)
+        finally:
+            self.stop()
+        self.raise_errors()
@@ -0,0 +1,219 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class BackgroundModel:
+    name = None
+
+    def __init__(self):
+        """ Base of the background models. A model is learned during the learning phase and keeps
+        adapting afterwards, while it is applied, so it never needs another learning phase.
+        """
+        self.frames = 0
+        self.cost_ms = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.frames > 0
+
+    def learn(self, frame):
+        """ Learn the background from a frame of the empty scene
+
+        Args:
+            frame (np.ndarray): BGR frame
+        """
+        self.measure(self.learn_frame, frame)
+
+    def apply(self, frame, update: bool = True):
+        """ Get the foreground of a frame
+
+        Args:
+            frame (np.ndarray): BGR frame
+            update (bool, optional): Adapt the model to the frame. Defaults to True.
+
+        Returns:
+            np.ndarray: uint8 mask, 255 on the foreground and 0 on the background
+        """
+        return self.measure(self.foreground, frame, update)
+
+    def measure(self, function, *args):
+        start_time = time.perf_counter()
+        result = function(*args)
+        cost_ms = 1000 * (time.perf_counter() - start_time)
+        self.cost_ms = cost_ms if self.frames == 0 else 0.9 * self.cost_ms + 0.1 * cost_ms
+        self.frames += 1
+        return result
+
+    def learn_frame(self, frame):
+        raise NotImplementedError
+
+    def foreground(self, frame, update: bool):
+        raise NotImplementedError
+
+    def memory(self) -> int:
+        """ Bytes used by the model """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """ Get the cost of the model
+
+        Returns:
+            dict: Model name, frames seen, moving average of the time per frame and memory in MB
+        """
+        return {
+            'model': self.name,
+            'frames': self.frames,
+            'cost_ms': round(self.cost_ms, 3),
+            'memory_mb': round(self.memory() / 2**20, 2),
+        }
+
+
+class RunningAverageModel(BackgroundModel):
+    name = 'running_average'
+
+    def __init__(self, threshold: int = 30, learning_rate: float = 0.1, adapt_rate: float = 0.01):
+        """ Running average of the frames, a pixel is foreground when a channel differs by more than the threshold.
+        After learning, only the background pixels are averaged so people standing still are not learned.
+
+        Args:
+            threshold (int, optional): Max difference of a background pixel. Defaults to 30.
+            learning_rate (float, optional): Weight of a frame while learning. Defaults to 0.1.
+            adapt_rate (float, optional): Weight of a frame after learning, 0 to keep the background static. Defaults to 0.01.
+        """
+        super().__init__()
+        self.threshold = threshold
+        self.learning_rate = learning_rate
+        self.adapt_rate = adapt_rate
+        self.background = None
+        self.background_u8 = None
+        self.diff = None
+        self.mask = None
+        self.background_mask = None
+
+    def set_background(self, background: np.ndarray):
+        """ Replace the learned background
+
+        Args:
+            background (np.ndarray): float BGR background
+        """
+        self.background = background.astype(float)
+        self.background_u8 = self.background.astype(np.uint8)
+        self.diff = np.empty_like(self.background_u8)
+        self.mask = np.empty(self.background.shape[:2], dtype=np.uint8)
+        self.background_mask = np.empty_like(self.mask)
+
+    def refresh(self):
+        # Same truncation as astype, without allocating a new array
+        np.copyto(self.background_u8, self.background, casting='unsafe')
+
+    def learn_frame(self, frame):
+        if self.background is None or self.background.shape != frame.shape:
+            self.set_background(frame)
+            return
+        cv2.accumulateWeighted(frame, self.background, self.learning_rate)
+        self.refresh()
+
+    def foreground(self, frame, update: bool):
+        if self.background is None or self.background.shape != frame.shape:
+            self.set_background(frame)
+        # Max channel of the difference, computed over the pixels as rows of 3 values
+        diff = cv2.absdiff(frame, self.background_u8, dst=self.diff)
+        mask = cv2.reduce(diff.reshape(-1, 3), 1, cv2.REDUCE_MAX, dst=self.mask.reshape(-1, 1)).reshape(frame.shape[:2])
+        _, mask = cv2.threshold(mask, self.threshold, 255, cv2.THRESH_BINARY, dst=mask)
+        if update and self.adapt_rate:
+            background_mask = cv2.bitwise_not(mask, dst=self.background_mask)
+            cv2.accumulateWeighted(frame, self.background, self.adapt_rate, mask=background_mask)
+            self.refresh()
+        return mask
+
+    def memory(self) -> int:
+        arrays = [self.background, self.background_u8, self.diff, self.mask, self.background_mask]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+class MOG2Model(BackgroundModel):
+    name = 'mog2'
+
+    def __init__(self, history: int = 500, var_threshold: float = 16, learning_rate: float = -1):
+        """ Gaussian mixture per pixel (cv2.BackgroundSubtractorMOG2), it handles repetitive motion like leaves or screens
+
+        Args:
+            history (int, optional): Frames that affect the model. Defaults to 500.
+            var_threshold (float, optional): Squared Mahalanobis distance of a background pixel. Defaults to 16.
+            learning_rate (float, optional): Learning rate after learning, -1 to derive it from the history. Defaults to -1.
+        """
+        super().__init__()
+        self.learning_rate = learning_rate
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold, detectShadows=False)
+        self.shape = None
+
+    def learn_frame(self, frame):
+        self.shape = frame.shape
+        self.subtractor.apply(frame, learningRate=-1)
+
+    def foreground(self, frame, update: bool):
+        self.shape = frame.shape
+        return self.subtractor.apply(frame, learningRate=self.learning_rate if update else 0)
+
+    def memory(self) -> int:
+        if self.shape is None:
+            return 0
+        height, width, channels = self.shape
+        # Weight, variance and mean of every gaussian as float32 plus the number of gaussians used, estimated from the OpenCV layout
+        return height * width * (self.subtractor.getNMixtures() * (2 + channels) * 4 + 1)
+
+
+class KNNModel(BackgroundModel):
+    name = 'knn'
+
+    def __init__(self, history: int = 500, dist2_threshold: float = 400, learning_rate: float = -1):
+        """ Nearest neighbours of the recent samples per pixel (cv2.BackgroundSubtractorKNN), it adapts faster than MOG2
+        to changes of light
+
+        Args:
+            history (int, optional): Frames that affect the model. Defaults to 500.
+            dist2_threshold (float, optional): Squared distance of a background pixel to a sample. Defaults to 400.
+            learning_rate (float, optional): Learning rate after learning, -1 to derive it from the history. Defaults to -1.
+        """
+        super().__init__()
+        self.learning_rate = learning_rate
+        self.subtractor = cv2.createBackgroundSubtractorKNN(history=history, dist2Threshold=dist2_threshold, detectShadows=False)
+        self.shape = None
+
+    def learn_frame(self, frame):
+        self.shape = frame.shape
+        self.subtractor.apply(frame, learningRate=-1)
+
+    def foreground(self, frame, update: bool):
+        self.shape = frame.shape
+        return self.subtractor.apply(frame, learningRate=self.learning_rate if update else 0)
+
+    def memory(self) -> int:
+        if self.shape is None:
+            return 0
+        height, width, channels = self.shape
+        # Short, mid and long term samples with a flag byte, plus the index of every set, estimated from the OpenCV layout
+        return height * width * (3 * self.subtractor.getNSamples() * (channels + 1) + 3)
+
+
+MODELS = {model.name: model for model in [RunningAverageModel, MOG2Model, KNNModel]}
+
+
+def create_model(name: str = RunningAverageModel.name, **params) -> BackgroundModel:
+    """ Create a background model by name
+
+    Args:
+        name (str, optional): running_average, mog2 or knn. Defaults to running_average.
+        **params: Arguments of the model
+
+    Raises:
+        ValueError: If the model does not exist
+
+    Returns:
+        BackgroundModel: The model
+    """
+    if name not in MODELS:
+        raise ValueError("Unknown background model {}, use one of {}".format(name, ', '.join(MODELS)))
+    return MODELS[name](**params)
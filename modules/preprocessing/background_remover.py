@@ -2,67 +2,105 @@ import cv2
 import time
 import numpy as np
 
+from .background_models import RunningAverageModel, create_model
+
 class BackgroundRemover:
-    def __init__(self, threshold=30, learning_time=10):
+    def __init__(self, threshold=30, learning_time=10, model='running_average', **params):
+        """ Remove the background of the frames with a pluggable background model
+
+        Args:
+            threshold (int, optional): Max difference of a background pixel for the running average. Defaults to 30.
+            learning_time (int, optional): Seconds of the learning phase. Defaults to 10.
+            model (str, optional): running_average, mog2 or knn. Defaults to 'running_average'.
+            **params: Arguments of the model
+        """
         self.start_time = time.time()
-        self.static_background = None
-        self.process_background = None
         self.threshold = threshold
         self.learning_time = learning_time
+        if model == RunningAverageModel.name:
+            params.setdefault('threshold', threshold)
+        self.model = create_model(model, **params)
+        self.mask = None
+        self.frame_mask = None
+
+    @classmethod
+    def from_config(cls, threshold, config=None):
+        """ Create the remover of the background_model section of the configuration
 
-    def learn_background(self, frame, stop_learning=False):
-        if self.static_background is None:
-            self.static_background = frame.copy().astype(float)
+        Args:
+            threshold (int): The background_threshold of the configuration
+            config (dict, optional): The background_model section, its name selects the model and the section of that name its arguments. Defaults to the running average.
 
-        if self.process_background is None:
-            self.process_background = frame.copy().astype(float)
-    
-        if not stop_learning:
-            alpha = 0.1  # Smoothing factor, this control the speed of learning
-            cv2.accumulateWeighted(frame, self.process_background, alpha)
-        else:
-            self.process_background = frame.copy().astype(float)
+        Returns:
+            BackgroundRemover: The remover
+        """
+        config = config or {}
+        model = config.get('name', RunningAverageModel.name)
+        return cls(threshold=threshold, model=model, **(config.get(model) or {}))
+
+    def learn_background(self, frame):
+        self.model.learn(frame)
 
     def set_static_background(self):
-        self.static_background = self.process_background.copy().astype(float)
+        """ End of the learning phase, the model keeps adapting while it removes the background """
+        print("Background model:", self.model.stats())
 
     def set_threshold(self, threshold):
         self.threshold = threshold
+        if isinstance(self.model, RunningAverageModel):
+            self.model.threshold = threshold
+
+    def update(self, frame):
+        """ Adapt the model to a frame that is not going to be processed """
+        self.mask = self.model.apply(frame)
+
+    def remove_background(self, frame, out=None, update=False):
+        """ Replace the background with white, black pixels are white as well
+
+        Args:
+            frame (np.ndarray): BGR frame
+            out (np.ndarray, optional): Buffer for the result, it can not be the frame. Defaults to a new array.
+            update (bool, optional): Adapt the model to the frame. Defaults to False.
+
+        Returns:
+            np.ndarray: Frame without background
+        """
+        if self.frame_mask is None or self.frame_mask.shape != frame.shape[:2]:
+            self.frame_mask = np.empty(frame.shape[:2], dtype=np.uint8)
+        if out is None:
+            out = np.empty_like(frame)
+
+        self.mask = self.model.apply(frame, update)
+        # Foreground pixels that are black end up white too
+        frame_mask = cv2.reduce(frame.reshape(-1, 3), 1, cv2.REDUCE_MAX, dst=self.frame_mask.reshape(-1, 1)).reshape(frame.shape[:2])
+        mask = cv2.min(self.mask, frame_mask, dst=self.frame_mask)
+
+        out.fill(255)
+        return cv2.bitwise_and(frame, frame, dst=out, mask=mask)
 
-    def remove_background(self, frame):
-        background = self.static_background.astype(dtype=np.uint8)
-        diff = cv2.absdiff(frame, background)
-        b, g, r = cv2.split(diff)
-        _, b_mask = cv2.threshold(b, self.threshold, 255, cv2.THRESH_BINARY)
-        _, g_mask = cv2.threshold(g, self.threshold, 255, cv2.THRESH_BINARY)
-        _, r_mask = cv2.threshold(r, self.threshold, 255, cv2.THRESH_BINARY)
-        mask = cv2.bitwise_or(cv2.bitwise_or(b_mask, g_mask), r_mask)
-        result = cv2.bitwise_and(frame, frame, mask=mask)
-        
-        def change_black_to_white(img):
-            img[np.where((img == [0,0,0]).all(axis=2))] = [255,255,255]
-            return img
-        
-        return change_black_to_white(result)
+    def stats(self) -> dict:
+        return self.model.stats()
 
 if __name__ == "__main__":
     cap = cv2.VideoCapture(0)
     background_remover = BackgroundRemover()
+    learned = False
 
     while True:
         _, frame = cap.read()
         frame = cv2.flip(frame, 0)
 
-        if time.time() - background_remover.start_time <= background_remover.learning_duration:
+        if time.time() - background_remover.start_time <= background_remover.learning_time:
             print("Learning...")
             background_remover.learn_background(frame)
             continue
-        elif background_remover.static_background is None:
+        elif not learned:
             background_remover.set_static_background()
+            learned = True
             print("Static background set")
             print(f"Background learned in {time.time() - background_remover.start_time} seconds")
 
-        result_frame = background_remover.remove_background(frame)
+        result_frame = background_remover.remove_background(frame, update=True)
         cv2.imshow('Background Removal', result_frame)
 
         if cv2.waitKey(1) == 27:  # ESC key
@@ -1,10 +1,36 @@
 import cv2
 from .parameters import Parameters
+from .preprocessing_plan import PreprocessingPlan
 
 class ImagePreprocessor(Parameters):
     
-    def __init__(self, params: dict = None):
+    def __init__(self, params: dict = None, buffers: int = 4, flip: bool = True):
         super().__init__(image_params=params)
+        self.buffers = buffers
+        self.flip = flip # False when the capture already flips the frames
+        self.plan = None
+
+    def compile(self) -> PreprocessingPlan:
+        """ Get the plan of resize_image, flip_image and change_contrast_and_brightness, it is only
+        rebuilt when a setter changed one of its parameters
+        """
+        key = (self.desired_width, self.desired_height, self.alpha, self.beta, self.flip)
+        if self.plan is None or self.plan.key != key:
+            self.plan = PreprocessingPlan(*key, buffers=self.buffers)
+        return self.plan
+
+    def preprocess(self, image):
+        """ Same result as the pipeline of resize_image, flip_image and change_contrast_and_brightness,
+        without allocating a frame per step
+
+        Args:
+            image (np.ndarray): BGR frame
+
+        Returns:
+            np.ndarray: The preprocessed frame, it is overwritten after the number of buffers of the preprocessor calls
+        """
+        self.image = self.compile()(image)
+        return self.image
     
     def resize_image(self, image):
         return cv2.resize(image, (self.desired_width, self.desired_height), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+
+class RegionFinder:
+    def __init__(self, scale: float = 0.25, min_area: float = 0.002, padding: float = 0.2, min_size: int = 96,
+                 max_regions: int = 4, max_coverage: float = 0.6):
+        """ Find the regions of a frame with moving objects from the foreground mask of the background model,
+        so the detector only runs over them
+
+        Args:
+            scale (float, optional): Scale of the mask where the blobs are searched. Defaults to 0.25.
+            min_area (float, optional): Min area of a blob as a fraction of the frame, smaller ones are noise. Defaults to 0.002.
+            padding (float, optional): Padding added to every side of a blob as a fraction of its size, so the object keeps some context. Defaults to 0.2.
+            min_size (int, optional): Min width and height of a region in pixels. Defaults to 96.
+            max_regions (int, optional): Regions are merged until there are no more than this. Defaults to 4.
+            max_coverage (float, optional): When the regions cover more than this fraction of the frame the whole frame is used. Defaults to 0.6.
+        """
+        self.scale = scale
+        self.min_area = min_area
+        self.padding = padding
+        self.min_size = min_size
+        self.max_regions = max_regions
+        self.max_coverage = max_coverage
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.frames = 0
+        self.skipped_frames = 0
+        self.area = 0.0
+
+    def find(self, mask: np.ndarray) -> list:
+        """ Get the regions of the foreground
+
+        Args:
+            mask (np.ndarray): uint8 foreground mask of the frame, non zero on the foreground
+
+        Returns:
+            list: (x1, y1, x2, y2) regions in frame coordinates, empty when there is no foreground
+        """
+        height, width = mask.shape[:2]
+        small = cv2.resize(mask, (max(1, int(width * self.scale)), max(1, int(height * self.scale))), interpolation=cv2.INTER_AREA)
+        # A pixel of the small mask is foreground when at least a quarter of its block is
+        _, small = cv2.threshold(small, 63, 255, cv2.THRESH_BINARY)
+        # Joins the parts of a body split by the threshold
+        small = cv2.morphologyEx(small, cv2.MORPH_CLOSE, self.kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(small, connectivity=8)
+
+        min_area = self.min_area * small.shape[0] * small.shape[1]
+        regions = []
+        for x, y, w, h, area in stats[1:count]:
+            if area < min_area:
+                continue
+            regions.append(self.to_frame((x, y, x + w, y + h), width, height))
+        regions = self.merge(regions)
+
+        if len(regions) > self.max_regions:
+            regions = [self.union(regions)]
+        if sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions) > self.max_coverage * width * height:
+            regions = [(0, 0, width, height)]
+
+        self.frames += 1
+        self.skipped_frames += not regions
+        self.area = 0.9 * self.area + 0.1 * sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions) / (width * height)
+        return regions
+
+    def to_frame(self, box: tuple, width: int, height: int) -> tuple:
+        """ Scale a box of the small mask to the frame, padded and with the min size """
+        x1, y1, x2, y2 = [value / self.scale for value in box]
+        pad_x = max(self.padding * (x2 - x1), (self.min_size - (x2 - x1)) / 2)
+        pad_y = max(self.padding * (y2 - y1), (self.min_size - (y2 - y1)) / 2)
+        return (
+            max(0, int(x1 - pad_x)),
+            max(0, int(y1 - pad_y)),
+            min(width, int(np.ceil(x2 + pad_x))),
+            min(height, int(np.ceil(y2 + pad_y))),
+        )
+
+    def merge(self, regions: list) -> list:
+        """ Merge the overlapping regions until none overlaps """
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    if self.overlap(regions[i], regions[j]):
+                        regions[i] = self.union([regions[i], regions[j]])
+                        del regions[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return regions
+
+    def overlap(self, a: tuple, b: tuple) -> bool:
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    def union(self, regions: list) -> tuple:
+        return (
+            min(region[0] for region in regions),
+            min(region[1] for region in regions),
+            max(region[2] for region in regions),
+            max(region[3] for region in regions),
+        )
+
+    def stats(self) -> dict:
+        """ Get the counters of the regions
+
+        Returns:
+            dict: Frames seen, frames without foreground and moving average of the fraction of the frame sent to the detector
+        """
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped_frames,
+            'area': round(self.area, 3),
+        }
@@ -0,0 +1,69 @@
+import threading
+
+
+class FrameBroadcaster:
+    def __init__(self, boundary: str = 'frame'):
+        """ Fan out the latest JPEG frame to every viewer. A viewer only receives a new frame once the
+        previous one has been written to its socket, so slow viewers skip frames instead of queueing them
+        and every viewer shares the same encoded bytes.
+
+        Args:
+            boundary (str, optional): Boundary of the multipart/x-mixed-replace stream. Defaults to 'frame'.
+        """
+        self.boundary = boundary
+        self.condition = threading.Condition()
+        self.header = ('--' + boundary + '\r\nContent-Type: image/jpeg\r\n\r\n').encode()
+        self.frame = None
+        self.part = None
+        self.sequence = 0
+        self.viewers = 0
+        self.skipped_frames = 0
+
+    @property
+    def mimetype(self) -> str:
+        return 'multipart/x-mixed-replace; boundary=' + self.boundary
+
+    def publish(self, jpeg: bytes):
+        """ Replace the latest frame and wake up the viewers waiting for it
+
+        Args:
+            jpeg (bytes): JPEG encoded frame
+        """
+        # The multipart chunk is built once and shared by every viewer
+        part = self.header + jpeg + b'\r\n'
+        with self.condition:
+            self.frame = jpeg
+            self.part = part
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def frames(self, timeout: float = 5.0, multipart: bool = False):
+        """ Generator of the newest frame every time the viewer is ready for one
+
+        Args:
+            timeout (float, optional): Seconds to wait for a new frame before waiting again. Defaults to 5.0.
+            multipart (bool, optional): Yield the frame as a multipart/x-mixed-replace chunk. Defaults to False.
+
+        Yields:
+            bytes: JPEG encoded frame
+        """
+        last_sequence = self.sequence
+        with self.condition:
+            self.viewers += 1
+        try:
+            while True:
+                with self.condition:
+                    if not self.condition.wait_for(lambda: self.sequence != last_sequence, timeout):
+                        continue
+                    if last_sequence:
+                        self.skipped_frames += self.sequence - last_sequence - 1
+                    last_sequence = self.sequence
+                    frame = self.part if multipart else self.frame
+                yield frame
+        finally:
+            with self.condition:
+                self.viewers -= 1
+
+    def stream(self):
+        """ Generator of the multipart/x-mixed-replace body of a viewer """
+        return self.frames(multipart=True)
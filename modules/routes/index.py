@@ -1,6 +1,7 @@
-import base64
 import json
-from flask import request, jsonify, render_template
+from flask import Response, request, jsonify, render_template
+
+from modules.metrics.metrics import METRICS
 
 class Routes:
     def index(self):
@@ -52,22 +53,26 @@ class Routes:
         """
         if request.method == 'POST':
             data = json.loads(str(request.data)[2:-1])
-            self.pinOut.status = data['status']
-            self.weapon = data['weapon'] if 'weapon' in data else None
-            if self.pinOut.status == 'sent':
-                message = ' '.join([
-                    self.weapon.title(),
-                    'detected at',
-                    self.client.node_config['name'],
-                    '-',
-                    self.client.node_config['location'],
-                    'by node',
-                    str(self.client.node_config['node_id'])
-                ])
-                self.client.new_alert_notification(message)
-            return jsonify({'status': 200, 'message': 'Status changed to {}'.format(self.pinOut.status)})
+            return jsonify({'status': 200, 'message': self.set_status(data['status'], data['weapon'] if 'weapon' in data else None)})
         if request.method == 'GET':
             return jsonify({'status': 200, 'message': self.pinOut.status})
+
+    def set_status(self, status: str, weapon: str = None) -> str:
+        """ Change the status of the system and send an alert notification when a weapon was detected
+
+        Args:
+            status (str): The new status
+            weapon (str, optional): The detected weapon, only used with the sent status. Defaults to None.
+
+        Returns:
+            str: The response message
+        """
+        self.pinOut.status = status
+        self.weapon = weapon
+        if self.pinOut.status == 'sent':
+            # Queued, the request never waits for the remote API, nor for the node to be registered
+            self.client.new_alert_notification(weapon=self.weapon)
+        return 'Status changed to {}'.format(self.pinOut.status)
                 
     def motion(self):
         """
@@ -79,12 +84,70 @@ class Routes:
         return jsonify({'status': 200, 'message': self.pinOut.read_pin()})
     
         
+    def notifications(self):
+        """
+        This method return the state of the alert notifications queue
+        
+        Responses:
+            - 200: depth, delivered, rejected, failures and delivery latency
+        """
+        if self.client.notifications is None:
+            return jsonify({'status': 200, 'message': None})
+        return jsonify({'status': 200, 'message': self.client.notifications.stats()})
+
+    def metrics(self):
+        """
+        This method return the metrics of this process and the last ones pushed by the inference process
+        in the Prometheus text format, or receive a post request with the metrics of the inference process
+        
+        Responses:
+            - 200: stage latency histograms and counters of dropped frames, status transitions, detections and alert delivery
+        """
+        if request.method == 'POST':
+            return jsonify({'status': 200, 'message': self.set_inference_metrics(request.get_json())})
+        if self.client.notifications is not None:
+            stats = self.client.notifications.stats()
+            for result in ('delivered', 'rejected', 'failures'):
+                METRICS.set('notifications_total', stats[result], {'result': result})
+            METRICS.gauge('notification_queue_depth', stats['depth'])
+        snapshots = [METRICS.snapshot()] + ([self.inference_metrics] if self.inference_metrics else [])
+        return Response(METRICS.render(*snapshots), mimetype='text/plain; version=0.0.4')
+
+    def set_inference_metrics(self, snapshot: dict) -> str:
+        """ Keep the metrics pushed by the inference process, they are served with the ones of this process
+
+        Args:
+            snapshot (dict): Metrics.snapshot of the inference process
+
+        Returns:
+            str: The response message
+        """
+        self.inference_metrics = snapshot
+        return 'Metrics received'
+
+    def events_stream(self):
+        """
+        This method return a server-sent events stream with the changes of the status and the PIR sensor,
+        the first event is a snapshot of both values
+        
+        Responses:
+            - 200: text/event-stream of {"name": ..., "value": ...} events
+        """
+        return Response(('data: ' + json.dumps(event) + '\n\n' for event in self.events.subscribe()), mimetype='text/event-stream')
+
     def video_feed(self):
-        """ This method recieve a post request with an image and send it to the client
+        """ This method recieve a post request with a JPEG image and publish it to the viewers of the stream
 
         Returns:
-            _type_: Return a 200 status code to indicate success
+            _type_: Return a 200 status code to indicate success, the X-Viewers header has the number of viewers
         """        
-        image_data = request.data
-        self.socketio.emit('new_image', {'image': base64.b64encode(image_data).decode('utf-8')})
-        return '', 200  # Return a 200 status code to indicate success
\ No newline at end of file
+        self.broadcaster.publish(request.data)
+        return '', 200, {'X-Viewers': str(self.broadcaster.viewers)}  # Return a 200 status code to indicate success
+
+    def stream(self):
+        """ This method return a MJPEG stream with the latest image, a slow client skips frames instead of queueing them
+
+        Responses:
+            - 200: multipart/x-mixed-replace stream of JPEG images
+        """
+        return Response(self.broadcaster.stream(), mimetype=self.broadcaster.mimetype)
@@ -0,0 +1,107 @@
+import os
+import threading
+from multiprocessing.connection import Client, Listener
+
+
+class ControlServer:
+    def __init__(self, address: str, handlers: dict, events=None):
+        """ Lightweight request/reply channel over a unix socket, for processes on the same host
+
+        Args:
+            address (str): Path of the unix socket
+            handlers (dict): Message type to a function that receives the message and returns the reply message
+            events (EventPublisher, optional): Publisher streamed to the clients that send a subscribe message. Defaults to None.
+        """
+        self.address = address
+        self.handlers = handlers
+        self.events = events
+        self.listener = None
+
+    def start(self):
+        """ Start listening in a background thread
+
+        Returns:
+            ControlServer: The server itself
+        """
+        if os.path.exists(self.address):
+            os.remove(self.address) # Stale socket of a previous run
+        self.listener = Listener(self.address, family='AF_UNIX')
+        threading.Thread(target=self.accept, name='control', daemon=True).start()
+        return self
+
+    def accept(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                return # Listener closed
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        """ Answer the requests of a client until it disconnects, replies have the same shape as the HTTP API """
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if message['type'] == 'subscribe' and self.events is not None:
+                    return self.stream_events(connection)
+                try:
+                    reply = {'status': 200, 'message': self.handlers[message['type']](message)}
+                except Exception as e:
+                    reply = {'status': 500, 'message': str(e)}
+                connection.send(reply)
+
+    def stream_events(self, connection):
+        """ Push every event to a subscribed client until it disconnects """
+        events = self.events.subscribe()
+        try:
+            for event in events:
+                connection.send(event)
+        except OSError:
+            pass
+        finally:
+            events.close()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+
+
+class ControlClient:
+    def __init__(self, address: str):
+        """ Client of a ControlServer, it can be shared by several threads
+
+        Args:
+            address (str): Path of the unix socket
+
+        Raises:
+            OSError: If the server is not listening
+        """
+        self.connection = Client(address, family='AF_UNIX')
+        self.lock = threading.Lock()
+
+    def request(self, message_type: str, **data):
+        """ Send a request and wait for its reply
+
+        Args:
+            message_type (str): Message type
+            **data: Message fields
+
+        Raises:
+            ConnectionError: If the server could not handle the request
+
+        Returns:
+            Any: The reply message
+        """
+        with self.lock:
+            self.connection.send(dict(data, type=message_type))
+            reply = self.connection.recv()
+        if reply['status'] != 200:
+            raise ConnectionError(reply['message'])
+        return reply['message']
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,138 @@
+import json
+import queue
+import threading
+import time
+from multiprocessing.connection import Client
+
+import requests
+
+
+class EventPublisher:
+    def __init__(self, keepalive: float = 15.0):
+        """ Push status and motion changes to every subscriber, a new subscriber first gets a snapshot of the current values
+
+        Args:
+            keepalive (float, optional): Seconds without events before a ping is sent, so dead subscribers are detected. Defaults to 15.0.
+        """
+        self.keepalive = keepalive
+        self.lock = threading.Lock()
+        self.state = {}
+        self.subscribers = []
+
+    def publish(self, name: str, value):
+        """ Publish a value, nothing is sent if it did not change
+
+        Args:
+            name (str): Name of the value, e.g. status or motion
+            value (Any): The new value
+        """
+        with self.lock:
+            if name in self.state and self.state[name] == value:
+                return
+            self.state[name] = value
+            for subscriber in self.subscribers:
+                subscriber.put({'name': name, 'value': value})
+
+    def subscribe(self):
+        """ Generator of the events of a subscriber
+
+        Yields:
+            dict: Events with name and value, the first one is the snapshot of every value
+        """
+        subscriber = queue.Queue()
+        with self.lock:
+            self.subscribers.append(subscriber)
+            snapshot = dict(self.state)
+        try:
+            yield {'name': 'snapshot', 'value': snapshot}
+            while True:
+                try:
+                    yield subscriber.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield {'name': 'ping', 'value': None}
+        finally:
+            with self.lock:
+                self.subscribers.remove(subscriber)
+
+
+class EventSubscriber:
+    def __init__(self, address: str = None, url: str = None, report_interval: float = 60.0):
+        """ Keep a local copy of the values pushed by an EventPublisher, so reading them needs no request.
+        Events come from the control channel when an address is given, otherwise from a server-sent events url.
+
+        Args:
+            address (str, optional): Unix socket of the ControlServer. Defaults to None.
+            url (str, optional): Url of the server-sent events route. Defaults to None.
+            report_interval (float, optional): Seconds between reports of the requests saved by the cache. Defaults to 60.0.
+        """
+        self.address = address
+        self.url = url
+        self.report_interval = report_interval
+        self.state = {}
+        self.connected = threading.Event()
+        self.saved_requests = 0
+        self.last_report = time.time()
+
+    def start(self):
+        """ Start receiving events in a background thread, reconnecting when the connection drops
+
+        Returns:
+            EventSubscriber: The subscriber itself
+        """
+        threading.Thread(target=self.run, name='events', daemon=True).start()
+        return self
+
+    def run(self):
+        while True:
+            try:
+                for event in self.events():
+                    self.apply(event)
+            except Exception as e:
+                print("Events connection lost:", e)
+            self.connected.clear()
+            time.sleep(1)
+
+    def events(self):
+        if self.address:
+            with Client(self.address, family='AF_UNIX') as connection:
+                connection.send({'type': 'subscribe'})
+                while True:
+                    yield connection.recv()
+        else:
+            with requests.get(self.url, stream=True, timeout=(2, 60)) as response:
+                for line in response.iter_lines():
+                    if line.startswith(b'data: '):
+                        yield json.loads(line[6:].decode())
+
+    def apply(self, event: dict):
+        if event['name'] == 'snapshot':
+            self.state.update(event['value'])
+            self.connected.set()
+        elif event['name'] != 'ping':
+            self.state[event['name']] = event['value']
+
+    def get(self, name: str):
+        """ Get the latest value pushed by the server
+
+        Args:
+            name (str): Name of the value
+
+        Raises:
+            KeyError: If the subscriber is not connected or the value is unknown
+
+        Returns:
+            Any: The value
+        """
+        if not self.connected.is_set():
+            raise KeyError(name)
+        value = self.state[name]
+        self.saved_requests += 1
+        if time.time() - self.last_report > self.report_interval:
+            print("Saved {} requests to the server in the last {:.0f} seconds".format(self.saved_requests, time.time() - self.last_report))
+            self.saved_requests = 0
+            self.last_report = time.time()
+        return value
+
+    def set(self, name: str, value):
+        """ Update a value locally, e.g. after the process changed it on the server """
+        self.state[name] = value
@@ -0,0 +1,128 @@
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+
+class FrameRing:
+    MAGIC = b'WDFR'
+    HEADER = struct.Struct('<4sIIQ')  # magic, slots, slot size, last sequence written
+    SLOT_HEADER = struct.Struct('<QdIIII')  # sequence, capture timestamp, height, width, channels, bytes
+
+    def __init__(self, path: str, slots: int = None, slot_size: int = None):
+        """ Ring buffer of raw frames in shared memory, so a frame can go from one process to another on
+        the same host without encoding it. There is a single writer, readers always get the newest frame.
+
+        Args:
+            path (str): File backing the ring, it should live in a tmpfs like /dev/shm
+            slots (int, optional): Number of frames in the ring, only needed to create it. Defaults to None.
+            slot_size (int, optional): Max bytes of a frame, only needed to create it. Defaults to None.
+        """
+        self.path = path
+        if slots is not None:
+            size = self.HEADER.size + slots * (self.SLOT_HEADER.size + slot_size)
+            with open(path, 'wb') as file:
+                file.truncate(size)
+
+        self.file = open(path, 'r+b')
+        self.buffer = mmap.mmap(self.file.fileno(), 0)
+        if slots is not None:
+            self.HEADER.pack_into(self.buffer, 0, self.MAGIC, slots, slot_size, 0)
+
+        magic, self.slots, self.slot_size, _ = self.HEADER.unpack_from(self.buffer, 0)
+        if magic != self.MAGIC:
+            raise ValueError("{} is not a frame ring".format(path))
+        self.last_sequence = 0
+
+    @classmethod
+    def create(cls, path: str, slots: int, slot_size: int):
+        """ Create the ring, replacing an existing one """
+        return cls(path, slots, slot_size)
+
+    @classmethod
+    def open(cls, path: str):
+        """ Open a ring created by another process """
+        return cls(path)
+
+    @property
+    def sequence(self) -> int:
+        return self.HEADER.unpack_from(self.buffer, 0)[3]
+
+    def slot_offset(self, sequence: int) -> int:
+        return self.HEADER.size + (sequence % self.slots) * (self.SLOT_HEADER.size + self.slot_size)
+
+    def write(self, frame: np.ndarray, timestamp: float = None) -> int:
+        """ Copy a frame into the next slot
+
+        Args:
+            frame (np.ndarray): uint8 frame
+            timestamp (float, optional): Capture timestamp. Defaults to now.
+
+        Raises:
+            ValueError: If the frame does not fit in a slot
+
+        Returns:
+            int: Sequence number of the frame
+        """
+        if frame.nbytes > self.slot_size:
+            raise ValueError("Frame of {} bytes does not fit in a slot of {} bytes".format(frame.nbytes, self.slot_size))
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        sequence = self.sequence + 1
+        offset = self.slot_offset(sequence)
+        # The slot is marked as invalid while it is written, so readers can detect torn frames
+        self.SLOT_HEADER.pack_into(self.buffer, offset, 0, 0.0, 0, 0, 0, 0)
+        data = np.frombuffer(self.buffer, dtype=np.uint8, count=frame.nbytes, offset=offset + self.SLOT_HEADER.size)
+        np.copyto(data, frame.reshape(-1))
+        self.SLOT_HEADER.pack_into(self.buffer, offset, sequence, timestamp or time.time(), height, width, channels, frame.nbytes)
+        struct.pack_into('<Q', self.buffer, self.HEADER.size - 8, sequence)
+        return sequence
+
+    def read(self) -> tuple:
+        """ Read the newest frame if it was not read before
+
+        Returns:
+            tuple: The sequence number, the capture timestamp and a copy of the frame, the frame is None when there is no new frame
+        """
+        sequence = self.sequence
+        if sequence == self.last_sequence or sequence == 0:
+            return self.last_sequence, None, None
+
+        offset = self.slot_offset(sequence)
+        slot_sequence, timestamp, height, width, channels, nbytes = self.SLOT_HEADER.unpack_from(self.buffer, offset)
+        if slot_sequence != sequence:
+            return self.last_sequence, None, None
+        data = np.frombuffer(self.buffer, dtype=np.uint8, count=nbytes, offset=offset + self.SLOT_HEADER.size)
+        frame = data.copy()
+        if self.SLOT_HEADER.unpack_from(self.buffer, offset)[0] != sequence:
+            return self.last_sequence, None, None  # Overwritten while it was copied
+
+        self.last_sequence = sequence
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        return sequence, timestamp, frame.reshape(shape)
+
+    def wait(self, timeout: float = 1.0, interval: float = 0.002) -> tuple:
+        """ Wait for a new frame
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Defaults to 1.0.
+            interval (float, optional): Seconds between checks. Defaults to 0.002.
+
+        Returns:
+            tuple: Same as read
+        """
+        deadline = time.time() + timeout
+        while True:
+            result = self.read()
+            if result[2] is not None or time.time() > deadline:
+                return result
+            time.sleep(interval)
+
+    def close(self, unlink: bool = False):
+        self.buffer.close()
+        self.file.close()
+        if unlink and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,354 @@
+""" Replay a recorded clip through the inference path, deterministically and without camera nor server.
+
+The frames go through the same ImageHandler.preprocess, background removal, Detect and state machine
+of inference.py. The PIR comes from a scripted timeline and the state machine runs on a virtual
+clock that advances one frame interval per frame, so status transitions and alerts only depend on
+the clip, the timeline and the configuration. The detector is a stand-in by default: YoloTRT over a
+CPUSession whose model reports the weapons of the timeline, so the letterbox and NMS still run.
+
+The timeline is a JSON file, by default next to the clip with the .json extension:
+    {"fps": 15, "motion": [[12, 32]], "weapons": [[16, 22, "Gun"]]}
+motion are the intervals in seconds where the PIR is on, weapons the intervals where a weapon is
+in the frame, they are also the labels of the time to alert. Without clip a synthetic one is used.
+
+Usage:
+    python replay.py [videos/clip.mp4] [--timeline clip.json] [--output results.json] [--engine]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import inference
+from modules.model.detect_w_trt import Detect as EngineDetect
+from modules.model.session import CPUSession
+from modules.model.yoloDet import YoloTRT
+from modules.preprocessing.background_remover import BackgroundRemover
+from modules.preprocessing.image_preprocessing import ImagePreprocessor
+from modules.preprocessing.roi import RegionFinder
+
+
+class VirtualClock:
+    def __init__(self, start: float = 0.0):
+        """ Clock of the replay, it only moves when it is advanced. It has the time and sleep of the time module """
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+    advance = sleep
+
+
+class Timeline:
+    def __init__(self, fps: float = 15.0, duration: float = None, motion: list = None, weapons: list = None, confidence: float = 0.8):
+        """ Scripted PIR and weapon labels of a clip
+
+        Args:
+            fps (float, optional): Frames per second of the clip. Defaults to 15.0.
+            duration (float, optional): Seconds of the synthetic clip. Defaults to 5 seconds after the last interval.
+            motion (list, optional): [start, end] seconds where the PIR is on. Defaults to the weapon intervals.
+            weapons (list, optional): [start, end, class] seconds where a weapon is in the frame. Defaults to none.
+            confidence (float, optional): Confidence of the weapons reported by the stand-in detector. Defaults to 0.8.
+        """
+        self.fps = fps
+        self.weapons = [(float(start), float(end), name) for start, end, name in (weapons or [])]
+        self.motion = [(float(start), float(end)) for start, end in (motion if motion is not None else [w[:2] for w in self.weapons])]
+        self.duration = duration or max([end for _, end in self.motion] + [end for _, end, _ in self.weapons] + [0]) + 5
+        self.confidence = confidence
+
+    @classmethod
+    def synthetic(cls):
+        """ Timeline of the synthetic clip: someone crosses the scene from 12 s to 32 s with a gun from 16 s to 22 s """
+        return cls(duration=45, motion=[[12, 32]], weapons=[[16, 22, 'Gun']])
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def to_dict(self) -> dict:
+        return {'fps': self.fps, 'duration': self.duration, 'motion': self.motion, 'weapons': self.weapons, 'confidence': self.confidence}
+
+    def motion_at(self, t: float) -> bool:
+        return any(start <= t < end for start, end in self.motion)
+
+    def weapon_at(self, t: float) -> str:
+        """ Class of the weapon in the frame at t, None when there is none """
+        for start, end, name in self.weapons:
+            if start <= t < end:
+                return name
+        return None
+
+
+def synthetic_clip(timeline: Timeline, width: int = 960, height: int = 540, seed: int = 0):
+    """ Generate the frames of a clip for a timeline: a static textured scene, a person crossing it while
+    the PIR is on and a red object in their hand while there is a weapon. Every frame has sensor noise
+
+    Yields:
+        np.ndarray: BGR frames
+    """
+    rng = np.random.RandomState(seed)
+    scene = cv2.resize(rng.randint(0, 256, (height // 16, width // 16, 3)).astype(np.uint8), (width, height), interpolation=cv2.INTER_LINEAR)
+    noises = [rng.randint(0, 6, (height, width, 3)).astype(np.uint8) for _ in range(4)]
+    for i in range(int(timeline.duration * timeline.fps)):
+        t = i / timeline.fps
+        frame = cv2.add(scene, noises[i % len(noises)])
+        for start, end in timeline.motion:
+            if start <= t < end:
+                x = int((t - start) / (end - start) * (width - width // 8))
+                cv2.rectangle(frame, (x, height // 4), (x + width // 8, height - height // 8), (40, 40, 40), -1)
+                if timeline.weapon_at(t):
+                    cv2.rectangle(frame, (x + width // 8, height // 2), (x + width // 8 + width // 20, height // 2 + height // 30), (0, 0, 200), -1)
+        yield frame
+
+
+def read_clip(path: str):
+    """ Decode the frames of a video file
+
+    Yields:
+        np.ndarray: BGR frames
+    """
+    capture = cv2.VideoCapture(path)
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+class ScriptedModel:
+    def __init__(self, timeline: Timeline, clock: VirtualClock, categories: tuple = ("Gun", "Knife"), false_positives: float = 0.0, seed: int = 0):
+        """ Model of the CPUSession stand-in, it reports the weapon of the timeline in the center of every input,
+        so it only finds it when the detector runs, i.e. the state machine is running and there are regions
+
+        Args:
+            timeline (Timeline): Weapons and their confidence
+            clock (VirtualClock): Clock of the replay
+            categories (tuple, optional): Class names of the ids. Defaults to ("Gun", "Knife").
+            false_positives (float, optional): Probability of a box without weapon, from a seeded generator. Defaults to 0.0.
+            seed (int, optional): Seed of the false positives. Defaults to 0.
+        """
+        self.timeline = timeline
+        self.clock = clock
+        self.categories = categories
+        self.false_positives = false_positives
+        self.rng = np.random.RandomState(seed)
+
+    def __call__(self, inputs: np.ndarray) -> list:
+        _, _, h, w = inputs.shape
+        name = self.timeline.weapon_at(self.clock.time())
+        rows = []
+        for _ in range(len(inputs)):
+            if name:
+                rows.append([[w / 2, h / 2, w / 4, h / 4, self.timeline.confidence, self.categories.index(name)]])
+            elif self.false_positives and self.rng.rand() < self.false_positives:
+                rows.append([[w / 2, h / 2, w / 4, h / 4, self.timeline.confidence, self.rng.randint(len(self.categories))]])
+            else:
+                rows.append([])
+        return rows
+
+
+def standin_detect(timeline: Timeline, clock: VirtualClock, latency: float = 0.0, false_positives: float = 0.0, seed: int = 0) -> EngineDetect:
+    """ Detect of the TensorRT engine over a CPUSession with a ScriptedModel, with the input and batch of the engine """
+    session = CPUSession(640, 640, batch_size=4, model=ScriptedModel(timeline, clock, false_positives=false_positives, seed=seed), latency=latency)
+    return EngineDetect(YoloTRT(conf=0.3, session=session))
+
+
+class ReplayHandler(inference.InferenceHandler):
+    def __init__(self, clock: VirtualClock, timeline: Timeline, config: dict, detection):
+        """ InferenceHandler without camera, server nor transport: the PIR comes from the timeline and the
+        status only lives here. Preprocessing, background and regions are built from config, so several
+        configurations can be replayed in the same process
+        """
+        self.clock = clock
+        self.timeline = timeline
+        self.detection = detection
+        self.imagePreprocessor = ImagePreprocessor(config['preprocessing'])
+        self.backgroundRemover = BackgroundRemover.from_config(config['background_threshold'], config.get('background_model'))
+        roi = config.get('roi') or {}
+        self.regionFinder = RegionFinder(**{key: value for key, value in roi.items() if key != 'enabled'}) if roi.get('enabled') else None
+        self.transitions = []
+        self.detector_frames = 0
+        self.status = 'learning'
+        self.start_bg_time = clock.time()
+
+    @property
+    def status(self):
+        return self.prev_status
+
+    @status.setter
+    def status(self, status):
+        if status != self.prev_status:
+            inference.global_time = self.clock.time()
+            self.prev_status = status
+            self.transitions.append((round(self.clock.time(), 3), status))
+
+    def get_status(self):
+        return self.prev_status
+
+    def obj_detect(self, image):
+        self.detector_frames += 1
+        return super().obj_detect(image)
+
+    @property
+    def motion(self):
+        return self.timeline.motion_at(self.clock.time())
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    values = np.asarray(values) * 1000
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def score(timeline: Timeline, transitions: list, grace: float = 2.0) -> dict:
+    """ Match the alerts, the transitions to sent, with the weapons of the timeline
+
+    Args:
+        timeline (Timeline): Weapon intervals
+        transitions (list): (seconds, status) transitions
+        grace (float, optional): Seconds after the end of a weapon where its alert still counts. Defaults to 2.0.
+
+    Returns:
+        dict: Time to alert of every weapon, None when it was missed, and the alerts without weapon
+    """
+    alerts = [t for t, status in transitions if status == 'sent']
+    matched = set()
+    time_to_alert = []
+    for start, end, _ in timeline.weapons:
+        alert = next((t for t in alerts if start <= t <= end + grace and t not in matched), None)
+        if alert is not None:
+            matched.add(alert)
+        time_to_alert.append(None if alert is None else round(alert - start, 3))
+    return {
+        'alerts': len(alerts),
+        'time_to_alert_s': time_to_alert,
+        'missed': time_to_alert.count(None),
+        'false_alarms': len(alerts) - len(matched),
+    }
+
+
+class Replay:
+    def __init__(self, timeline: Timeline, config: dict = None, detection=None, latency: float = 0.0, false_positives: float = 0.0, seed: int = 0, quiet: bool = True):
+        """ Replay of a clip through the inference path
+
+        Args:
+            timeline (Timeline): Scripted PIR and weapon labels
+            config (dict, optional): Configuration, its preprocessing, background and roi sections are used. Defaults to config/config.yml.
+            detection (Detect, optional): Detector. Defaults to the stand-in of standin_detect.
+            latency (float, optional): Seconds the stand-in engine sleeps per execution. Defaults to 0.0.
+            false_positives (float, optional): Probability of a stand-in box without weapon. Defaults to 0.0.
+            seed (int, optional): Seed of the stand-in false positives. Defaults to 0.
+            quiet (bool, optional): Hide the prints of the inference path. Defaults to True.
+        """
+        self.timeline = timeline
+        self.config = config or inference.config
+        self.clock = VirtualClock()
+        self.detection = detection or standin_detect(timeline, self.clock, latency, false_positives, seed)
+        self.quiet = quiet
+
+    def run(self, frames, max_frames: int = None) -> dict:
+        """ Run the frames, paced by the virtual clock at the fps of the timeline
+
+        Args:
+            frames (iterable): BGR frames of the clip
+            max_frames (int, optional): Stop after this many frames. Defaults to the whole clip.
+
+        Returns:
+            dict: Results, everything but throughput_fps and latency_ms is deterministic
+        """
+        handler = ReplayHandler(self.clock, self.timeline, self.config, self.detection)
+        latencies, detected_frames = [], 0
+        # The state machine and the background learning read the time of the inference module
+        clock, inference.time = inference.time, self.clock
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.quiet:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+                for i, frame in enumerate(frames):
+                    if max_frames is not None and i >= max_frames:
+                        break
+                    start = time.perf_counter()
+                    image = handler.preprocess(frame)
+                    _, detected = handler.process_frame(image, show=False)
+                    latencies.append(time.perf_counter() - start)
+                    detected_frames += bool(detected)
+                    self.clock.advance(1.0 / self.timeline.fps)
+        finally:
+            inference.time = clock
+
+        results = {
+            'frames': len(latencies),
+            'duration_s': round(len(latencies) / self.timeline.fps, 3),
+            'detector_frames': handler.detector_frames,
+            'detected_frames': detected_frames,
+            'throughput_fps': round(len(latencies) / sum(latencies), 2) if latencies else None,
+            'latency_ms': percentiles(latencies),
+            'transitions': handler.transitions,
+        }
+        results.update(score(self.timeline, handler.transitions))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('clip', nargs='?', help='Video file, a synthetic clip is used without it')
+    parser.add_argument('--timeline', help='Timeline JSON, defaults to the clip with the .json extension')
+    parser.add_argument('--frames', type=int, help='Max frames to replay')
+    parser.add_argument('--output', help='Write the results to this JSON file instead of stdout')
+    parser.add_argument('--engine', action='store_true', help='Use the Detect of inference.py instead of the stand-in')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of the stand-in engine per execution')
+    parser.add_argument('--false-positives', type=float, default=0.0, help='Probability of a stand-in box without weapon')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    timeline_path = args.timeline or (os.path.splitext(args.clip)[0] + '.json' if args.clip else None)
+    if timeline_path and os.path.exists(timeline_path):
+        timeline = Timeline.load(timeline_path)
+    elif args.clip:
+        print("Timeline {} not found, replaying without PIR nor weapons".format(timeline_path), file=sys.stderr)
+        capture = cv2.VideoCapture(args.clip)
+        timeline = Timeline(fps=capture.get(cv2.CAP_PROP_FPS) or 15.0, motion=[])
+        capture.release()
+    else:
+        timeline = Timeline.synthetic()
+
+    replay = Replay(timeline, detection=inference.Detect() if args.engine else None, latency=args.latency,
+        false_positives=args.false_positives, seed=args.seed)
+    results = replay.run(read_clip(args.clip) if args.clip else synthetic_clip(timeline, seed=args.seed), args.frames)
+    results = {
+        'clip': os.path.basename(args.clip) if args.clip else 'synthetic',
+        'detector': 'engine' if args.engine else 'stand-in',
+        'timeline': timeline.to_dict(),
+        'config': {key: replay.config.get(key) for key in ('preprocessing', 'background_threshold', 'background_model', 'roi')},
+        **results,
+    }
+
+    data = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data + '\n')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
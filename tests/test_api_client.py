@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from benchmarks.utils import StubServer
+from modules.api.apiClient import ApiClient
+
+
+def request(client: ApiClient, *args, **kwargs):
+    return client.call_soon(client.request(*args, **kwargs)).result(10)
+
+
+@pytest.mark.parametrize('status', [500, 503, 408, 429])
+def test_unavailable_api_is_retried_then_raised(status):
+    with StubServer({'error': 'Unavailable'}, status=status) as server:
+        client = ApiClient(server.url, 'token', retries=2, backoff=0.01)
+        try:
+            with pytest.raises(ConnectionError):
+                request(client, 'GET', '/nodes')
+        finally:
+            client.close()
+    assert len(server.requests) == 3
+
+
+def test_retries_of_a_single_request():
+    with StubServer({'error': 'Unavailable'}, status=503) as server:
+        client = ApiClient(server.url, 'token', retries=2, backoff=0.01)
+        try:
+            with pytest.raises(ConnectionError):
+                request(client, 'POST', '/notifications', retries=0, json={'type': 3})
+        finally:
+            client.close()
+    assert len(server.requests) == 1
+
+
+def test_timeout_is_retried_then_raised():
+    with StubServer({'id': 1}, delay=0.3) as server:
+        client = ApiClient(server.url, 'token', timeout=0.05, retries=1, backoff=0.01)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                request(client, 'GET', '/nodes')
+        finally:
+            client.close()
+    assert len(server.requests) == 2
+
+
+def test_rejection_is_not_retried():
+    with StubServer({'detail': 'Invalid type'}, status=400) as server:
+        client = ApiClient(server.url, 'token', retries=2, backoff=0.01)
+        try:
+            assert request(client, 'PATCH', '/nodes/1', json={'status': True}) == {'detail': 'Invalid type'}
+            with pytest.raises(AssertionError):
+                request(client, 'PATCH', '/nodes/1', strict=True, json={'status': True})
+        finally:
+            client.close()
+    assert [(method, path) for method, path, _ in server.requests] == [('PATCH', '/nodes/1')] * 2
+
+
+def test_close_releases_the_session_and_the_loop(tmp_path):
+    with StubServer({'id': 1, 'status': True}) as server:
+        client = ApiClient(server.url, 'token')
+        client.start_notifications(str(tmp_path))
+        assert request(client, 'PATCH', '/nodes/1', json={'status': True}) == {'id': 1, 'status': True}
+        client.close()
+
+    assert not client.notifications.running and not client.notifications.thread.is_alive()
+    assert client.session is None
+    assert not client.thread.is_alive()
+    assert not client.loop.is_running()
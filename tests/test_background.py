@@ -0,0 +1,23 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from benchmarks.background import remove_background_reference, scene
+from modules.preprocessing.background_remover import BackgroundRemover
+
+
+@pytest.mark.parametrize('width, height', [(640, 480), (1280, 720), (1920, 1080)])
+@pytest.mark.parametrize('threshold', [1, 30, 254])
+@pytest.mark.parametrize('seed', range(2))
+def test_fused_removal_is_pixel_exact(width, height, threshold, seed):
+    background, frame = scene(width, height, seed)
+    remover = BackgroundRemover(threshold=threshold, adapt_rate=0)
+    remover.model.set_background(background)
+    expected = remove_background_reference(frame, background, threshold)
+
+    np.testing.assert_array_equal(remover.remove_background(frame), expected)
+    out = np.empty_like(frame)
+    result = remover.remove_background(frame, out)
+    assert result is out
+    np.testing.assert_array_equal(out, expected)
@@ -0,0 +1,95 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+bulk = pytest.importorskip('bulk')
+
+from modules.model.session import CPUSession
+from modules.model.yoloDet import YoloTRT
+
+
+def boxes(inputs):
+    """ A gun in the center of every frame """
+    return [[[320, 320, 64, 64, 0.9, 0]] for _ in inputs]
+
+
+class StandIn:
+    def __init__(self, batch_size: int = 4):
+        """ Detector on the CPU stand-in session, as BulkDetection uses its engine """
+        self.model = YoloTRT(conf=0.3, yolo_ver="v5", session=CPUSession(batch_size=batch_size, model=boxes))
+
+
+class FailingServer:
+    def submit(self, frame):
+        future = Future()
+        future.set_exception(ConnectionError('Inference server not reachable'))
+        return future
+
+
+class ServerStandIn:
+    client = FailingServer()
+
+
+@pytest.fixture
+def files(tmp_path):
+    """ A synthetic image, a synthetic video of 12 frames and a file that is not an image """
+    rng = np.random.RandomState(0)
+    image = str(tmp_path / 'image.png')
+    cv2.imwrite(image, rng.randint(0, 255, (120, 160, 3), dtype=np.uint8))
+    video = str(tmp_path / 'video.avi')
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*'MJPG'), 10, (160, 120))
+    for _ in range(12):
+        writer.write(rng.randint(0, 255, (120, 160, 3), dtype=np.uint8))
+    writer.release()
+    broken = str(tmp_path / 'broken.jpg')
+    with open(broken, 'wb') as file:
+        file.write(b'not an image')
+    return bulk.find_files([str(tmp_path)])
+
+
+def detect(files, tmp_path, detection, **kwargs):
+    output = str(tmp_path / 'detections.jsonl')
+    results = bulk.BulkDetection(detection, workers=2, batch_size=4, momentum_thresholds=[0.5, 0.5], poll=0.1, **kwargs).run(
+        files, bulk.JSONLWriter(output))
+    with open(output) as file:
+        lines = [json.loads(line) for line in file]
+    return results, {os.path.basename(line['file']): line for line in lines if line['type'] == 'file'}
+
+
+def test_bulk_detection(files, tmp_path):
+    results, summaries = detect(files, tmp_path, StandIn())
+
+    assert results['files'] == 3 and results['frames'] == 13 and results['errors'] == 1
+    assert summaries['video.avi']['frames'] == 12 and summaries['video.avi']['alerts']
+    assert summaries['image.png']['frames'] == 1 and summaries['image.png']['max_confidence']['Gun'] == pytest.approx(0.9)
+    assert summaries['broken.jpg']['error'] == 'Image not readable'
+
+
+def test_server_errors_are_recorded_per_file(files, tmp_path):
+    results, summaries = detect(files, tmp_path, ServerStandIn())
+
+    assert results['frames'] == 0 and results['errors'] == 3
+    assert summaries['video.avi']['failed'] == 12
+    assert 'Inference server not reachable' in summaries['video.avi']['error']
+
+
+def test_killed_decoding_process_does_not_block(files, tmp_path, monkeypatch):
+    read_file = bulk.read_file
+
+    def killed(path, stride=1):
+        if path.endswith('video.avi'):
+            os._exit(1) # As if it was killed out of memory
+        return read_file(path, stride)
+
+    # The workers are forked, so they see the patched read_file
+    monkeypatch.setattr(bulk, 'multiprocessing', multiprocessing.get_context('fork'))
+    monkeypatch.setattr(bulk, 'read_file', killed)
+    results, summaries = detect(files, tmp_path, StandIn())
+
+    assert results['files'] == 3
+    assert summaries['video.avi']['error'] == 'Decoding process exited before the end of the file'
@@ -0,0 +1,83 @@
+import re
+from pathlib import Path
+
+import pytest
+import yaml
+
+from utils.csi import CaptureConfig
+
+
+def validate(pipeline: str) -> list:
+    """ Check a CSI capture pipeline without a camera nor GStreamer
+
+    Returns:
+        list: Problems found, empty when it is valid
+    """
+    problems = []
+    elements = [element.strip() for element in pipeline.split('!')]
+    names = [element.split(' ')[0].split(',')[0] for element in elements]
+    expected = ['nvarguscamerasrc', 'video/x-raw(memory:NVMM)', 'nvvidconv', 'video/x-raw', 'videoconvert', 'video/x-raw', 'appsink']
+    if names != expected:
+        return ["Elements {} instead of {}".format(names, expected)]
+
+    sizes = [tuple(int(value) for value in re.findall(r'(?:width|height)=\(int\)(\d+)', element)) for element in elements]
+    for size in (sizes[1], sizes[3]):
+        if len(size) != 2 or min(size) <= 0:
+            problems.append("Invalid size {}".format(size))
+        elif size[0] % 2 or size[1] % 2:
+            problems.append("Size {}x{} is not even, nvvidconv needs even sizes".format(*size))
+    if not re.search(r'framerate=\(fraction\)[1-9]\d*/1', elements[1]):
+        problems.append("Invalid framerate in {}".format(elements[1]))
+    flip = re.search(r'flip-method=(\d+)', elements[2])
+    if not flip or int(flip.group(1)) > 7:
+        problems.append("Invalid flip-method in {}".format(elements[2]))
+    if 'format=(string)BGRx' not in elements[3] or 'format=(string)BGR' not in elements[5]:
+        problems.append("Formats must be BGRx after nvvidconv and BGR before the appsink")
+    if 'drop=true' not in elements[6] or 'max-buffers=1' not in elements[6]:
+        problems.append("The appsink queues frames, use drop=true max-buffers=1 for the lowest latency")
+    return problems
+
+
+@pytest.fixture
+def config():
+    with open(Path(__file__).resolve().parents[1] / 'config' / 'config.yml') as f:
+        return yaml.safe_load(f)
+
+
+def test_default_config(config):
+    capture = CaptureConfig(config['preprocessing'], **(config.get('capture') or {}))
+    pipeline = capture.pipeline()
+
+    assert validate(pipeline) == []
+    assert 'width=(int){}, height=(int){}, format=(string)BGRx'.format(
+        config['preprocessing']['width'], config['preprocessing']['height']) in pipeline
+    assert 'flip-method=6' in pipeline
+    assert capture.cpu_transforms('CSI') == ['BGRx to BGR (videoconvert)', 'contrast and brightness']
+
+
+def test_flip_off():
+    capture = CaptureConfig({'width': 1280, 'height': 720}, flip=False)
+
+    assert validate(capture.pipeline()) == []
+    assert 'flip-method=0' in capture.pipeline()
+    assert capture.cpu_transforms(0) == ['resize to 1280x720', 'contrast and brightness']
+
+
+def test_odd_size_is_reported():
+    problems = validate(CaptureConfig({'width': 641, 'height': 480}).pipeline())
+
+    assert problems == ["Size 641x480 is not even, nvvidconv needs even sizes"]
+
+
+def test_appsink_without_drop_is_reported():
+    capture = CaptureConfig({'width': 640, 'height': 480}, drop=False, max_buffers=4)
+
+    assert capture.appsink == 'appsink drop=false max-buffers=4 sync=false'
+    assert validate(capture.pipeline()) == ["The appsink queues frames, use drop=true max-buffers=1 for the lowest latency"]
+
+
+def test_missing_preprocessing_defaults_to_640x480():
+    capture = CaptureConfig()
+
+    assert (capture.width, capture.height) == (640, 480)
+    assert validate(capture.pipeline()) == []
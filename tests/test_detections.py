@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from benchmarks.detections import CATEGORIES, THRESHOLDS, current, previous, random_rows
+from modules.model.detections import Detections
+
+
+@pytest.mark.parametrize('count', [0, 1, 10, 100])
+@pytest.mark.parametrize('seed', range(3))
+def test_rows_give_the_dicts_of_the_api(count, seed):
+    rows = random_rows(count, seed)
+    expected = previous(rows)
+    # The previous size filter never removed a box, it read keys that did not exist
+    result = current(rows, threshold=np.inf)
+
+    assert len(result) == len(expected)
+    for a, b in zip(result, expected):
+        assert (a['class'], a['width'], a['height']) == (b['class'], b['width'], b['height'])
+        assert a['x'] == pytest.approx(b['x']) and a['y'] == pytest.approx(b['y'])
+        assert a['confidence'] == pytest.approx(float(b['confidence']))
+    assert result.to_roboflow() == list(result)
+
+
+def test_roboflow_round_trip():
+    rows = random_rows(10)
+    detections = Detections(rows, CATEGORIES)
+    again = Detections.from_roboflow(detections.to_roboflow(), CATEGORIES)
+
+    assert len(again) == len(detections)
+    np.testing.assert_allclose(again.confidence, detections.confidence, rtol=1e-6)
+    np.testing.assert_array_equal(again.class_id, detections.class_id)
+
+
+def test_filter_size_removes_gigant_boxes():
+    rows = np.array([[0, 0, 500, 100, 0.9, 0], [10, 10, 60, 60, 0.9, 1]], dtype=np.float32)
+    detections = Detections(rows, CATEGORIES).filter_size(640, 480, 0.7)
+
+    assert [box['class'] for box in detections] == ['Knife']
+
+
+def test_max_confidence_is_the_momentum_input():
+    rows = np.array([[0, 0, 10, 10, 0.5, 0], [0, 0, 10, 10, 0.8, 0], [0, 0, 10, 10, 0.3, 1]], dtype=np.float32)
+    detections = Detections(rows, CATEGORIES).filter_confidence(dict(zip(CATEGORIES, THRESHOLDS)))
+
+    np.testing.assert_allclose(detections.max_confidence(CATEGORIES), [0.8, 0.0])
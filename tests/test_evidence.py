@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from benchmarks.utils import random_frame
+from modules.evidence.evidence_writer import EvidenceWriter
+
+
+@pytest.fixture
+def frames():
+    return [random_frame(160, 120, seed) for seed in range(8)]
+
+
+def write(path, frames, format='jpg', detection=5, **kwargs):
+    writer = EvidenceWriter(str(path), format, **kwargs).start()
+    for i, frame in enumerate(frames):
+        writer.add(frame, detected=i == detection)
+    writer.stop()
+    return writer, sorted(os.listdir(str(path)))
+
+
+def test_frames_around_a_detection(tmp_path, frames):
+    _, names = write(tmp_path, frames, pre_frames=3, post_frames=2)
+
+    assert len(names) == 6
+    assert names[3].endswith('_003_detection.jpg')
+    # JPEG of noise is far from its source, but still nearer to it than to any other frame
+    for name, expected in zip(names, [2, 3, 4, 5, 6, 7]):
+        image = cv2.imread(str(tmp_path / name)).astype(int)
+        errors = [np.abs(image - frame).mean() for frame in frames]
+        assert int(np.argmin(errors)) == expected
+
+
+def test_png_is_lossless(tmp_path, frames):
+    _, names = write(tmp_path, frames, 'png', pre_frames=1, post_frames=0)
+
+    assert len(names) == 2
+    np.testing.assert_array_equal(cv2.imread(str(tmp_path / names[0])), frames[4])
+    np.testing.assert_array_equal(cv2.imread(str(tmp_path / names[1])), frames[5])
+
+
+def test_quota_evicts_the_oldest_evidence_first(tmp_path, frames):
+    _, names = write(tmp_path, frames, pre_frames=3, post_frames=2)
+    size = os.path.getsize(str(tmp_path / names[0]))
+
+    writer = EvidenceWriter(str(tmp_path), 'jpg', pre_frames=0, post_frames=0, max_mb=3.5 * size / 1024 / 1024).start()
+    assert writer.bytes == sum(os.path.getsize(str(tmp_path / name)) for name in names)
+    writer.add(frames[0], detected=True)
+    writer.stop()
+
+    assert writer.evicted >= 3
+    assert writer.bytes <= writer.max_bytes
+    assert len(os.listdir(str(tmp_path))) == len(writer.files)
+    assert names[0] not in os.listdir(str(tmp_path))
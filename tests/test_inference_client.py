@@ -0,0 +1,76 @@
+import base64
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+requests = pytest.importorskip('requests')
+
+from benchmarks.inference_client import PREDICTIONS
+from benchmarks.utils import StubServer, random_frame
+from modules.model.inference_client import InferenceClient
+
+RESPONSE = {'predictions': PREDICTIONS, 'image': {'width': 640, 'height': 480}}
+
+
+@pytest.fixture
+def frame():
+    return random_frame(64, 48)
+
+
+def test_predict_returns_the_predictions(frame):
+    with StubServer(RESPONSE) as server:
+        client = InferenceClient(server.url + '/model?api_key=key', retries=0)
+        try:
+            assert client.predict(frame) == PREDICTIONS
+        finally:
+            client.close()
+
+    (method, path, body), = server.requests
+    assert (method, path) == ('POST', '/model?api_key=key')
+    decoded = cv2.imdecode(np.frombuffer(base64.b64decode(body), dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == frame.shape
+
+
+def test_submit_keeps_the_connections_alive(frame):
+    with StubServer(RESPONSE, delay=0.01) as server:
+        client = InferenceClient(server.url, pool_size=2, retries=0)
+        try:
+            futures = [client.submit(frame) for _ in range(6)]
+            assert [future.result() for future in futures] == [PREDICTIONS] * 6
+        finally:
+            client.close()
+    assert len(server.requests) == 6
+
+
+def test_server_error_is_retried_then_raised(frame):
+    with StubServer({'error': 'unavailable'}, status=503) as server:
+        client = InferenceClient(server.url, retries=2, backoff=0)
+        try:
+            with pytest.raises(requests.HTTPError):
+                client.predict(frame)
+        finally:
+            client.close()
+    assert len(server.requests) == 3
+
+
+def test_client_error_is_not_retried(frame):
+    with StubServer({'message': 'Forbidden'}, status=403) as server:
+        client = InferenceClient(server.url, retries=2, backoff=0)
+        try:
+            with pytest.raises(KeyError):
+                client.predict(frame)
+        finally:
+            client.close()
+    assert len(server.requests) == 1
+
+
+def test_timeout_is_retried_then_raised(frame):
+    with StubServer(RESPONSE, delay=0.3) as server:
+        client = InferenceClient(server.url, timeout=0.05, retries=1, backoff=0)
+        try:
+            with pytest.raises(requests.Timeout):
+                client.predict(frame)
+        finally:
+            client.close()
+    assert len(server.requests) == 2
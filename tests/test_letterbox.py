@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from benchmarks.letterbox import INPUT_H, INPUT_W, letterbox_reference
+from benchmarks.utils import random_frame
+from modules.model.letterbox import Letterbox
+
+
+@pytest.mark.parametrize('width, height', [(640, 480), (1920, 1080), (480, 640), (640, 640), (100, 300), (1280, 720)])
+def test_letterbox_into_a_buffer_is_exact(width, height):
+    letterbox = Letterbox(INPUT_W, INPUT_H)
+    buffer = np.empty(3 * INPUT_H * INPUT_W, dtype=np.float32)
+    frame = random_frame(width, height)
+
+    chw = letterbox(frame, buffer)
+    np.testing.assert_array_equal(buffer, letterbox_reference(frame).ravel())
+    assert chw.shape == (3, INPUT_H, INPUT_W) and np.shares_memory(chw, buffer)
+
+
+def test_buffer_is_fully_overwritten():
+    """ The padding of a previous frame of another shape does not remain in the buffer """
+    letterbox = Letterbox(INPUT_W, INPUT_H)
+    buffer = np.empty(3 * INPUT_H * INPUT_W, dtype=np.float32)
+    letterbox(random_frame(480, 640), buffer)
+    frame = random_frame(1920, 1080, 1)
+
+    letterbox(frame, buffer)
+    np.testing.assert_array_equal(buffer, letterbox_reference(frame).ravel())
+
+
+def test_new_buffer_without_out():
+    frame = random_frame(640, 480)
+    np.testing.assert_array_equal(Letterbox(INPUT_W, INPUT_H)(frame).ravel(), letterbox_reference(frame).ravel())
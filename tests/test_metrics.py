@@ -0,0 +1,47 @@
+import threading
+
+from modules.metrics.metrics import Metrics
+
+
+def test_render_merges_the_snapshots_of_both_processes():
+    app, inference = Metrics(), Metrics()
+    for seconds in (0.0004, 0.0005, 0.003, 2.0):
+        inference.observe('preprocess', seconds)
+    inference.inc('detections_total', {'class': 'Gun'})
+    app.inc('status_transitions_total', {'status': 'sent'}, 2)
+    app.gauge('notification_queue_depth', 3)
+    lines = app.render(app.snapshot(), inference.snapshot()).splitlines()
+
+    for line in (
+        'weapon_detector_stage_seconds_bucket{stage="preprocess",le="0.0005"} 2',
+        'weapon_detector_stage_seconds_bucket{stage="preprocess",le="0.005"} 3',
+        'weapon_detector_stage_seconds_bucket{stage="preprocess",le="+Inf"} 4',
+        'weapon_detector_stage_seconds_count{stage="preprocess"} 4',
+        'weapon_detector_detections_total{class="Gun"} 1',
+        'weapon_detector_status_transitions_total{status="sent"} 2',
+        '# TYPE weapon_detector_notification_queue_depth gauge',
+        'weapon_detector_notification_queue_depth 3',
+    ):
+        assert line in lines
+
+
+def test_set_replaces_a_counter():
+    metrics = Metrics()
+    metrics.set('dropped_frames_total', 3, {'stage': 'camera'})
+    metrics.set('dropped_frames_total', 5, {'stage': 'camera'})
+    assert metrics.snapshot()['counters'] == [['dropped_frames_total', {'stage': 'camera'}, 5]]
+
+
+def test_counters_from_several_threads():
+    metrics = Metrics()
+
+    def transitions():
+        for _ in range(10000):
+            metrics.inc('status_transitions_total', {'status': 'sent'})
+
+    threads = [threading.Thread(target=transitions) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.snapshot()['counters'] == [['status_transitions_total', {'status': 'sent'}, 80000]]
@@ -0,0 +1,65 @@
+from collections import deque
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from benchmarks.momentum import CLASSES, THRESHOLDS, sequence
+from modules.model.momentum import TemporalEvidence
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('streams', [1, 3])
+def test_incremental_evidence_matches_the_window(seed, streams):
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    windows = {stream: deque([np.zeros(len(CLASSES))] * evidence.window, maxlen=evidence.window) for stream in range(streams)}
+    for i, boxes in enumerate(sequence(500, seed)):
+        stream = i % streams
+        confidences = evidence.confidences(boxes)
+        incremental = evidence.update(confidences, stream)
+        windows[stream].appendleft(confidences)
+        expected = evidence.weights @ np.array(windows[stream])
+        np.testing.assert_allclose(incremental, expected, atol=1e-12, err_msg='frame {}'.format(i))
+        np.testing.assert_allclose(evidence.evidence(stream), expected, atol=1e-12, err_msg='frame {}'.format(i))
+
+
+def test_burst_of_guns_is_detected():
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    gun = [{'class': 'Gun', 'confidence': 0.7}]
+    # Two frames of a 0.7 gun reach 1.05
+    assert not evidence.observe(gun, 'a')
+    assert evidence.observe(gun, 'a')
+
+
+def test_streams_are_independent():
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    gun = [{'class': 'Gun', 'confidence': 0.7}]
+    evidence.observe(gun, 'a')
+    evidence.observe(gun, 'a')
+    assert not evidence.observe(gun, 'b')
+
+
+def test_knives_use_their_own_threshold():
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    knife = [{'class': 'Knife', 'confidence': 0.5}]
+    assert not evidence.observe(knife, 'c')
+    assert evidence.observe(knife, 'c')
+
+
+def test_empty_frames_decay_the_evidence():
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    gun = [{'class': 'Gun', 'confidence': 0.7}]
+    evidence.observe(gun)
+    for _ in range(evidence.window):
+        evidence.observe([])
+    assert not evidence.observe(gun)
+
+
+def test_evidence_does_not_drift():
+    evidence = TemporalEvidence(CLASSES, THRESHOLDS)
+    for boxes in sequence(5000):
+        evidence.observe(boxes)
+    for _ in range(evidence.window):
+        values = evidence.update([0.0, 0.0])
+        assert (values >= 0).all()
+    np.testing.assert_allclose(values, [0.0, 0.0], atol=1e-12)
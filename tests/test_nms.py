@@ -0,0 +1,43 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from benchmarks.nms import nms_reference, random_boxes
+from modules.model.nms import batched_nms, nms
+
+COUNTS = [0, 1, 10, 100, 300, 1000]
+
+
+def assert_same(expected, result):
+    assert len(expected) == len(result)
+    if len(expected):
+        np.testing.assert_array_equal(expected, result)
+
+
+@pytest.mark.parametrize('count', COUNTS)
+@pytest.mark.parametrize('seed', range(5))
+def test_nms_keeps_the_boxes_of_the_previous_loop(count, seed):
+    boxes = random_boxes(count, seed)
+    assert_same(nms_reference(boxes), nms(boxes))
+
+
+@pytest.mark.parametrize('count', COUNTS)
+def test_batched_nms_keeps_the_boxes_of_every_image(count):
+    batch = [random_boxes(count, seed) for seed in range(4)]
+    for boxes, result in zip(batch, batched_nms(batch)):
+        assert_same(nms_reference(boxes), result)
+
+
+@pytest.mark.parametrize('max_det', [1, 5, 50])
+def test_max_det_keeps_the_most_confident_boxes(max_det):
+    batch = [random_boxes(300, seed) for seed in range(4)]
+    for boxes, result in zip(batch, batched_nms(batch, max_det=max_det)):
+        expected = nms_reference(boxes)[:max_det]
+        assert_same(expected, result)
+        assert len(result) <= max_det
+
+
+def test_threshold_is_class_aware():
+    boxes = np.array([[10, 10, 100, 100, 0.9, 0], [12, 12, 102, 102, 0.8, 0], [12, 12, 102, 102, 0.7, 1]], dtype=np.float32)
+    np.testing.assert_array_equal(nms(boxes, 0.4), boxes[[0, 2]])
+    np.testing.assert_array_equal(nms(boxes, 0.99), boxes)
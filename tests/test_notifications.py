@@ -0,0 +1,97 @@
+import os
+import time
+import types
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from modules.api.notifications import NotificationQueue
+
+
+def wait_delivered(queue: NotificationQueue, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while queue.pending and time.time() < deadline:
+        time.sleep(0.01)
+    return not queue.pending
+
+
+class Answers:
+    def __init__(self, *answers):
+        """ Stand-in of the API, raises the given exceptions in order and accepts everything after them """
+        self.answers = list(answers)
+        self.sent = []
+
+    def __call__(self, payload: dict) -> dict:
+        self.sent.append(payload)
+        if self.answers:
+            raise self.answers.pop(0)
+        return {'id': len(self.sent)}
+
+
+@pytest.mark.parametrize('error', [
+    AssertionError('GET /notifications answered 404'),
+    ValueError('Expecting value'),
+    KeyError('message'),
+    AttributeError("'NoneType' object has no attribute 'keys'"),
+])
+def test_rejected_notification_does_not_block_the_queue(tmp_path, error):
+    send = Answers(error)
+    queue = NotificationQueue(send, str(tmp_path), backoff=0.01, retry=(ConnectionError,))
+    queue.put({'message': 'Gun detected', 'type': 3})
+    queue.put({'message': 'Knife detected', 'type': 3})
+    queue.start()
+    assert wait_delivered(queue)
+    queue.stop()
+
+    assert (queue.rejected, queue.delivered) == (1, 1)
+    assert [payload['message'] for payload in send.sent] == ['Gun detected', 'Knife detected']
+    assert len(os.listdir(str(tmp_path / 'rejected'))) == 1
+    assert os.listdir(str(tmp_path)) == ['rejected']
+
+
+def test_failure_is_retried(tmp_path):
+    send = Answers(ConnectionError('POST /notifications answered 503'), TimeoutError())
+    queue = NotificationQueue(send, str(tmp_path), backoff=0.01, retry=(ConnectionError, TimeoutError))
+    queue.put({'message': 'Gun detected', 'type': 3})
+    queue.start()
+    assert wait_delivered(queue)
+    queue.stop()
+
+    assert (queue.failures, queue.rejected, queue.delivered) == (2, 0, 1)
+    assert not os.path.exists(str(tmp_path / 'rejected'))
+
+
+def test_pending_notifications_survive_a_restart(tmp_path):
+    NotificationQueue(Answers(), str(tmp_path)).put({'message': 'Gun detected', 'type': 3})
+    queue = NotificationQueue(Answers(), str(tmp_path), backoff=0.01).start()
+    assert wait_delivered(queue)
+    queue.stop()
+    assert queue.delivered == 1
+
+
+@pytest.mark.parametrize('status, body', [
+    (404, b'<html>Not found</html>'),
+    (400, b'{"detail": "Invalid type"}'),
+    (200, b'null'),
+    (200, b''),
+    (200, b'[1, 2]'),
+])
+def test_bad_answer_is_a_rejection(status, body):
+    apiClient = pytest.importorskip('modules.api.apiClient')
+    with pytest.raises(AssertionError):
+        apiClient.ApiClient.parse('POST', '/notifications', status, body)
+
+
+def test_answer_is_parsed():
+    apiClient = pytest.importorskip('modules.api.apiClient')
+    assert apiClient.ApiClient.parse('POST', '/notifications', 201, b'{"id": 1}') == {'id': 1}
+
+
+def test_alert_message_waits_for_the_node_configuration():
+    apiClient = pytest.importorskip('modules.api.apiClient')
+    client = types.SimpleNamespace(node_config=None)
+    with pytest.raises(ConnectionError):
+        apiClient.ApiClient.alert_message(client, 'gun')
+    client.node_config = {'node_id': 3, 'name': 'Entrance', 'location': 'Building A'}
+    assert apiClient.ApiClient.alert_message(client, 'gun') == 'Gun detected at Entrance - Building A by node 3'
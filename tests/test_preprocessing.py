@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from benchmarks.preprocessing import reference
+from benchmarks.utils import random_frame
+from modules.preprocessing.image_preprocessing import ImagePreprocessor
+
+PARAMS = {'alpha': 1.39, 'beta': 55, 'width': 640, 'height': 480}
+
+
+@pytest.mark.parametrize('width, height', [(640, 480), (1280, 720), (1920, 1080), (320, 240)])
+@pytest.mark.parametrize('alpha, beta', [(1.39, 55), (1.0, 0), (0.5, -20)])
+def test_plan_matches_the_pipeline(width, height, alpha, beta):
+    preprocessor = ImagePreprocessor(dict(PARAMS, alpha=alpha, beta=beta))
+    frame = random_frame(width, height)
+
+    np.testing.assert_array_equal(preprocessor.preprocess(frame), reference(preprocessor, frame))
+
+
+def test_plan_without_flip():
+    preprocessor = ImagePreprocessor(PARAMS, flip=False)
+    frame = random_frame(1280, 720)
+    expected = preprocessor.change_contrast_and_brightness(preprocessor.resize_image(frame))
+
+    np.testing.assert_array_equal(preprocessor.preprocess(frame), expected)
+
+
+def test_plan_is_rebuilt_after_a_setter():
+    preprocessor = ImagePreprocessor(PARAMS)
+    frame = random_frame(1280, 720)
+    plan = preprocessor.compile()
+    assert preprocessor.compile() is plan
+
+    preprocessor.set_alpha(120)
+    preprocessor.set_beta(10)
+    assert preprocessor.compile() is not plan
+    np.testing.assert_array_equal(preprocessor.preprocess(frame), reference(preprocessor, frame))
+
+
+def test_outputs_are_reused_in_a_ring():
+    preprocessor = ImagePreprocessor(PARAMS, buffers=3)
+    frames = [random_frame(1280, 720, seed) for seed in range(4)]
+    outputs = [preprocessor.preprocess(frame) for frame in frames]
+
+    assert len({id(output) for output in outputs[:3]}) == 3
+    assert outputs[3] is outputs[0]
+    np.testing.assert_array_equal(outputs[1], reference(preprocessor, frames[1]))
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from benchmarks.roi import red_object, run, scene
+from modules.model.session import CPUSession
+from modules.model.yoloDet import YoloTRT
+from modules.preprocessing.background_remover import BackgroundRemover
+from modules.preprocessing.roi import RegionFinder
+
+# Letterbox rounding of a crop upscaled into the engine input
+TOLERANCE = 4
+
+
+@pytest.fixture
+def model():
+    return YoloTRT(conf=0.3, yolo_ver="v5", session=CPUSession(batch_size=4, model=red_object))
+
+
+@pytest.fixture
+def frame():
+    _, frames = scene(10, 0.5)
+    return frames[-1]
+
+
+def test_boxes_are_mapped_back_to_the_frame(model, frame):
+    whole, _ = model.Inference(frame)
+    detections, _ = model.InferenceRegions(frame, [(300, 100, 620, 450)])
+
+    assert len(whole) == len(detections) == 1
+    np.testing.assert_allclose(detections.boxes, whole.boxes, atol=TOLERANCE)
+
+
+def test_object_in_overlapping_regions_is_reported_once(model, frame):
+    whole, _ = model.Inference(frame)
+    regions = [(300, 100, 620, 450), (250, 150, 640, 480), (0, 0, 640, 480)]
+    detections, _ = model.InferenceRegions(frame, regions)
+
+    assert len(detections) == 1
+    np.testing.assert_allclose(detections.boxes, whole.boxes, atol=TOLERANCE)
+
+
+def test_no_regions_no_detector(model, frame):
+    detections, t = model.InferenceRegions(frame, [])
+
+    assert len(detections) == 0 and t == 0
+
+
+def test_regions_find_what_the_whole_frame_finds(model):
+    background, frames = scene(60, 0.5)
+    boxes = {}
+    for name, finder in [('whole frame', None), ('regions', RegionFinder())]:
+        remover = BackgroundRemover()
+        for _ in range(10):
+            remover.learn_background(background)
+        boxes[name], _ = run(model, remover, frames, finder)
+
+    assert sum(len(whole) for whole in boxes['whole frame']) > 0
+    for whole, regions in zip(boxes['whole frame'], boxes['regions']):
+        assert len(whole) == len(regions)
+        for a, b in zip(whole, regions):
+            np.testing.assert_allclose(b, a, atol=TOLERANCE)
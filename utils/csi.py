@@ -6,6 +6,7 @@ def gstreamer_pipeline(
     display_height=540,
     framerate=30,
     flip_method=0,
+    appsink="appsink",
 ):
     return (
         "nvarguscamerasrc sensor-id=%d ! "
@@ -13,7 +14,7 @@ def gstreamer_pipeline(
         "nvvidconv flip-method=%d ! "
         "video/x-raw, width=(int)%d, height=(int)%d, format=(string)BGRx ! "
         "videoconvert ! "
-        "video/x-raw, format=(string)BGR ! appsink"
+        "video/x-raw, format=(string)BGR ! %s"
         % (
             sensor_id,
             capture_width,
@@ -22,5 +23,78 @@ def gstreamer_pipeline(
             flip_method,
             display_width,
             display_height,
+            appsink,
         )
-    )
\ No newline at end of file
+    )
+
+
+class CaptureConfig:
+    FLIP_NONE = 0
+    FLIP_VERTICAL = 6  # nvvidconv flip-method of cv2.flip(image, 0)
+
+    def __init__(self, preprocessing: dict = None, sensor_id: int = 0, capture_width: int = 1920, capture_height: int = 1080,
+                 framerate: int = 30, flip: bool = True, drop: bool = True, max_buffers: int = 1):
+        """ Capture settings of the CSI camera built from the preprocessing section of the configuration.
+        nvvidconv scales and flips the frames on the VIC, so the CPU only gets frames of the target size
+
+        Args:
+            preprocessing (dict, optional): The preprocessing section, its width and height are the output size. Defaults to 640x480.
+            sensor_id (int, optional): CSI sensor. Defaults to 0.
+            capture_width (int, optional): Sensor mode width. Defaults to 1920.
+            capture_height (int, optional): Sensor mode height. Defaults to 1080.
+            framerate (int, optional): Sensor mode framerate. Defaults to 30.
+            flip (bool, optional): Flip the frames vertically, like ImagePreprocessor.flip_image. Defaults to True.
+            drop (bool, optional): The appsink drops old frames instead of blocking the camera. Defaults to True.
+            max_buffers (int, optional): Frames queued in the appsink. Defaults to 1.
+        """
+        preprocessing = preprocessing or {}
+        self.sensor_id = sensor_id
+        self.capture_width = capture_width
+        self.capture_height = capture_height
+        self.width = preprocessing.get('width') or 640
+        self.height = preprocessing.get('height') or 480
+        self.framerate = framerate
+        self.flip = flip
+        self.drop = drop
+        self.max_buffers = max_buffers
+
+    @property
+    def appsink(self) -> str:
+        return "appsink drop=%s max-buffers=%d sync=false" % (str(self.drop).lower(), self.max_buffers)
+
+    def pipeline(self) -> str:
+        """ Get the GStreamer pipeline of cv2.VideoCapture """
+        return gstreamer_pipeline(
+            sensor_id=self.sensor_id,
+            capture_width=self.capture_width,
+            capture_height=self.capture_height,
+            display_width=self.width,
+            display_height=self.height,
+            framerate=self.framerate,
+            flip_method=self.FLIP_VERTICAL if self.flip else self.FLIP_NONE,
+            appsink=self.appsink,
+        )
+
+    def at_source(self, source) -> bool:
+        """ If resize and flip are done by the capture of a source """
+        return source == 'CSI'
+
+    def cpu_transforms(self, source) -> list:
+        """ Transforms that are still done on the CPU for a source
+
+        Args:
+            source (str or int): Camera of the configuration
+
+        Returns:
+            list: Names of the transforms
+        """
+        if self.at_source(source):
+            # nvvidconv can not output packed BGR, videoconvert drops the padding byte
+            transforms = ['BGRx to BGR (videoconvert)']
+        else:
+            transforms = ['resize to {}x{}'.format(self.width, self.height)] + (['flip'] if self.flip else [])
+        return transforms + ['contrast and brightness']
+
+    def report(self, source) -> str:
+        return "Capture {}: transforms on the CPU: {}".format(source, ', '.join(self.cpu_transforms(source)))
+